@@ -12,22 +12,32 @@ load_dotenv()
 # access to the values within the .ini file in use.
 config = context.config
 
-config.set_main_option("sqlalchemy.url", os.getenv("SQLITE_URL"))
+config.set_main_option(
+    "sqlalchemy.url", os.getenv("DATABASE_URL") or os.getenv("SQLITE_URL")
+)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-from app.database.sqlite import Base
+from app.database import search
+from app.database.sql import Base
 
 # add your model's MetaData object here
 # for 'autogenerate' support
+from app.models.job_model import Job
 from app.models.product_model import Product
 
 target_metadata = Base.metadata
 
 
+def include_name(name, type_, parent_names) -> bool:
+    # O índice de busca textual é criado fora dos models (app/database/search.py):
+    # sem este filtro o autogenerate geraria uma migration que o remove
+    return not search.is_search_object(name, type_)
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -50,6 +60,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -72,7 +83,11 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
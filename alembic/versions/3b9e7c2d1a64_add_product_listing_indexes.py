@@ -0,0 +1,37 @@
+"""add_product_listing_indexes
+
+Revision ID: 3b9e7c2d1a64
+Revises: f165a50a4a4d
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9e7c2d1a64"
+down_revision: Union[str, None] = "f165a50a4a4d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_products_name_id", "products", ["name", "id"])
+    op.create_index("ix_products_price_id", "products", ["price", "id"])
+    op.create_index(
+        "ix_products_stock_quantity_id", "products", ["stock_quantity", "id"]
+    )
+    op.create_index("ix_products_status_id", "products", ["status", "id"])
+    op.create_index(
+        "ix_products_status_price_id", "products", ["status", "price", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_products_status_price_id", table_name="products")
+    op.drop_index("ix_products_status_id", table_name="products")
+    op.drop_index("ix_products_stock_quantity_id", table_name="products")
+    op.drop_index("ix_products_price_id", table_name="products")
+    op.drop_index("ix_products_name_id", table_name="products")
@@ -0,0 +1,53 @@
+"""add_product_versioning
+
+Revision ID: 8d2f4a6c9e15
+Revises: 3b9e7c2d1a64
+Create Date: 2026-10-18 11:02:47.518203
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d2f4a6c9e15"
+down_revision: Union[str, None] = "3b9e7c2d1a64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # O SQLite não aceita ADD COLUMN com default não constante: recria a tabela
+    with op.batch_alter_table("products", recreate="always") as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), server_default="1", nullable=False)
+        )
+        batch_op.add_column(
+            sa.Column(
+                "updated_at",
+                sa.DateTime(),
+                server_default=sa.func.now(),
+                nullable=False,
+            )
+        )
+
+    product_catalog = op.create_table(
+        "product_catalog",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.bulk_insert(product_catalog, [{"id": 1, "version": 0}])
+
+
+def downgrade() -> None:
+    op.drop_table("product_catalog")
+    with op.batch_alter_table("products", recreate="always") as batch_op:
+        batch_op.drop_column("updated_at")
+        batch_op.drop_column("version")
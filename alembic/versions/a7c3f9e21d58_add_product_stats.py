@@ -0,0 +1,165 @@
+"""add_product_stats
+
+Revision ID: a7c3f9e21d58
+Revises: e2a5d8f17b40
+Create Date: 2026-10-18 21:37:05.219846
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3f9e21d58"
+down_revision: Union[str, None] = "e2a5d8f17b40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Agregados por status e histograma de preços (faixas logarítmicas com erro
+# relativo de 1%), mantidos por triggers e preenchidos com as linhas existentes
+
+LN_GAMMA = 0.020000666706669435
+
+
+def price_bucket(price: str) -> str:
+    return f"CAST(ceil(ln({price}) / {LN_GAMMA!r}) AS INTEGER)"
+
+
+STATS_ADD = f"""
+    INSERT INTO product_stats
+        (status, product_count, price_sum, stock_quantity_sum, inventory_value)
+    VALUES (
+        CAST({{row}}status AS TEXT), 1, {{row}}price, {{row}}stock_quantity,
+        {{row}}price * {{row}}stock_quantity
+    )
+    ON CONFLICT (status) DO UPDATE SET
+        product_count = product_stats.product_count + 1,
+        price_sum = product_stats.price_sum + excluded.price_sum,
+        stock_quantity_sum =
+            product_stats.stock_quantity_sum + excluded.stock_quantity_sum,
+        inventory_value = product_stats.inventory_value + excluded.inventory_value;
+    INSERT INTO product_price_histogram (bucket, product_count)
+    VALUES ({price_bucket("{row}price")}, 1)
+    ON CONFLICT (bucket) DO UPDATE SET
+        product_count = product_price_histogram.product_count + 1;
+"""
+
+STATS_REMOVE = f"""
+    UPDATE product_stats SET
+        product_count = product_count - 1,
+        price_sum = price_sum - {{row}}price,
+        stock_quantity_sum = stock_quantity_sum - {{row}}stock_quantity,
+        inventory_value = inventory_value - {{row}}price * {{row}}stock_quantity
+    WHERE status = CAST({{row}}status AS TEXT);
+    UPDATE product_price_histogram SET product_count = product_count - 1
+    WHERE bucket = {price_bucket("{row}price")};
+"""
+
+# Recalcula os agregados a partir das linhas que já existiam
+REBUILD = [
+    "DELETE FROM product_stats",
+    "DELETE FROM product_price_histogram",
+    """
+    INSERT INTO product_stats
+        (status, product_count, price_sum, stock_quantity_sum, inventory_value)
+    SELECT CAST(status AS TEXT), COUNT(*), SUM(price), SUM(stock_quantity),
+        SUM(price * stock_quantity)
+    FROM products GROUP BY status
+    """,
+    f"""
+    INSERT INTO product_price_histogram (bucket, product_count)
+    SELECT {price_bucket("price")}, COUNT(*) FROM products
+    GROUP BY {price_bucket("price")}
+    """,
+]
+
+SQLITE_CREATE = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_insert AFTER INSERT ON products BEGIN
+        {STATS_ADD.format(row="new.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_delete AFTER DELETE ON products BEGIN
+        {STATS_REMOVE.format(row="old.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_update
+    AFTER UPDATE OF status, price, stock_quantity ON products BEGIN
+        {STATS_REMOVE.format(row="old.")}
+        {STATS_ADD.format(row="new.")}
+    END
+    """,
+    *REBUILD,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS products_stats_update",
+    "DROP TRIGGER IF EXISTS products_stats_delete",
+    "DROP TRIGGER IF EXISTS products_stats_insert",
+]
+
+POSTGRES_CREATE = [
+    f"""
+    CREATE OR REPLACE FUNCTION products_stats_update() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {STATS_REMOVE.format(row="OLD.")}
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {STATS_ADD.format(row="NEW.")}
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS products_stats_update ON products",
+    """
+    CREATE TRIGGER products_stats_update
+    AFTER INSERT OR DELETE OR UPDATE OF status, price, stock_quantity ON products
+    FOR EACH ROW EXECUTE FUNCTION products_stats_update()
+    """,
+    *REBUILD,
+]
+
+POSTGRES_DROP = [
+    "DROP TRIGGER IF EXISTS products_stats_update ON products",
+    "DROP FUNCTION IF EXISTS products_stats_update()",
+]
+
+
+def run(statements):
+    connection = op.get_bind()
+    for statement in statements.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "product_stats",
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("product_count", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column("price_sum", sa.Numeric(), server_default="0", nullable=False),
+        sa.Column(
+            "stock_quantity_sum", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.Column("inventory_value", sa.Numeric(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("status"),
+    )
+    op.create_table(
+        "product_price_histogram",
+        sa.Column("bucket", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("product_count", sa.BigInteger(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("bucket"),
+    )
+    run({"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE})
+
+
+def downgrade() -> None:
+    run({"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP})
+    op.drop_table("product_price_histogram")
+    op.drop_table("product_stats")
@@ -0,0 +1,70 @@
+"""products_autoincrement
+
+Revision ID: b81e6d4f0c37
+Revises: d9b4f2e6a813
+Create Date: 2026-10-19 10:12:44.830215
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = "b81e6d4f0c37"
+down_revision: Union[str, None] = "d9b4f2e6a813"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# No SQLite, sem AUTOINCREMENT, o id do último produto excluído é reutilizado
+# pelo próximo criado, e um job de purga ainda pendente apagaria os logs do
+# novo produto. No PostgreSQL os ids vêm de uma sequence e nunca se repetem.
+# Recriar a tabela remove os triggers dela: são recriados com o DDL congelado
+# das revisões que os criaram
+
+SEARCH_REVISION = "c4e7a1b9d302"
+STATS_REVISION = "d9b4f2e6a813"
+
+# Nenhum id já usado (por produtos ou por jobs de produtos excluídos) volta
+RESERVE_USED_IDS = [
+    "DELETE FROM sqlite_sequence WHERE name = 'products'",
+    """
+    INSERT INTO sqlite_sequence (name, seq)
+    SELECT 'products', MAX(
+        COALESCE((SELECT MAX(id) FROM products), 0),
+        COALESCE((SELECT MAX(product_id) FROM jobs), 0)
+    )
+    """,
+]
+
+
+def frozen(revision: str):
+    return context.script.get_revision(revision).module
+
+
+def recreate_products(autoincrement: bool):
+    connection = op.get_bind()
+    search, stats = frozen(SEARCH_REVISION), frozen(STATS_REVISION)
+    for statement in [*search.SQLITE_DROP, *stats.SQLITE_DROP]:
+        connection.exec_driver_sql(statement)
+    with op.batch_alter_table(
+        "products",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": autoincrement},
+    ):
+        pass
+    if autoincrement:
+        for statement in RESERVE_USED_IDS:
+            connection.exec_driver_sql(statement)
+    for statement in [*search.SQLITE_CREATE, *stats.SQLITE_CREATE]:
+        connection.exec_driver_sql(statement)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        recreate_products(autoincrement=True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        recreate_products(autoincrement=False)
@@ -0,0 +1,109 @@
+"""add_product_search_index
+
+Revision ID: c4e7a1b9d302
+Revises: 8d2f4a6c9e15
+Create Date: 2026-10-18 15:21:09.384112
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e7a1b9d302"
+down_revision: Union[str, None] = "8d2f4a6c9e15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Busca textual em name e description: FTS5 no SQLite, tsvector + GIN no
+# PostgreSQL, mantidos em sincronia por triggers
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    # Indexa as linhas que já existiam
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS products_fts_update",
+    "DROP TRIGGER IF EXISTS products_fts_delete",
+    "DROP TRIGGER IF EXISTS products_fts_insert",
+    "DROP TABLE IF EXISTS products_fts",
+]
+
+POSTGRES_SEARCH_VECTOR = (
+    "setweight(to_tsvector('pg_catalog.simple', coalesce({row}name, '')), 'A') || "
+    "setweight(to_tsvector('pg_catalog.simple', coalesce({row}description, '')), 'B')"
+)
+
+POSTGRES_CREATE = [
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    f"""
+    CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {POSTGRES_SEARCH_VECTOR.format(row="NEW.")};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS products_search_vector_update ON products",
+    """
+    CREATE TRIGGER products_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, description ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector_update()
+    """,
+    f"UPDATE products SET search_vector = {POSTGRES_SEARCH_VECTOR.format(row='')}",
+    """
+    CREATE INDEX IF NOT EXISTS ix_products_search_vector
+    ON products USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_DROP = [
+    "DROP TRIGGER IF EXISTS products_search_vector_update ON products",
+    "DROP FUNCTION IF EXISTS products_search_vector_update()",
+    "DROP INDEX IF EXISTS ix_products_search_vector",
+    "ALTER TABLE products DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run(statements):
+    connection = op.get_bind()
+    for statement in statements.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+def upgrade() -> None:
+    run({"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE})
+
+
+def downgrade() -> None:
+    run({"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP})
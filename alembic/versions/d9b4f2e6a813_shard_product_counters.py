@@ -0,0 +1,285 @@
+"""shard_product_counters
+
+Revision ID: d9b4f2e6a813
+Revises: a7c3f9e21d58
+Create Date: 2026-10-18 23:48:31.605927
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d9b4f2e6a813"
+down_revision: Union[str, None] = "a7c3f9e21d58"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Ajustes de estoque simultâneos não disputam mais uma única linha: o contador
+# do catálogo passa a ter 16 linhas (somadas na leitura), product_stats ganha
+# a coluna 'shard' (id % 16) e o histograma de preços só é atualizado quando
+# o preço muda
+
+LN_GAMMA = 0.020000666706669435
+SHARDS = 16
+
+
+def price_bucket(price: str) -> str:
+    return f"CAST(ceil(ln({price}) / {LN_GAMMA!r}) AS INTEGER)"
+
+
+HISTOGRAM_ADD = f"""
+    INSERT INTO product_price_histogram (bucket, product_count)
+    VALUES ({price_bucket("{row}price")}, 1)
+    ON CONFLICT (bucket) DO UPDATE SET
+        product_count = product_price_histogram.product_count + 1;
+"""
+
+HISTOGRAM_REMOVE = f"""
+    UPDATE product_price_histogram SET product_count = product_count - 1
+    WHERE bucket = {price_bucket("{row}price")};
+"""
+
+HISTOGRAM_REBUILD = f"""
+    INSERT INTO product_price_histogram (bucket, product_count)
+    SELECT {price_bucket("price")}, COUNT(*) FROM products
+    GROUP BY {price_bucket("price")}
+"""
+
+# Cópia congelada do DDL de app/database/product_stats.py nesta revisão
+STATS_ADD = f"""
+    INSERT INTO product_stats
+        (status, shard, product_count, price_sum, stock_quantity_sum,
+         inventory_value)
+    VALUES (
+        CAST({{row}}status AS TEXT), {{row}}id % {SHARDS}, 1, {{row}}price,
+        {{row}}stock_quantity, {{row}}price * {{row}}stock_quantity
+    )
+    ON CONFLICT (status, shard) DO UPDATE SET
+        product_count = product_stats.product_count + 1,
+        price_sum = product_stats.price_sum + excluded.price_sum,
+        stock_quantity_sum =
+            product_stats.stock_quantity_sum + excluded.stock_quantity_sum,
+        inventory_value = product_stats.inventory_value + excluded.inventory_value;
+"""
+
+STATS_REMOVE = f"""
+    UPDATE product_stats SET
+        product_count = product_count - 1,
+        price_sum = price_sum - {{row}}price,
+        stock_quantity_sum = stock_quantity_sum - {{row}}stock_quantity,
+        inventory_value = inventory_value - {{row}}price * {{row}}stock_quantity
+    WHERE status = CAST({{row}}status AS TEXT)
+        AND shard = {{row}}id % {SHARDS};
+"""
+
+REBUILD = [
+    "DELETE FROM product_stats",
+    "DELETE FROM product_price_histogram",
+    f"""
+    INSERT INTO product_stats
+        (status, shard, product_count, price_sum, stock_quantity_sum,
+         inventory_value)
+    SELECT CAST(status AS TEXT), id % {SHARDS}, COUNT(*), SUM(price),
+        SUM(stock_quantity), SUM(price * stock_quantity)
+    FROM products GROUP BY CAST(status AS TEXT), id % {SHARDS}
+    """,
+    HISTOGRAM_REBUILD,
+]
+
+SQLITE_CREATE = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_insert AFTER INSERT ON products BEGIN
+        {STATS_ADD.format(row="new.")}
+        {HISTOGRAM_ADD.format(row="new.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_delete AFTER DELETE ON products BEGIN
+        {STATS_REMOVE.format(row="old.")}
+        {HISTOGRAM_REMOVE.format(row="old.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_update
+    AFTER UPDATE OF status, price, stock_quantity ON products BEGIN
+        {STATS_REMOVE.format(row="old.")}
+        {STATS_ADD.format(row="new.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_price_histogram_update
+    AFTER UPDATE OF price ON products WHEN old.price <> new.price BEGIN
+        {HISTOGRAM_REMOVE.format(row="old.")}
+        {HISTOGRAM_ADD.format(row="new.")}
+    END
+    """,
+    *REBUILD,
+]
+
+POSTGRES_CREATE = [
+    f"""
+    CREATE OR REPLACE FUNCTION products_stats_update() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {STATS_REMOVE.format(row="OLD.")}
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {STATS_ADD.format(row="NEW.")}
+        END IF;
+        IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.price <> NEW.price) THEN
+            {HISTOGRAM_REMOVE.format(row="OLD.")}
+        END IF;
+        IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND OLD.price <> NEW.price) THEN
+            {HISTOGRAM_ADD.format(row="NEW.")}
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    *REBUILD,
+]
+
+# DDL da revisão anterior (a7c3f9e21d58), para o downgrade
+PREVIOUS_STATS_ADD = """
+    INSERT INTO product_stats
+        (status, product_count, price_sum, stock_quantity_sum, inventory_value)
+    VALUES (
+        CAST({row}status AS TEXT), 1, {row}price, {row}stock_quantity,
+        {row}price * {row}stock_quantity
+    )
+    ON CONFLICT (status) DO UPDATE SET
+        product_count = product_stats.product_count + 1,
+        price_sum = product_stats.price_sum + excluded.price_sum,
+        stock_quantity_sum =
+            product_stats.stock_quantity_sum + excluded.stock_quantity_sum,
+        inventory_value = product_stats.inventory_value + excluded.inventory_value;
+"""
+
+PREVIOUS_STATS_REMOVE = """
+    UPDATE product_stats SET
+        product_count = product_count - 1,
+        price_sum = price_sum - {row}price,
+        stock_quantity_sum = stock_quantity_sum - {row}stock_quantity,
+        inventory_value = inventory_value - {row}price * {row}stock_quantity
+    WHERE status = CAST({row}status AS TEXT);
+"""
+
+PREVIOUS_REBUILD = [
+    "DELETE FROM product_stats",
+    "DELETE FROM product_price_histogram",
+    """
+    INSERT INTO product_stats
+        (status, product_count, price_sum, stock_quantity_sum, inventory_value)
+    SELECT CAST(status AS TEXT), COUNT(*), SUM(price), SUM(stock_quantity),
+        SUM(price * stock_quantity)
+    FROM products GROUP BY status
+    """,
+    HISTOGRAM_REBUILD,
+]
+
+PREVIOUS_SQLITE_CREATE = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_insert AFTER INSERT ON products BEGIN
+        {PREVIOUS_STATS_ADD.format(row="new.")}
+        {HISTOGRAM_ADD.format(row="new.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_delete AFTER DELETE ON products BEGIN
+        {PREVIOUS_STATS_REMOVE.format(row="old.")}
+        {HISTOGRAM_REMOVE.format(row="old.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_update
+    AFTER UPDATE OF status, price, stock_quantity ON products BEGIN
+        {PREVIOUS_STATS_REMOVE.format(row="old.")}
+        {HISTOGRAM_REMOVE.format(row="old.")}
+        {PREVIOUS_STATS_ADD.format(row="new.")}
+        {HISTOGRAM_ADD.format(row="new.")}
+    END
+    """,
+    *PREVIOUS_REBUILD,
+]
+
+PREVIOUS_POSTGRES_CREATE = [
+    f"""
+    CREATE OR REPLACE FUNCTION products_stats_update() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {PREVIOUS_STATS_REMOVE.format(row="OLD.")}
+            {HISTOGRAM_REMOVE.format(row="OLD.")}
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {PREVIOUS_STATS_ADD.format(row="NEW.")}
+            {HISTOGRAM_ADD.format(row="NEW.")}
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    *PREVIOUS_REBUILD,
+]
+
+# O trigger do PostgreSQL não muda: só a função que ele executa
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS products_price_histogram_update",
+    "DROP TRIGGER IF EXISTS products_stats_update",
+    "DROP TRIGGER IF EXISTS products_stats_delete",
+    "DROP TRIGGER IF EXISTS products_stats_insert",
+]
+
+
+def run(statements):
+    connection = op.get_bind()
+    for statement in statements.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+def create_stats_table(sharded: bool):
+    shard = [sa.Column("shard", sa.Integer(), autoincrement=False, nullable=False)]
+    op.create_table(
+        "product_stats",
+        sa.Column("status", sa.String(length=32), nullable=False),
+        *(shard if sharded else []),
+        sa.Column("product_count", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column("price_sum", sa.Numeric(), server_default="0", nullable=False),
+        sa.Column(
+            "stock_quantity_sum", sa.BigInteger(), server_default="0", nullable=False
+        ),
+        sa.Column("inventory_value", sa.Numeric(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("status", *(["shard"] if sharded else [])),
+    )
+
+
+def upgrade() -> None:
+    run({"sqlite": SQLITE_DROP})
+    # Os agregados são recalculados a partir de 'products' (REBUILD)
+    op.drop_table("product_stats")
+    create_stats_table(sharded=True)
+    run({"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE})
+
+    # As novas linhas começam em 0: a soma continua igual à versão atual
+    product_catalog = sa.table("product_catalog", sa.column("id", sa.Integer))
+    op.bulk_insert(product_catalog, [{"id": 1 + shard} for shard in range(1, SHARDS)])
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    # Junta as linhas do contador na primeira, mantendo a versão somada
+    connection.exec_driver_sql(
+        "UPDATE product_catalog SET "
+        "version = (SELECT SUM(version) FROM product_catalog), "
+        "updated_at = (SELECT MAX(updated_at) FROM product_catalog) "
+        "WHERE id = 1"
+    )
+    connection.exec_driver_sql("DELETE FROM product_catalog WHERE id <> 1")
+
+    run({"sqlite": SQLITE_DROP})
+    op.drop_table("product_stats")
+    create_stats_table(sharded=False)
+    run({"sqlite": PREVIOUS_SQLITE_CREATE, "postgresql": PREVIOUS_POSTGRES_CREATE})
@@ -0,0 +1,273 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, Optional
+
+from app.config import get_settings
+from app.schemas import product_schema
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_fills = 0
+
+    def record(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_fills": self.stale_fills,
+            }
+
+
+class ProductCache(ABC):
+    """
+    Interface of the product caches: keys are product ids.
+
+    A read-through fill takes a token with fill_token() before reading the
+    row and passes it to set(): if the product was invalidated in between (a
+    write committed after the read), the row read may be outdated and is not
+    cached.
+    """
+
+    # Chamadas com I/O de rede: o caminho assíncrono as executa fora do loop
+    blocking = False
+
+    def __init__(self):
+        self.metrics = CacheStats()
+
+    @abstractmethod
+    def get(self, product_id: int) -> Optional[product_schema.Product]: ...
+
+    @abstractmethod
+    def fill_token(self, product_id: int) -> Hashable: ...
+
+    @abstractmethod
+    def set(self, product: product_schema.Product, token: Hashable = None):
+        """Caches 'product'; with a 'token', only if it is still current."""
+
+    @abstractmethod
+    def invalidate(self, product_id: int): ...
+
+    def invalidate_many(self, product_ids: Iterable[int]):
+        for product_id in product_ids:
+            self.invalidate(product_id)
+
+    @abstractmethod
+    def clear(self): ...
+
+    def stats(self) -> dict:
+        return self.metrics.as_dict()
+
+
+class NullProductCache(ProductCache):
+    def get(self, product_id: int) -> Optional[product_schema.Product]:
+        self.metrics.record("misses")
+        return None
+
+    def fill_token(self, product_id: int) -> Hashable:
+        return None
+
+    def set(self, product: product_schema.Product, token: Hashable = None):
+        pass
+
+    def invalidate(self, product_id: int):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUProductCache(ProductCache):
+    """In-process LRU cache whose entries expire 'ttl' seconds after being set."""
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Número da última invalidação de cada produto, limitado a max_size
+        # ids; '_forgotten' é a mais recente das que foram descartadas
+        self._sequence = 0
+        self._invalidated = OrderedDict()
+        self._forgotten = 0
+
+    def get(self, product_id: int) -> Optional[product_schema.Product]:
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[product_id]
+                self.metrics.record("expirations")
+                entry = None
+            if entry is None:
+                self.metrics.record("misses")
+                return None
+            self._entries.move_to_end(product_id)
+            self.metrics.record("hits")
+            return entry[1]
+
+    def fill_token(self, product_id: int) -> Hashable:
+        with self._lock:
+            return self._sequence
+
+    def set(self, product: product_schema.Product, token: Hashable = None):
+        with self._lock:
+            if (
+                token is not None
+                and self._invalidated.get(product.id, self._forgotten) > token
+            ):
+                self.metrics.record("stale_fills")
+                return
+            self._entries[product.id] = (self._clock() + self.ttl, product)
+            self._entries.move_to_end(product.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.metrics.record("evictions")
+
+    def invalidate(self, product_id: int):
+        with self._lock:
+            self._entries.pop(product_id, None)
+            self._sequence += 1
+            self._invalidated[product_id] = self._sequence
+            self._invalidated.move_to_end(product_id)
+            if len(self._invalidated) > self.max_size:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sequence += 1
+            self._invalidated.clear()
+            self._forgotten = self._sequence
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats["size"] = len(self._entries)
+        return stats
+
+
+# Grava a entrada só se a geração do produto ainda for a lida antes da consulta
+FILL_SCRIPT = """
+if (redis.call('get', KEYS[1]) or '0') == ARGV[1] then
+    redis.call('set', KEYS[2], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Gerações de produtos sem escritas recentes expiram; uma leitura não dura tanto
+GENERATION_TTL = 86400
+
+
+class SharedProductCache(ProductCache):
+    """
+    Cache shared between processes, backed by any Redis-compatible client
+    (get, set with 'ex', delete, pipelines and scripts). Entries are stored
+    as JSON. Every invalidation bumps a generation counter of the product,
+    which a fill checks atomically (FILL_SCRIPT) before writing its entry.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        client,
+        ttl: float,
+        prefix: str = "product:",
+        generation_prefix: str = "product-generation:",
+    ):
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.generation_prefix = generation_prefix
+        self._fill = client.register_script(FILL_SCRIPT)
+
+    def _key(self, product_id: int) -> str:
+        return f"{self.prefix}{product_id}"
+
+    def _generation_key(self, product_id: int) -> str:
+        return f"{self.generation_prefix}{product_id}"
+
+    def get(self, product_id: int) -> Optional[product_schema.Product]:
+        raw = self.client.get(self._key(product_id))
+        if raw is None:
+            self.metrics.record("misses")
+            return None
+        self.metrics.record("hits")
+        return product_schema.Product.model_validate_json(raw)
+
+    def fill_token(self, product_id: int) -> Hashable:
+        generation = self.client.get(self._generation_key(product_id))
+        return generation.decode() if generation is not None else "0"
+
+    def set(self, product: product_schema.Product, token: Hashable = None):
+        key, value = self._key(product.id), product.model_dump_json()
+        ttl = max(1, int(self.ttl))
+        if token is None:
+            self.client.set(key, value, ex=ttl)
+            return
+        keys = [self._generation_key(product.id), key]
+        if not self._fill(keys=keys, args=[token, value, ttl]):
+            self.metrics.record("stale_fills")
+
+    def invalidate(self, product_id: int):
+        self.invalidate_many([product_id])
+
+    def invalidate_many(self, product_ids: Iterable[int]):
+        # Uma ida ao servidor para o lote inteiro
+        pipeline = self.client.pipeline()
+        for product_id in product_ids:
+            pipeline.incr(self._generation_key(product_id))
+            pipeline.expire(self._generation_key(product_id), GENERATION_TTL)
+            pipeline.delete(self._key(product_id))
+        pipeline.execute()
+
+    def clear(self):
+        # Remove apenas as chaves de produto, sem limpar o restante do servidor
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+
+def build_product_cache() -> ProductCache:
+    """Builds the product cache selected by PRODUCT_CACHE_BACKEND."""
+    settings = get_settings()
+    backend = settings.product_cache_backend
+    if backend == "none":
+        return NullProductCache()
+    if backend == "memory":
+        return LRUProductCache(
+            max_size=settings.product_cache_max_size, ttl=settings.product_cache_ttl
+        )
+    if backend == "redis":
+        try:
+            import redis
+        except ImportError:
+            raise ValueError(
+                "O backend de cache 'redis' requer o pacote 'redis' instalado."
+            )
+        return SharedProductCache(
+            redis.Redis.from_url(settings.product_cache_url),
+            ttl=settings.product_cache_ttl,
+        )
+    raise ValueError(f"Backend de cache desconhecido: '{backend}'.")
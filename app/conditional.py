@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Validadores são objetos com 'version' e 'updated_at': o produto (ORM ou
+# schema), uma linha (version, updated_at) ou a linha de product_catalog
+
+
+def etag(validator) -> str:
+    """
+    Strong ETag. The timestamp tells apart rows that reuse an id after a
+    delete, which would otherwise restart at the same version.
+    """
+    updated_at = validator.updated_at.replace(tzinfo=timezone.utc)
+    return f'"{validator.version}-{int(updated_at.timestamp() * 1_000_000):x}"'
+
+
+def last_modified(validator) -> str:
+    return format_datetime(
+        validator.updated_at.replace(tzinfo=timezone.utc), usegmt=True
+    )
+
+
+def validator_headers(validator) -> dict:
+    return {"ETag": etag(validator), "Last-Modified": last_modified(validator)}
+
+
+def _etag_list(header: str) -> list:
+    return [value.strip() for value in header.split(",") if value.strip()]
+
+
+def etag_matches(header: str, validator, weak: bool = False) -> bool:
+    """
+    Compares an If-Match / If-None-Match header with the current ETag.
+    If-None-Match uses the weak comparison (W/ prefixes are ignored).
+    """
+    current = etag(validator)
+    for value in _etag_list(header):
+        if value == "*":
+            return True
+        if weak and value.startswith("W/"):
+            value = value[2:]
+        if value == current:
+            return True
+    return False
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_conditional(request: Request) -> bool:
+    headers = request.headers
+    return "if-none-match" in headers or "if-modified-since" in headers
+
+
+def not_modified(request: Request, validator) -> bool:
+    """
+    True when the client copy is still fresh. If-None-Match takes precedence
+    over If-Modified-Since, which only has one-second resolution.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, validator, weak=True)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        since = _parse_http_date(if_modified_since)
+        if since is None or since.tzinfo is None:
+            return False
+        updated_at = validator.updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+        return updated_at <= since
+    return False
+
+
+def not_modified_response(validator) -> Response:
+    return Response(status_code=304, headers=validator_headers(validator))
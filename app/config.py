@@ -0,0 +1,242 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _env_list(name: str, default: Tuple[str, ...] = ()) -> Tuple[str, ...]:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Caminho de acesso ao banco SQL (sync | async)
+    database_mode: str
+    # Banco primário (escritas) e réplicas de leitura (SQLite ou PostgreSQL)
+    database_url: str
+    async_database_url: Optional[str]
+    database_replica_urls: Tuple[str, ...]
+    # Pool de conexões do SQLAlchemy
+    sql_pool_size: int
+    sql_max_overflow: int
+    sql_pool_timeout: float
+    sql_pool_recycle: int
+    sql_pool_pre_ping: bool
+    # Perfil do SQLite, aplicado em cada conexão (PRAGMAs)
+    sqlite_journal_mode: str
+    sqlite_synchronous: str
+    sqlite_busy_timeout_ms: int
+    sqlite_mmap_size: int
+    sqlite_cache_size: int
+    sqlite_temp_store: str
+    # Engine somente leitura separada para os endpoints GET
+    sqlite_read_only_engine: bool
+    # Pipeline de logs de visualização (fila em memória + flusher em background)
+    view_log_queue_size: int
+    view_log_batch_size: int
+    view_log_flush_interval: float
+    view_log_enqueue_timeout: float
+    # Outbox local (arquivo SQLite) entre a fila e o MongoDB; vazio desativa.
+    # Tempo de posse de um lote pelo relay e espera entre tentativas (dobra a
+    # cada falha, até o máximo)
+    view_log_outbox_path: str
+    view_log_relay_lease: float
+    view_log_relay_retry_delay: float
+    view_log_relay_max_retry_delay: float
+    # Política de registro: amostragem por rota (1 a cada N requisições, cada
+    # evento valendo N), o que uma listagem registra (views | impressions |
+    # none) e deduplicação por (cliente, produto) numa janela (s; 0 desativa)
+    view_detail_sample_every: int
+    view_list_sample_every: int
+    view_list_events: str
+    view_dedup_window: float
+    view_dedup_capacity: int
+    view_dedup_error_rate: float
+    # Retenção (TTL) dos logs brutos (time-series) e dos buckets por minuto;
+    # 0 mantém os documentos para sempre
+    view_log_retention_days: int
+    view_minute_bucket_retention_hours: int
+    # Jobs de remoção dos logs de produtos excluídos: documentos por lote,
+    # tentativas, espera inicial entre elas (dobra a cada falha), tempo para
+    # retomar um job de um processo que parou e intervalo de verificação
+    log_purge_batch_size: int
+    log_purge_max_attempts: int
+    log_purge_retry_delay: float
+    log_purge_lease: float
+    log_purge_poll_interval: float
+    # Linhas por bloco na exportação do catálogo
+    export_chunk_size: int
+    # Produtos gravados por transação na importação
+    import_chunk_size: int
+    # Pool e timeouts dos clientes do MongoDB (síncrono e assíncrono)
+    mongodb_max_pool_size: int
+    mongodb_min_pool_size: int
+    mongodb_connect_timeout_ms: int
+    mongodb_server_selection_timeout_ms: int
+    mongodb_socket_timeout_ms: Optional[int]
+    # Cache de produtos (memory | redis | none)
+    product_cache_backend: str
+    product_cache_max_size: int
+    product_cache_ttl: float
+    product_cache_url: Optional[str]
+    # Pipeline de resposta: serializador JSON (orjson | json), validação das
+    # respostas pelo response_model e compressão negociada (br, gzip)
+    json_renderer: str
+    response_validation: bool
+    compression_encodings: Tuple[str, ...]
+    compression_minimum_size: int
+    compression_gzip_level: int
+    compression_brotli_quality: int
+    # Instrumentação: /metrics (Prometheus), cabeçalho Server-Timing e limite
+    # (ms) para registrar comandos SQL lentos no log
+    metrics_enabled: bool
+    server_timing: bool
+    slow_query_threshold_ms: float
+    # Diretório onde cada worker grava as suas métricas, somadas no /metrics,
+    # e intervalo (s) entre as gravações
+    metrics_multiprocess_dir: Optional[str]
+    metrics_multiprocess_interval: float
+    # Servidor de produção (gunicorn.conf.py): porta, workers uvicorn,
+    # keep-alive (s), fila de conexões pendentes, timeouts (s) e reciclagem
+    # dos workers após N requisições (0 desativa)
+    app_port: int
+    web_concurrency: int
+    server_keepalive: int
+    server_backlog: int
+    server_timeout: int
+    server_graceful_timeout: int
+    server_max_requests: int
+    server_max_requests_jitter: int
+    # Startup: relatório do tempo de cada fase no log e meta (s) do início do
+    # processo até o app ficar pronto, acima da qual um aviso é registrado
+    startup_profile: bool
+    startup_target_seconds: float
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """Reads the application settings from the environment (once per process)."""
+    return Settings(
+        database_mode=os.getenv("DATABASE_MODE", "sync"),
+        database_url=os.getenv("DATABASE_URL") or os.getenv("SQLITE_URL"),
+        async_database_url=os.getenv("ASYNC_DATABASE_URL"),
+        database_replica_urls=_env_list("DATABASE_REPLICA_URLS"),
+        sql_pool_size=_env_int("SQL_POOL_SIZE", 5),
+        sql_max_overflow=_env_int("SQL_MAX_OVERFLOW", 10),
+        sql_pool_timeout=_env_float("SQL_POOL_TIMEOUT", 30.0),
+        sql_pool_recycle=_env_int("SQL_POOL_RECYCLE", -1),
+        sql_pool_pre_ping=_env_bool("SQL_POOL_PRE_PING", True),
+        sqlite_journal_mode=os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        sqlite_synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        sqlite_busy_timeout_ms=_env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+        sqlite_mmap_size=_env_int("SQLITE_MMAP_SIZE", 268435456),
+        sqlite_cache_size=_env_int("SQLITE_CACHE_SIZE", -64000),
+        sqlite_temp_store=os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+        sqlite_read_only_engine=_env_bool("SQLITE_READ_ONLY_ENGINE", True),
+        view_log_queue_size=_env_int("VIEW_LOG_QUEUE_SIZE", 10000),
+        view_log_batch_size=_env_int("VIEW_LOG_BATCH_SIZE", 500),
+        view_log_flush_interval=_env_float("VIEW_LOG_FLUSH_INTERVAL", 1.0),
+        view_log_enqueue_timeout=_env_float("VIEW_LOG_ENQUEUE_TIMEOUT", 0.0),
+        view_log_outbox_path=os.getenv("VIEW_LOG_OUTBOX_PATH", "./db/view_outbox.db"),
+        view_log_relay_lease=_env_float("VIEW_LOG_RELAY_LEASE", 60.0),
+        view_log_relay_retry_delay=_env_float("VIEW_LOG_RELAY_RETRY_DELAY", 1.0),
+        view_log_relay_max_retry_delay=_env_float(
+            "VIEW_LOG_RELAY_MAX_RETRY_DELAY", 60.0
+        ),
+        view_detail_sample_every=_env_int("VIEW_DETAIL_SAMPLE_EVERY", 1),
+        view_list_sample_every=_env_int("VIEW_LIST_SAMPLE_EVERY", 1),
+        view_list_events=os.getenv("VIEW_LIST_EVENTS", "views"),
+        view_dedup_window=_env_float("VIEW_DEDUP_WINDOW", 0.0),
+        view_dedup_capacity=_env_int("VIEW_DEDUP_CAPACITY", 1000000),
+        view_dedup_error_rate=_env_float("VIEW_DEDUP_ERROR_RATE", 0.01),
+        view_log_retention_days=_env_int("VIEW_LOG_RETENTION_DAYS", 30),
+        view_minute_bucket_retention_hours=_env_int(
+            "VIEW_MINUTE_BUCKET_RETENTION_HOURS", 48
+        ),
+        log_purge_batch_size=_env_int("LOG_PURGE_BATCH_SIZE", 1000),
+        log_purge_max_attempts=_env_int("LOG_PURGE_MAX_ATTEMPTS", 5),
+        log_purge_retry_delay=_env_float("LOG_PURGE_RETRY_DELAY", 30.0),
+        log_purge_lease=_env_float("LOG_PURGE_LEASE", 600.0),
+        log_purge_poll_interval=_env_float("LOG_PURGE_POLL_INTERVAL", 5.0),
+        export_chunk_size=_env_int("EXPORT_CHUNK_SIZE", 1000),
+        import_chunk_size=_env_int("IMPORT_CHUNK_SIZE", 1000),
+        mongodb_max_pool_size=_env_int("MONGODB_MAX_POOL_SIZE", 100),
+        mongodb_min_pool_size=_env_int("MONGODB_MIN_POOL_SIZE", 0),
+        mongodb_connect_timeout_ms=_env_int("MONGODB_CONNECT_TIMEOUT_MS", 20000),
+        mongodb_server_selection_timeout_ms=_env_int(
+            "MONGODB_SERVER_SELECTION_TIMEOUT_MS", 30000
+        ),
+        mongodb_socket_timeout_ms=_env_optional_int("MONGODB_SOCKET_TIMEOUT_MS"),
+        product_cache_backend=os.getenv("PRODUCT_CACHE_BACKEND", "memory"),
+        product_cache_max_size=_env_int("PRODUCT_CACHE_MAX_SIZE", 10000),
+        product_cache_ttl=_env_float("PRODUCT_CACHE_TTL", 60.0),
+        product_cache_url=os.getenv("PRODUCT_CACHE_URL"),
+        json_renderer=os.getenv("JSON_RENDERER", "orjson"),
+        response_validation=_env_bool("RESPONSE_VALIDATION", False),
+        compression_encodings=_env_list("COMPRESSION_ENCODINGS", ("br", "gzip")),
+        compression_minimum_size=_env_int("COMPRESSION_MINIMUM_SIZE", 1024),
+        compression_gzip_level=_env_int("COMPRESSION_GZIP_LEVEL", 6),
+        compression_brotli_quality=_env_int("COMPRESSION_BROTLI_QUALITY", 4),
+        metrics_enabled=_env_bool("METRICS_ENABLED", True),
+        server_timing=_env_bool("SERVER_TIMING", False),
+        slow_query_threshold_ms=_env_float("SLOW_QUERY_THRESHOLD_MS", 200.0),
+        metrics_multiprocess_dir=os.getenv("METRICS_MULTIPROCESS_DIR") or None,
+        metrics_multiprocess_interval=_env_float("METRICS_MULTIPROCESS_INTERVAL", 5.0),
+        app_port=_env_int("APP_PORT", 8000),
+        web_concurrency=_env_int("WEB_CONCURRENCY", os.cpu_count() or 1),
+        server_keepalive=_env_int("SERVER_KEEPALIVE", 5),
+        server_backlog=_env_int("SERVER_BACKLOG", 2048),
+        server_timeout=_env_int("SERVER_TIMEOUT", 30),
+        server_graceful_timeout=_env_int("SERVER_GRACEFUL_TIMEOUT", 30),
+        server_max_requests=_env_int("SERVER_MAX_REQUESTS", 0),
+        server_max_requests_jitter=_env_int("SERVER_MAX_REQUESTS_JITTER", 0),
+        startup_profile=_env_bool("STARTUP_PROFILE", False),
+        startup_target_seconds=_env_float("STARTUP_TARGET_SECONDS", 5.0),
+    )
+
+
+def check_worker_settings(settings: Settings, workers: int):
+    """
+    Rejects the settings that only work within a single process when the
+    server runs several workers.
+    """
+    if workers <= 1:
+        return
+    # A invalidação só alcançaria o cache do worker que fez a escrita
+    if settings.product_cache_backend == "memory":
+        raise ValueError(
+            "PRODUCT_CACHE_BACKEND=memory mantém um cache por processo: com "
+            f"{workers} workers, use 'redis' ou 'none'."
+        )
+    if settings.metrics_enabled and not settings.metrics_multiprocess_dir:
+        raise ValueError(
+            "Com vários workers, o /metrics precisa de METRICS_MULTIPROCESS_DIR "
+            "para somar as métricas de todos eles (ou METRICS_ENABLED=false)."
+        )
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.controllers import product_controller
+from app.crud import async_job_crud, job_crud
+from app.database import dependencies
+from app.schemas import job_schema, product_schema
+
+
+class AdminController:
+    def __init__(self, products: product_controller.ProductController):
+        self.router = APIRouter(prefix="/admin")
+        # Os clientes do MongoDB são os do controlador de produtos (lifespan)
+        self.products = products
+
+        self.router.add_api_route(
+            "/view-logs",
+            self.get_view_log_stats,
+            methods=["GET"],
+            response_model=product_schema.ViewLogStats,
+            status_code=200,
+        )
+        self.router.add_api_route(
+            "/jobs/{job_id}",
+            self.get_job,
+            methods=["GET"],
+            response_model=job_schema.Job,
+            status_code=200,
+        )
+
+    def get_view_log_stats(self) -> product_schema.ViewLogStats:
+        """Size of the view log collections and usage of each of their indexes."""
+        return self.products.product_log_client.get_storage_stats()
+
+    def get_job(
+        self, job_id: int, db: Session = Depends(dependencies.get_read_db)
+    ) -> job_schema.Job:
+        """Status of a background job, such as a deleted product's log purge."""
+        return job_crud.get_job(db=db, job_id=job_id)
+
+
+class AsyncAdminController(AdminController):
+    async def get_view_log_stats(self) -> product_schema.ViewLogStats:
+        return await self.products.product_log_client.get_storage_stats()
+
+    async def get_job(
+        self, job_id: int, db: AsyncSession = Depends(dependencies.get_async_read_db)
+    ) -> job_schema.Job:
+        return await async_job_crud.get_job(db=db, job_id=job_id)
+
+
+def build_admin_controller(
+    products: product_controller.ProductController,
+) -> AdminController:
+    if isinstance(products, product_controller.AsyncProductController):
+        return AsyncAdminController(products)
+    return AdminController(products)
+
+
+admin_controller = build_admin_controller(product_controller.product_controller)
@@ -0,0 +1,105 @@
+import logging
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import startup
+from app.controllers import product_controller
+from app.database import dependencies
+from app.schemas import health_schema
+
+logger = logging.getLogger(__name__)
+
+DATABASE_CHECK = text("SELECT 1")
+
+
+class HealthController:
+    """
+    Probes for the process manager and load balancer: liveness (the process
+    answers) and readiness (startup finished and the database is reachable).
+    """
+
+    def __init__(self, products: product_controller.ProductController):
+        self.router = APIRouter(prefix="/health")
+        # O estado dos índices do MongoDB vem do controlador de produtos
+        self.products = products
+
+        self.router.add_api_route(
+            "/live",
+            self.get_liveness,
+            methods=["GET"],
+            response_model=health_schema.Liveness,
+            status_code=200,
+        )
+        self.router.add_api_route(
+            "/ready",
+            self.get_readiness,
+            methods=["GET"],
+            response_model=health_schema.Readiness,
+            responses={503: {"model": health_schema.Readiness}},
+            status_code=200,
+        )
+
+    def get_liveness(self) -> health_schema.Liveness:
+        """Answers while the process runs, even during startup and shutdown."""
+        return health_schema.Liveness(status=startup.profile.state)
+
+    def readiness_response(self, database: str):
+        profile = startup.profile
+        status = profile.state
+        if status == startup.READY and database != "ok":
+            status = "unavailable"
+        readiness = health_schema.Readiness(
+            status=status,
+            startup_seconds=profile.startup_seconds,
+            checks={
+                "database": database,
+                # Informativo: sem os índices a API funciona, e os eventos
+                # aguardam na outbox
+                "view_log_indexes": self.products.view_log_indexes_state(),
+            },
+        )
+        if status != startup.READY:
+            return JSONResponse(status_code=503, content=readiness.model_dump())
+        return readiness
+
+    def get_readiness(self, db: Session = Depends(dependencies.get_db)):
+        database = "pending"
+        if startup.profile.state == startup.READY:
+            try:
+                db.execute(DATABASE_CHECK)
+                database = "ok"
+            except SQLAlchemyError:
+                logger.warning("Readiness check failed", exc_info=True)
+                database = "unavailable"
+        return self.readiness_response(database)
+
+
+class AsyncHealthController(HealthController):
+    async def get_readiness(
+        self, db: AsyncSession = Depends(dependencies.get_async_db)
+    ):
+        database = "pending"
+        if startup.profile.state == startup.READY:
+            try:
+                await db.execute(DATABASE_CHECK)
+                database = "ok"
+            except SQLAlchemyError:
+                logger.warning("Readiness check failed", exc_info=True)
+                database = "unavailable"
+        return self.readiness_response(database)
+
+
+def build_health_controller(
+    products: product_controller.ProductController,
+) -> HealthController:
+    if isinstance(products, product_controller.AsyncProductController):
+        return AsyncHealthController(products)
+    return HealthController(products)
+
+
+health_controller = build_health_controller(product_controller.product_controller)
@@ -0,0 +1,77 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app import metrics, startup
+from app.config import get_settings
+from app.controllers import product_controller
+from app.crud import product_crud
+from app.database import sql
+
+# Versão do formato de exposição em texto do Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def pipeline_stats():
+    pipeline = product_controller.product_controller.view_log_pipeline
+    return pipeline.stats() if pipeline is not None else None
+
+
+def view_policy_stats():
+    return product_controller.product_controller.view_policy.stats()
+
+
+class MetricsController:
+    def __init__(self, registry: metrics.Registry = metrics.registry):
+        self.router = APIRouter()
+        self.registry = registry
+        # Com vários workers: métricas somadas a partir de METRICS_MULTIPROCESS_DIR
+        self.multiprocess = None
+
+        self.router.add_api_route(
+            "/metrics",
+            self.get_metrics,
+            methods=["GET"],
+            response_class=PlainTextResponse,
+            include_in_schema=False,
+        )
+
+    def register_collectors(self):
+        """
+        Values read at scrape time: pools, product cache, view log queue and
+        startup timings.
+        """
+        self.registry.add_collector(metrics.pool_collector(sql.all_engines))
+        self.registry.add_collector(
+            metrics.stats_collector(
+                "product_cache", product_crud.product_cache.stats, gauges=("size",)
+            )
+        )
+        self.registry.add_collector(
+            metrics.stats_collector(
+                "view_log_pipeline",
+                pipeline_stats,
+                gauges=("queued", "outbox_pending", "outbox_lag_seconds"),
+            )
+        )
+        self.registry.add_collector(
+            metrics.stats_collector("view_policy", view_policy_stats)
+        )
+        self.registry.add_collector(startup.profile.collect)
+
+    def startup(self):
+        if get_settings().metrics_multiprocess_dir:
+            self.multiprocess = metrics.MultiprocessMetrics.from_settings(self.registry)
+            self.multiprocess.start()
+
+    def shutdown(self):
+        # O último snapshot fica no diretório até o servidor marcá-lo como encerrado
+        if self.multiprocess is not None:
+            self.multiprocess.stop()
+            self.multiprocess = None
+
+    def get_metrics(self):
+        source = self.multiprocess or self.registry
+        return PlainTextResponse(source.render(), media_type=CONTENT_TYPE)
+
+
+metrics_controller = MetricsController()
@@ -1,18 +1,62 @@
-from typing import List
+import asyncio
+import logging
+from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pymongo.errors import PyMongoError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.crud import product_crud
-from app.database import dependencies, mongodb
+from app import conditional, export, importer, responses, startup, view_policy
+from app.config import get_settings
+from app.crud import async_product_crud, product_crud
+from app.database import (
+    dependencies,
+    log_purge,
+    mongodb,
+    sql,
+    view_log_pipeline,
+    view_outbox,
+)
 from app.schemas import product_schema
 
+logger = logging.getLogger(__name__)
+
+
+def export_response(content, export_format: product_schema.ExportFormat):
+    return StreamingResponse(
+        content,
+        media_type=export.MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="products.{export_format.value}"'
+        },
+    )
+
+
+def stock_adjusted(results: List[product_schema.ProductBulkResult]) -> bool:
+    return all(result.status == "adjusted" for result in results)
+
 
 class ProductController:
-    def __init__(self):
+    def __init__(self, validate_responses: Optional[bool] = None):
         self.router = APIRouter(prefix="/products")
-        # MongoClient para gerar log de visualização
-        self.product_log_client = mongodb.ProductLogClient()
+        # MongoClient para gerar log de visualização e fila de eventos de
+        # visualização gravados em lote. Criados no lifespan (startup).
+        self.product_log_client = None
+        self.view_log_pipeline = None
+        # Amostragem, impressões e deduplicação antes da fila de eventos
+        self.view_policy = view_policy.ViewPolicy.from_settings()
+        # Worker dos jobs de remoção dos logs de produtos excluídos
+        self.log_purge_worker = None
+        # Criação dos índices do MongoDB, em background a partir do startup
+        self.view_log_indexes = None
+        # Linhas lidas do banco já são válidas: por padrão as leituras são
+        # serializadas direto, sem passar de novo pelo response_model
+        if validate_responses is None:
+            validate_responses = get_settings().response_validation
+        self.validate_responses = validate_responses
 
         self.router.add_api_route(
             "/",
@@ -24,6 +68,66 @@ class ProductController:
         self.router.add_api_route(
             "/", self.get_products, methods=["GET"], status_code=200
         )
+        # Rotas fixas registradas antes de "/{product_id}"
+        self.router.add_api_route(
+            "/bulk",
+            self.bulk_create_products,
+            methods=["POST"],
+            response_model=product_schema.ProductBulkResponse,
+            status_code=201,
+        )
+        self.router.add_api_route(
+            "/bulk",
+            self.bulk_update_products,
+            methods=["PATCH"],
+            response_model=product_schema.ProductBulkResponse,
+            status_code=200,
+        )
+        self.router.add_api_route(
+            "/bulk",
+            self.bulk_delete_products,
+            methods=["DELETE"],
+            response_model=product_schema.ProductBulkResponse,
+            status_code=200,
+        )
+        self.router.add_api_route(
+            "/bulk/stock/adjust",
+            self.bulk_adjust_stock,
+            methods=["POST"],
+            response_model=product_schema.ProductBulkResponse,
+            status_code=200,
+        )
+        self.router.add_api_route(
+            "/export",
+            self.export_products,
+            methods=["GET"],
+            response_class=StreamingResponse,
+            status_code=200,
+        )
+        self.router.add_api_route(
+            "/search", self.search_products, methods=["GET"], status_code=200
+        )
+        self.router.add_api_route(
+            "/stats",
+            self.get_product_stats,
+            methods=["GET"],
+            response_model=product_schema.ProductStats,
+            status_code=200,
+        )
+        self.router.add_api_route(
+            "/views/top",
+            self.get_top_viewed_products,
+            methods=["GET"],
+            response_model=List[product_schema.ProductViewCount],
+            status_code=200,
+        )
+        self.router.add_api_route(
+            "/import",
+            self.import_products,
+            methods=["POST"],
+            response_model=product_schema.ProductImportSummary,
+            status_code=200,
+        )
         self.router.add_api_route(
             "/{product_id}",
             self.get_product,
@@ -45,78 +149,667 @@ class ProductController:
             response_model=product_schema.Product,
             status_code=200,
         )
+        self.router.add_api_route(
+            "/{product_id}/stock/adjust",
+            self.adjust_stock,
+            methods=["POST"],
+            response_model=product_schema.Product,
+            status_code=200,
+        )
         self.router.add_api_route(
             "/{product_id}/views",
             self.get_product_view_report,
             methods=["GET"],
             status_code=200,
         )
+        self.router.add_api_route(
+            "/{product_id}/views/histogram",
+            self.get_product_view_histogram,
+            methods=["GET"],
+            response_model=product_schema.ProductViewHistogram,
+            status_code=200,
+        )
+
+    def products_response(self, db_products, response: Response):
+        """
+        Returns the rows for FastAPI to validate against the response model,
+        or renders them directly when response validation is off.
+        """
+        if self.validate_responses:
+            return db_products
+        if isinstance(db_products, list):
+            content = [responses.product_row(db_product) for db_product in db_products]
+        else:
+            content = responses.product_row(db_products)
+        return responses.render(content, headers=response.headers)
+
+    def log_views(self, request: Request, route: str, product_ids: List[int]):
+        """Queues the view events that the view policy keeps."""
+        kind, weight, selected = self.view_policy.select(
+            route, view_policy.client_key(request), product_ids
+        )
+        if selected:
+            self.view_log_pipeline.submit_many(selected, kind, weight)
+
+    def view_report_response(self, db_product, counters, product_views):
+        number_of_views, number_of_impressions = counters
+        if self.validate_responses:
+            return {
+                "product": db_product,
+                "number_of_views": number_of_views,
+                "number_of_impressions": number_of_impressions,
+                "views": product_views,
+            }
+        return responses.render(
+            {
+                "product": responses.product_row(db_product),
+                "number_of_views": number_of_views,
+                "number_of_impressions": number_of_impressions,
+                "views": responses.view_rows(product_views),
+            }
+        )
+
+    async def startup(self, environment: str = None):
+        with startup.profile.phase("view_log_client"):
+            # O MongoClient conecta em background: nenhuma espera aqui
+            self.product_log_client = mongodb.ProductLogClient(environment)
+        # Índices em background: um MongoDB lento ou fora do ar não atrasa o
+        # startup, os eventos aguardam na outbox
+        self.view_log_indexes = asyncio.create_task(self.ensure_view_log_indexes())
+        with startup.profile.phase("view_log_pipeline"):
+            self.view_log_pipeline = view_log_pipeline.ViewLogPipeline.from_settings(
+                self.product_log_client,
+                view_outbox.ViewOutbox.from_settings(environment),
+            )
+            self.view_log_pipeline.start()
+        with startup.profile.phase("log_purge_worker"):
+            self.log_purge_worker = log_purge.LogPurgeWorker.from_settings(
+                self.product_log_client, sql.SessionLocal
+            )
+            self.log_purge_worker.start()
+
+    async def ensure_view_log_indexes(self) -> bool:
+        try:
+            with startup.profile.phase("view_log_indexes"):
+                await run_in_threadpool(self.product_log_client.ensure_indexes)
+        except PyMongoError:
+            # Aplicados de novo no próximo startup
+            logger.exception("Failed to create the view log indexes")
+            return False
+        return True
+
+    def view_log_indexes_state(self) -> str:
+        """'pending', 'ok' or 'failed': the background view log index setup."""
+        task = self.view_log_indexes
+        if task is None or not task.done():
+            return "pending"
+        return "ok" if not task.cancelled() and task.result() else "failed"
+
+    async def shutdown(self):
+        if self.view_log_indexes is not None:
+            self.view_log_indexes.cancel()  # Sem efeito se já terminou
+        await run_in_threadpool(self.log_purge_worker.stop)
+        # Grava os eventos de visualização pendentes antes de encerrar
+        await run_in_threadpool(self.view_log_pipeline.stop)
+        if self.view_log_pipeline.outbox is not None:
+            self.view_log_pipeline.outbox.close()
+        self.product_log_client.close()
 
     def create_product(
         self,
         product: product_schema.ProductCreate,
+        response: Response,
         db: Session = Depends(dependencies.get_db),
     ) -> product_schema.Product:
         db_product = product_crud.create_product(db=db, product=product)
+        response.headers.update(conditional.validator_headers(db_product))
         return db_product
 
+    def bulk_create_products(
+        self,
+        products: Annotated[
+            List[product_schema.ProductCreate],
+            Body(min_length=1, max_length=product_schema.BULK_MAX_ITEMS),
+        ],
+        db: Session = Depends(dependencies.get_db),
+    ) -> product_schema.ProductBulkResponse:
+        results = product_crud.bulk_create_products(db=db, products=products)
+        return product_schema.ProductBulkResponse(results=results)
+
+    def bulk_update_products(
+        self,
+        products: Annotated[
+            List[product_schema.ProductBulkUpdate],
+            Body(min_length=1, max_length=product_schema.BULK_MAX_ITEMS),
+        ],
+        db: Session = Depends(dependencies.get_db),
+    ) -> product_schema.ProductBulkResponse:
+        results = product_crud.bulk_update_products(db=db, products=products)
+        return product_schema.ProductBulkResponse(results=results)
+
+    def bulk_delete_products(
+        self,
+        payload: product_schema.ProductBulkDelete,
+        db: Session = Depends(dependencies.get_db),
+    ) -> product_schema.ProductBulkResponse:
+        results = product_crud.bulk_delete_products(db=db, product_ids=payload.ids)
+        self.log_purge_worker.notify()  # Um job de remoção de logs por produto
+        return product_schema.ProductBulkResponse(results=results)
+
+    def bulk_adjust_stock(
+        self,
+        adjustments: Annotated[
+            List[product_schema.ProductBulkStockAdjustment],
+            Body(min_length=1, max_length=product_schema.BULK_MAX_ITEMS),
+        ],
+        response: Response,
+        db: Session = Depends(dependencies.get_db),
+    ) -> product_schema.ProductBulkResponse:
+        results = product_crud.bulk_adjust_stock(db=db, adjustments=adjustments)
+        if not stock_adjusted(results):
+            # Tudo ou nada: os itens com falha explicam por que nada foi aplicado
+            response.status_code = 409
+        return product_schema.ProductBulkResponse(results=results)
+
     def get_products(
-        self, db: Session = Depends(dependencies.get_db)
+        self,
+        params: Annotated[product_schema.ProductListParams, Query()],
+        request: Request,
+        response: Response,
+        db: Session = Depends(dependencies.get_read_db),
+    ) -> List[product_schema.Product]:
+        # Validado pelo contador de alterações da tabela, lido antes da página
+        catalog = product_crud.get_catalog(db)
+        if conditional.not_modified(request, catalog):
+            return conditional.not_modified_response(catalog)
+        db_products, next_cursor = product_crud.get_products(db, params)
+        response.headers.update(conditional.validator_headers(catalog))
+        if next_cursor is not None:
+            # Cursor opaco para buscar a próxima página
+            response.headers["X-Next-Cursor"] = next_cursor
+        self.log_views(
+            request,
+            view_policy.LIST_ROUTE,
+            [db_product.id for db_product in db_products],
+        )  # Log no MongoDB de cada visualização (ou impressão)
+        return self.products_response(db_products, response)
+
+    def search_products(
+        self,
+        params: Annotated[product_schema.ProductSearchParams, Query()],
+        request: Request,
+        response: Response,
+        db: Session = Depends(dependencies.get_read_db),
     ) -> List[product_schema.Product]:
-        db_products = product_crud.get_products(db)
-        for db_product in db_products:
-            self.product_log_client.log_product_view(
-                db_product.id
-            )  # Log no MongoDB de cada visualização
-        return db_products
+        # Os resultados só mudam quando o catálogo muda: mesmo validador da listagem
+        catalog = product_crud.get_catalog(db)
+        if conditional.not_modified(request, catalog):
+            return conditional.not_modified_response(catalog)
+        db_products, next_cursor = product_crud.search_products(db, params)
+        response.headers.update(conditional.validator_headers(catalog))
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return self.products_response(db_products, response)
+
+    def export_products(
+        self,
+        export_format: product_schema.ExportFormat = Query(
+            default=product_schema.ExportFormat.ndjson, alias="format"
+        ),
+        db: Session = Depends(dependencies.get_read_db),
+    ) -> StreamingResponse:
+        chunk_size = get_settings().export_chunk_size
+
+        def stream():
+            # O get_db fecha a sessão antes do streaming começar; a iteração
+            # abre uma nova conexão, que é fechada aqui ao final
+            try:
+                yield export.format_header(export_format)
+                for rows in product_crud.iter_products(db, chunk_size):
+                    yield export.format_rows(export_format, rows)
+            finally:
+                db.close()
+
+        return export_response(stream(), export_format)
+
+    async def import_products(
+        self,
+        request: Request,
+        import_format: product_schema.ExportFormat = Query(
+            default=product_schema.ExportFormat.ndjson, alias="format"
+        ),
+        chunk_size: Optional[int] = Query(default=None, gt=0, le=10000),
+        db: Session = Depends(dependencies.get_db),
+    ) -> product_schema.ProductImportSummary:
+        # O corpo é lido em stream no event loop; cada bloco é gravado no threadpool
+        async def write_chunk(products):
+            await run_in_threadpool(product_crud.insert_products, db, products)
+
+        return await importer.import_products(
+            request.stream(),
+            import_format,
+            chunk_size or get_settings().import_chunk_size,
+            write_chunk,
+        )
 
     def get_product(
-        self, product_id: int, db: Session = Depends(dependencies.get_db)
+        self,
+        product_id: int,
+        request: Request,
+        response: Response,
+        db: Session = Depends(dependencies.get_primary_db),
     ) -> product_schema.Product:
-        db_product = product_crud.find_product_by_id(product_id, db)
-        self.product_log_client.log_product_view(
-            product_id
-        )  # Log no MongoDB de cada visualização
-        return db_product
+        if conditional.is_conditional(request):
+            # Só a versão é consultada: a linha não é carregada nem serializada
+            validator = product_crud.get_product_validator(product_id, db)
+            if conditional.not_modified(request, validator):
+                self.log_views(request, view_policy.DETAIL_ROUTE, [product_id])
+                return conditional.not_modified_response(validator)
+        db_product = product_crud.get_product(product_id, db)
+        # Log no MongoDB da visualização
+        self.log_views(request, view_policy.DETAIL_ROUTE, [product_id])
+        response.headers.update(conditional.validator_headers(db_product))
+        return self.products_response(db_product, response)
 
     def update_product(
         self,
         product_id: int,
         product: product_schema.ProductUpdate,
+        response: Response,
+        if_match: Optional[str] = Header(default=None),
         db: Session = Depends(dependencies.get_db),
     ) -> product_schema.Product:
-        product_crud.find_product_by_id(
-            product_id, db
-        )  # Validar se o produto existe na database
+        # Com If-Match, a atualização só é aplicada sobre a versão que o cliente viu
         db_product = product_crud.update_product(
-            db=db, product_id=product_id, product=product
+            db=db, product_id=product_id, product=product, if_match=if_match
         )
+        response.headers.update(conditional.validator_headers(db_product))
         return db_product
 
     def delete_product(
-        self, product_id: int, db: Session = Depends(dependencies.get_db)
+        self,
+        product_id: int,
+        response: Response,
+        if_match: Optional[str] = Header(default=None),
+        db: Session = Depends(dependencies.get_db),
     ) -> product_schema.Product:
-        product_crud.find_product_by_id(
-            product_id, db
-        )  # Validar se o produto existe na database
-        self.product_log_client.clear_product_logs(
-            product_id
-        )  # Limpa os logs do produto excluído
-        db_product = product_crud.delete_product(db=db, product_id=product_id)
+        db_product, job = product_crud.delete_product(
+            db=db, product_id=product_id, if_match=if_match
+        )
+        # Os logs do produto são removidos em background; o status do job
+        # pode ser consultado em /admin/jobs/{id}
+        self.log_purge_worker.notify()
+        response.headers["X-Log-Purge-Job"] = str(job.id)
         return db_product
 
+    def adjust_stock(
+        self,
+        product_id: int,
+        adjustment: product_schema.ProductStockAdjustment,
+        response: Response,
+        db: Session = Depends(dependencies.get_db),
+    ) -> product_schema.Product:
+        # Sem leitura prévia nem If-Match: o UPDATE condicional é a verificação
+        db_product = product_crud.adjust_stock(
+            db=db, product_id=product_id, delta=adjustment.delta
+        )
+        response.headers.update(conditional.validator_headers(db_product))
+        return self.products_response(db_product, response)
+
     def get_product_view_report(
-        self, product_id: int, db: Session = Depends(dependencies.get_db)
+        self,
+        product_id: int,
+        include_views: bool = False,
+        views_limit: int = Query(default=100, gt=0, le=1000),
+        views_skip: int = Query(default=0, ge=0),
+        db: Session = Depends(dependencies.get_primary_db),
+    ):
+        db_product = product_crud.get_product(product_id, db)
+        # Os totais vêm do contador pré-agregado, sem varrer os logs
+        counters = self.product_log_client.get_product_counters(product_id)
+        # Os logs brutos só são paginados quando pedidos explicitamente
+        product_views = []
+        if include_views:
+            product_views = self.product_log_client.get_product_view_logs(
+                product_id, limit=views_limit, skip=views_skip
+            )
+        return self.view_report_response(db_product, counters, product_views)
+
+    def get_product_stats(
+        self,
+        request: Request,
+        response: Response,
+        db: Session = Depends(dependencies.get_read_db),
+    ) -> product_schema.ProductStats:
+        # Mesmo validador da listagem: os agregados só mudam com o catálogo
+        catalog = product_crud.get_catalog(db)
+        if conditional.not_modified(request, catalog):
+            return conditional.not_modified_response(catalog)
+        response.headers.update(conditional.validator_headers(catalog))
+        return product_crud.get_stats(db, catalog)
+
+    def get_top_viewed_products(
+        self,
+        window: product_schema.ViewWindow = product_schema.ViewWindow.last_day,
+        limit: int = Query(default=10, gt=0, le=100),
+    ) -> List[product_schema.ProductViewCount]:
+        # Somado no MongoDB a partir dos buckets, sem ler os logs brutos
+        return self.product_log_client.get_top_products(window.value, limit)
+
+    def get_product_view_histogram(
+        self,
+        product_id: int,
+        bucket: product_schema.ViewBucket = product_schema.ViewBucket.hour,
+        periods: Optional[int] = Query(default=None, gt=0, le=1000),
+        db: Session = Depends(dependencies.get_primary_db),
+    ) -> product_schema.ProductViewHistogram:
+        product_crud.get_product_validator(product_id, db)  # NotFound se não existir
+        series = self.product_log_client.get_view_histogram(
+            product_id, bucket.value, periods
+        )
+        return {"product_id": product_id, "bucket": bucket, "series": series}
+
+
+class AsyncProductController(ProductController):
+    """
+    Same routes as ProductController, served by 'async def' handlers on an
+    AsyncSession instead of running sync handlers in the threadpool.
+    """
+
+    async def startup(self, environment: str = None):
+        with startup.profile.phase("view_log_client"):
+            self.product_log_client = mongodb.AsyncProductLogClient(environment)
+        self.view_log_indexes = asyncio.create_task(self.ensure_view_log_indexes())
+        with startup.profile.phase("view_log_pipeline"):
+            self.view_log_pipeline = (
+                view_log_pipeline.AsyncViewLogPipeline.from_settings(
+                    self.product_log_client,
+                    view_outbox.ViewOutbox.from_settings(environment),
+                )
+            )
+            self.view_log_pipeline.start()
+        with startup.profile.phase("log_purge_worker"):
+            self.log_purge_worker = log_purge.AsyncLogPurgeWorker.from_settings(
+                self.product_log_client, sql.AsyncSessionLocal
+            )
+            self.log_purge_worker.start()
+
+    async def ensure_view_log_indexes(self) -> bool:
+        try:
+            with startup.profile.phase("view_log_indexes"):
+                await self.product_log_client.ensure_indexes()
+        except PyMongoError:
+            logger.exception("Failed to create the view log indexes")
+            return False
+        return True
+
+    async def shutdown(self):
+        if self.view_log_indexes is not None:
+            self.view_log_indexes.cancel()  # Sem efeito se já terminou
+        await self.log_purge_worker.stop()
+        await self.view_log_pipeline.stop()
+        if self.view_log_pipeline.outbox is not None:
+            self.view_log_pipeline.outbox.close()
+        await self.product_log_client.close()
+
+    async def create_product(
+        self,
+        product: product_schema.ProductCreate,
+        response: Response,
+        db: AsyncSession = Depends(dependencies.get_async_db),
+    ) -> product_schema.Product:
+        db_product = await async_product_crud.create_product(db=db, product=product)
+        response.headers.update(conditional.validator_headers(db_product))
+        return db_product
+
+    async def bulk_create_products(
+        self,
+        products: Annotated[
+            List[product_schema.ProductCreate],
+            Body(min_length=1, max_length=product_schema.BULK_MAX_ITEMS),
+        ],
+        db: AsyncSession = Depends(dependencies.get_async_db),
+    ) -> product_schema.ProductBulkResponse:
+        results = await async_product_crud.bulk_create_products(
+            db=db, products=products
+        )
+        return product_schema.ProductBulkResponse(results=results)
+
+    async def bulk_update_products(
+        self,
+        products: Annotated[
+            List[product_schema.ProductBulkUpdate],
+            Body(min_length=1, max_length=product_schema.BULK_MAX_ITEMS),
+        ],
+        db: AsyncSession = Depends(dependencies.get_async_db),
+    ) -> product_schema.ProductBulkResponse:
+        results = await async_product_crud.bulk_update_products(
+            db=db, products=products
+        )
+        return product_schema.ProductBulkResponse(results=results)
+
+    async def bulk_delete_products(
+        self,
+        payload: product_schema.ProductBulkDelete,
+        db: AsyncSession = Depends(dependencies.get_async_db),
+    ) -> product_schema.ProductBulkResponse:
+        results = await async_product_crud.bulk_delete_products(
+            db=db, product_ids=payload.ids
+        )
+        self.log_purge_worker.notify()
+        return product_schema.ProductBulkResponse(results=results)
+
+    async def bulk_adjust_stock(
+        self,
+        adjustments: Annotated[
+            List[product_schema.ProductBulkStockAdjustment],
+            Body(min_length=1, max_length=product_schema.BULK_MAX_ITEMS),
+        ],
+        response: Response,
+        db: AsyncSession = Depends(dependencies.get_async_db),
+    ) -> product_schema.ProductBulkResponse:
+        results = await async_product_crud.bulk_adjust_stock(
+            db=db, adjustments=adjustments
+        )
+        if not stock_adjusted(results):
+            response.status_code = 409
+        return product_schema.ProductBulkResponse(results=results)
+
+    async def get_products(
+        self,
+        params: Annotated[product_schema.ProductListParams, Query()],
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(dependencies.get_async_read_db),
+    ) -> List[product_schema.Product]:
+        catalog = await async_product_crud.get_catalog(db)
+        if conditional.not_modified(request, catalog):
+            return conditional.not_modified_response(catalog)
+        db_products, next_cursor = await async_product_crud.get_products(db, params)
+        response.headers.update(conditional.validator_headers(catalog))
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        self.log_views(
+            request,
+            view_policy.LIST_ROUTE,
+            [db_product.id for db_product in db_products],
+        )
+        return self.products_response(db_products, response)
+
+    async def search_products(
+        self,
+        params: Annotated[product_schema.ProductSearchParams, Query()],
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(dependencies.get_async_read_db),
+    ) -> List[product_schema.Product]:
+        catalog = await async_product_crud.get_catalog(db)
+        if conditional.not_modified(request, catalog):
+            return conditional.not_modified_response(catalog)
+        db_products, next_cursor = await async_product_crud.search_products(db, params)
+        response.headers.update(conditional.validator_headers(catalog))
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return self.products_response(db_products, response)
+
+    async def export_products(
+        self,
+        export_format: product_schema.ExportFormat = Query(
+            default=product_schema.ExportFormat.ndjson, alias="format"
+        ),
+        db: AsyncSession = Depends(dependencies.get_async_read_db),
+    ) -> StreamingResponse:
+        chunk_size = get_settings().export_chunk_size
+
+        async def stream():
+            try:
+                yield export.format_header(export_format)
+                async for rows in async_product_crud.iter_products(db, chunk_size):
+                    yield export.format_rows(export_format, rows)
+            finally:
+                await db.close()
+
+        return export_response(stream(), export_format)
+
+    async def import_products(
+        self,
+        request: Request,
+        import_format: product_schema.ExportFormat = Query(
+            default=product_schema.ExportFormat.ndjson, alias="format"
+        ),
+        chunk_size: Optional[int] = Query(default=None, gt=0, le=10000),
+        db: AsyncSession = Depends(dependencies.get_async_db),
+    ) -> product_schema.ProductImportSummary:
+        async def write_chunk(products):
+            await async_product_crud.insert_products(db, products)
+
+        return await importer.import_products(
+            request.stream(),
+            import_format,
+            chunk_size or get_settings().import_chunk_size,
+            write_chunk,
+        )
+
+    async def get_product(
+        self,
+        product_id: int,
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(dependencies.get_async_primary_db),
+    ) -> product_schema.Product:
+        if conditional.is_conditional(request):
+            validator = await async_product_crud.get_product_validator(product_id, db)
+            if conditional.not_modified(request, validator):
+                self.log_views(request, view_policy.DETAIL_ROUTE, [product_id])
+                return conditional.not_modified_response(validator)
+        db_product = await async_product_crud.get_product(product_id, db)
+        self.log_views(request, view_policy.DETAIL_ROUTE, [product_id])
+        response.headers.update(conditional.validator_headers(db_product))
+        return self.products_response(db_product, response)
+
+    async def update_product(
+        self,
+        product_id: int,
+        product: product_schema.ProductUpdate,
+        response: Response,
+        if_match: Optional[str] = Header(default=None),
+        db: AsyncSession = Depends(dependencies.get_async_db),
+    ) -> product_schema.Product:
+        db_product = await async_product_crud.update_product(
+            db=db, product_id=product_id, product=product, if_match=if_match
+        )
+        response.headers.update(conditional.validator_headers(db_product))
+        return db_product
+
+    async def delete_product(
+        self,
+        product_id: int,
+        response: Response,
+        if_match: Optional[str] = Header(default=None),
+        db: AsyncSession = Depends(dependencies.get_async_db),
+    ) -> product_schema.Product:
+        db_product, job = await async_product_crud.delete_product(
+            db=db, product_id=product_id, if_match=if_match
+        )
+        self.log_purge_worker.notify()
+        response.headers["X-Log-Purge-Job"] = str(job.id)
+        return db_product
+
+    async def adjust_stock(
+        self,
+        product_id: int,
+        adjustment: product_schema.ProductStockAdjustment,
+        response: Response,
+        db: AsyncSession = Depends(dependencies.get_async_db),
+    ) -> product_schema.Product:
+        db_product = await async_product_crud.adjust_stock(
+            db=db, product_id=product_id, delta=adjustment.delta
+        )
+        response.headers.update(conditional.validator_headers(db_product))
+        return self.products_response(db_product, response)
+
+    async def get_product_view_report(
+        self,
+        product_id: int,
+        include_views: bool = False,
+        views_limit: int = Query(default=100, gt=0, le=1000),
+        views_skip: int = Query(default=0, ge=0),
+        db: AsyncSession = Depends(dependencies.get_async_primary_db),
     ):
-        db_product = product_crud.find_product_by_id(product_id, db)
-        # Obtemos os logs de visualização do MongoDB
-        product_views = self.product_log_client.get_product_view_logs(product_id)
-        # Retornamos o produto e os logs de visualização
-        return {
-            "product": db_product,
-            "number_of_views": len(product_views),
-            "views": product_views,
-        }
-
-
-product_controller = ProductController()
+        # A consulta SQL e as do MongoDB rodam concorrentemente
+        lookups = [
+            async_product_crud.get_product(product_id, db),
+            self.product_log_client.get_product_counters(product_id),
+        ]
+        if include_views:
+            lookups.append(
+                self.product_log_client.get_product_view_logs(
+                    product_id, limit=views_limit, skip=views_skip
+                )
+            )
+        db_product, counters, *product_views = await asyncio.gather(*lookups)
+        return self.view_report_response(
+            db_product, counters, product_views[0] if product_views else []
+        )
+
+    async def get_product_stats(
+        self,
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(dependencies.get_async_read_db),
+    ) -> product_schema.ProductStats:
+        catalog = await async_product_crud.get_catalog(db)
+        if conditional.not_modified(request, catalog):
+            return conditional.not_modified_response(catalog)
+        response.headers.update(conditional.validator_headers(catalog))
+        return await async_product_crud.get_stats(db, catalog)
+
+    async def get_top_viewed_products(
+        self,
+        window: product_schema.ViewWindow = product_schema.ViewWindow.last_day,
+        limit: int = Query(default=10, gt=0, le=100),
+    ) -> List[product_schema.ProductViewCount]:
+        return await self.product_log_client.get_top_products(window.value, limit)
+
+    async def get_product_view_histogram(
+        self,
+        product_id: int,
+        bucket: product_schema.ViewBucket = product_schema.ViewBucket.hour,
+        periods: Optional[int] = Query(default=None, gt=0, le=1000),
+        db: AsyncSession = Depends(dependencies.get_async_primary_db),
+    ) -> product_schema.ProductViewHistogram:
+        await async_product_crud.get_product_validator(product_id, db)
+        series = await self.product_log_client.get_view_histogram(
+            product_id, bucket.value, periods
+        )
+        return {"product_id": product_id, "bucket": bucket, "series": series}
+
+
+def build_product_controller() -> ProductController:
+    """Picks the sync or async data path according to DATABASE_MODE."""
+    if get_settings().database_mode == "async":
+        return AsyncProductController()
+    return ProductController()
+
+
+product_controller = build_product_controller()
@@ -0,0 +1,62 @@
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import exceptions
+from app.crud import job_crud
+from app.models import job_model
+from app.models.product_model import utcnow
+from app.schemas import job_schema
+
+# Versões assíncronas das funções de job_crud, com os mesmos statements
+
+
+async def claim_next_job(
+    db: AsyncSession, lease: float, now=None
+) -> Optional[job_model.Job]:
+    now = now or utcnow()
+    while True:
+        result = await db.execute(job_crud.next_job_statement(now, lease))
+        job_id = result.scalar_one_or_none()
+        if job_id is None:
+            return None
+        result = await db.execute(job_crud.claim_statement(job_id, now, lease))
+        await db.commit()
+        if result.rowcount:
+            return await db.get(job_model.Job, job_id, populate_existing=True)
+
+
+async def renew_job(db: AsyncSession, job_id: int, attempt: int) -> bool:
+    result = await db.execute(job_crud.renew_statement(job_id, attempt))
+    await db.commit()
+    return bool(result.rowcount)
+
+
+async def finish_job(db: AsyncSession, job: job_model.Job, result: int):
+    job.status = job_schema.JobStatus.done
+    job.result = result
+    job.last_error = None
+    await db.commit()
+
+
+async def fail_job(
+    db: AsyncSession,
+    job: job_model.Job,
+    error: str,
+    max_attempts: int,
+    base_delay: float,
+):
+    job.last_error = error[:255]
+    if job.attempts >= max_attempts:
+        job.status = job_schema.JobStatus.failed
+    else:
+        job.status = job_schema.JobStatus.pending
+        job.run_after = utcnow() + job_crud.retry_delay(job, base_delay)
+    await db.commit()
+
+
+async def get_job(db: AsyncSession, job_id: int) -> job_model.Job:
+    job = await db.get(job_model.Job, job_id)
+    if job is None:
+        raise exceptions.NotFound("Job")
+    return job
@@ -0,0 +1,231 @@
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+from starlette.concurrency import run_in_threadpool
+
+from app import exceptions
+from app.crud import job_crud, product_crud
+from app.crud.product_crud import product_cache
+from app.models import product_model
+from app.schemas import product_schema
+
+# Versões assíncronas das funções de product_crud. As queries são montadas
+# pelos mesmos builders, apenas a execução muda.
+
+
+async def cache_call(method, *args):
+    # O cache compartilhado (Redis) faz I/O de rede: roda fora do event loop
+    if product_cache.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+async def create_product(db: AsyncSession, product: product_schema.ProductCreate):
+    db_product = product_model.Product(**product.model_dump())
+    db.add(db_product)
+    await touch_catalog(db)
+    await db.commit()
+    await db.refresh(db_product)
+    await cache_call(product_cache.invalidate, db_product.id)
+    return db_product
+
+
+async def touch_catalog(db: AsyncSession, shard: int = product_model.CATALOG_ID):
+    await db.execute(product_crud.catalog_bump_statement(shard))
+
+
+async def get_catalog(db: AsyncSession):
+    result = await db.execute(product_crud.catalog_statement())
+    return result.one()
+
+
+async def get_stats(db: AsyncSession, catalog) -> product_schema.ProductStats:
+    status_rows = (await db.execute(product_crud.stats_statement())).all()
+    bucket_rows = (await db.execute(product_crud.price_histogram_statement())).all()
+    return product_crud.build_stats(catalog, status_rows, bucket_rows)
+
+
+async def get_products(db: AsyncSession, params: product_schema.ProductListParams):
+    result = await db.execute(product_crud.products_page_statement(params))
+    return product_crud.build_products_page(list(result.scalars().all()), params)
+
+
+async def search_products(db: AsyncSession, params: product_schema.ProductSearchParams):
+    stmt = product_crud.search_statement(params, db.get_bind().dialect.name)
+    if stmt is None:
+        return [], None
+    result = await db.execute(stmt)
+    return product_crud.build_search_page(list(result.all()), params)
+
+
+async def iter_products(db: AsyncSession, chunk_size: int):
+    result = await db.stream(product_crud.export_statement(chunk_size))
+    async for partition in result.partitions():
+        yield partition
+
+
+async def update_product(
+    product_id: int,
+    product: product_schema.ProductUpdate,
+    db: AsyncSession,
+    if_match: Optional[str] = None,
+):
+    await touch_catalog(db)
+    db_product = await find_product_by_id(product_id, db)
+    product_crud.check_precondition(db_product, if_match)
+    for key, value in product.model_dump(exclude_unset=True).items():
+        setattr(db_product, key, value)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise exceptions.PreconditionFailed("Product")
+    await db.refresh(db_product)
+    await cache_call(product_cache.invalidate, product_id)
+    return db_product
+
+
+async def delete_product(
+    product_id: int, db: AsyncSession, if_match: Optional[str] = None
+):
+    await touch_catalog(db)
+    db_product = await find_product_by_id(product_id, db)
+    product_crud.check_precondition(db_product, if_match)
+    await db.delete(db_product)
+    (job,) = job_crud.add_purge_jobs(db, [product_id])
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise exceptions.PreconditionFailed("Product")
+    await cache_call(product_cache.invalidate, product_id)
+    return db_product, job
+
+
+async def bulk_create_products(
+    db: AsyncSession, products: List[product_schema.ProductCreate]
+):
+    result = await db.execute(
+        product_crud.bulk_insert_statement(),
+        [product.model_dump() for product in products],
+    )
+    product_ids = result.scalars().all()
+    await touch_catalog(db)
+    await db.commit()
+    await cache_call(product_cache.invalidate_many, product_ids)
+    return product_crud.bulk_results(product_ids, set(product_ids), "created")
+
+
+async def insert_products(
+    db: AsyncSession, products: List[product_schema.ProductCreate]
+):
+    await db.execute(
+        insert(product_model.Product), [product.model_dump() for product in products]
+    )
+    await touch_catalog(db)
+    await db.commit()
+
+
+async def bulk_update_products(
+    db: AsyncSession, products: List[product_schema.ProductBulkUpdate]
+):
+    product_ids = [product.id for product in products]
+    await touch_catalog(db)
+    result = await db.execute(product_crud.existing_versions_statement(product_ids))
+    versions = dict(result.all())
+    rows = product_crud.bulk_update_rows(products, versions)
+    if rows:
+        try:
+            await db.execute(update(product_model.Product), rows)
+        except StaleDataError:
+            await db.rollback()
+            raise exceptions.PreconditionFailed("Product")
+    await db.commit()
+    await cache_call(product_cache.invalidate_many, versions)
+    return product_crud.bulk_results(product_ids, set(versions), "updated")
+
+
+async def bulk_delete_products(db: AsyncSession, product_ids: List[int]):
+    await touch_catalog(db)
+    result = await db.execute(product_crud.existing_ids_statement(product_ids))
+    existing_ids = set(result.scalars())
+    if existing_ids:
+        await db.execute(
+            delete(product_model.Product).where(
+                product_model.Product.id.in_(existing_ids)
+            )
+        )
+        job_crud.add_purge_jobs(db, sorted(existing_ids))
+    await db.commit()
+    await cache_call(product_cache.invalidate_many, existing_ids)
+    return product_crud.bulk_results(product_ids, existing_ids, "deleted")
+
+
+async def adjust_stock(db: AsyncSession, product_id: int, delta: int):
+    result = await db.execute(
+        product_crud.stock_adjustment_statement(product_id, delta)
+    )
+    db_product = result.one_or_none()
+    if db_product is None:
+        await find_product_by_id(product_id, db)
+        raise exceptions.Conflict("Insufficient stock.")
+    await touch_catalog(db, product_model.catalog_shard(product_id))
+    await db.commit()
+    await cache_call(product_cache.invalidate, product_id)
+    return db_product
+
+
+async def bulk_adjust_stock(
+    db: AsyncSession, adjustments: List[product_schema.ProductBulkStockAdjustment]
+):
+    applied = {}
+    for index, adjustment in product_crud.stock_adjustment_order(adjustments):
+        result = await db.execute(
+            product_crud.stock_adjustment_statement(adjustment.id, adjustment.delta)
+        )
+        applied[index] = result.one_or_none() is not None
+    if all(applied.values()):
+        await touch_catalog(db, product_crud.stock_adjustment_shard(adjustments))
+        await db.commit()
+        await cache_call(
+            product_cache.invalidate_many, [adjustment.id for adjustment in adjustments]
+        )
+        return product_crud.adjusted_stock_results(adjustments, applied, set())
+    await db.rollback()
+    failed_ids = [adjustments[index].id for index, ok in applied.items() if not ok]
+    result = await db.execute(product_crud.existing_ids_statement(failed_ids))
+    return product_crud.adjusted_stock_results(
+        adjustments, applied, set(result.scalars())
+    )
+
+
+async def get_product(product_id: int, db: AsyncSession) -> product_schema.Product:
+    """Read-only lookup by id, served from 'product_cache' when possible."""
+    product = await cache_call(product_cache.get, product_id)
+    if product is None:
+        token = await cache_call(product_cache.fill_token, product_id)
+        product = product_schema.Product.model_validate(
+            await find_product_by_id(product_id, db), from_attributes=True
+        )
+        await cache_call(product_cache.set, product, token)
+    return product
+
+
+async def get_product_validator(product_id: int, db: AsyncSession):
+    validator = await cache_call(product_cache.get, product_id)
+    if validator is None:
+        result = await db.execute(product_crud.product_validator_statement(product_id))
+        validator = result.one_or_none()
+        if validator is None:
+            raise exceptions.NotFound("Product")
+    return validator
+
+
+async def find_product_by_id(product_id: int, db: AsyncSession):
+    result = await db.execute(product_crud.product_by_id_statement(product_id))
+    db_product = result.scalar_one_or_none()
+    if not db_product:
+        raise exceptions.NotFound("Product")
+    return db_product
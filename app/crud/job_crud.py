@@ -0,0 +1,134 @@
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from app import exceptions
+from app.models import job_model
+from app.models.product_model import utcnow
+from app.schemas import job_schema
+
+
+def add_purge_jobs(db: Session, product_ids: List[int]) -> List[job_model.Job]:
+    """Queues the view log purge of each product; committed by the caller."""
+    jobs = [
+        job_model.Job(kind=job_schema.JobKind.purge_view_logs, product_id=product_id)
+        for product_id in product_ids
+    ]
+    db.add_all(jobs)
+    return jobs
+
+
+def claimable(now, lease: float):
+    """
+    Pending jobs whose time has come, and running jobs whose worker stopped
+    renewing them for longer than 'lease' seconds (a process that died).
+    """
+    Job = job_model.Job
+    return or_(
+        and_(Job.status == job_schema.JobStatus.pending, Job.run_after <= now),
+        and_(
+            Job.status == job_schema.JobStatus.running,
+            Job.updated_at < now - timedelta(seconds=lease),
+        ),
+    )
+
+
+def next_job_statement(now, lease: float):
+    Job = job_model.Job
+    return select(Job.id).where(claimable(now, lease)).order_by(Job.id).limit(1)
+
+
+def claim_statement(job_id: int, now, lease: float):
+    # Condicional: se outro worker já pegou o job, nenhuma linha é alterada
+    Job = job_model.Job
+    return (
+        update(Job)
+        .where(Job.id == job_id, claimable(now, lease))
+        .values(
+            status=job_schema.JobStatus.running,
+            attempts=Job.attempts + 1,
+            updated_at=utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def claim_next_job(db: Session, lease: float, now=None) -> Optional[job_model.Job]:
+    """
+    Claims the oldest due job. Passing the time a worker pass started as 'now'
+    keeps the pass from claiming again the jobs it rescheduled itself.
+    """
+    now = now or utcnow()
+    while True:
+        job_id = db.execute(next_job_statement(now, lease)).scalar_one_or_none()
+        if job_id is None:
+            return None
+        claimed = db.execute(claim_statement(job_id, now, lease)).rowcount
+        db.commit()
+        if claimed:
+            return db.get(job_model.Job, job_id, populate_existing=True)
+
+
+def renew_statement(job_id: int, attempt: int):
+    # O número da tentativa identifica o dono: se o lease expirou e outro
+    # worker pegou o job, ele já foi incrementado e nada é alterado
+    Job = job_model.Job
+    return (
+        update(Job)
+        .where(
+            Job.id == job_id,
+            Job.status == job_schema.JobStatus.running,
+            Job.attempts == attempt,
+        )
+        .values(updated_at=utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def renew_job(db: Session, job_id: int, attempt: int) -> bool:
+    """
+    Extends the lease of the job claimed for its 'attempt'. False when the
+    lease was lost: the job was claimed again by another worker, which now
+    owns it.
+    """
+    renewed = db.execute(renew_statement(job_id, attempt)).rowcount
+    db.commit()
+    return bool(renewed)
+
+
+def finish_job(db: Session, job: job_model.Job, result: int):
+    job.status = job_schema.JobStatus.done
+    job.result = result
+    job.last_error = None
+    db.commit()
+
+
+def retry_delay(job: job_model.Job, base_delay: float) -> timedelta:
+    # Espera exponencial: base, 2x base, 4x base...
+    return timedelta(seconds=base_delay * 2 ** (job.attempts - 1))
+
+
+def fail_job(
+    db: Session,
+    job: job_model.Job,
+    error: str,
+    max_attempts: int,
+    base_delay: float,
+):
+    """Schedules another attempt, or marks the job as failed after the last one."""
+    job.last_error = error[:255]
+    if job.attempts >= max_attempts:
+        job.status = job_schema.JobStatus.failed
+    else:
+        job.status = job_schema.JobStatus.pending
+        job.run_after = utcnow() + retry_delay(job, base_delay)
+    db.commit()
+
+
+def get_job(db: Session, job_id: int) -> job_model.Job:
+    job = db.get(job_model.Job, job_id)
+    if job is None:
+        raise exceptions.NotFound("Job")
+    return job
@@ -0,0 +1,77 @@
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, Optional, Tuple
+
+from app import exceptions
+from app.schemas import product_schema
+
+
+def encode_cursor(params: product_schema.ProductListParams, value: Any, id: int) -> str:
+    """
+    Builds the opaque cursor that points right after the row (value, id).
+
+    The sort field and order are embedded so a cursor cannot be replayed
+    against a different ordering.
+    """
+    if isinstance(value, Decimal):
+        value = str(value)
+    return _encode(
+        {
+            "s": params.sort_by.value,
+            "o": params.order.value,
+            "v": value,
+            "id": id,
+        }
+    )
+
+
+def _encode(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> dict:
+    padding = "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(cursor + padding))
+
+
+def decode_cursor(
+    params: product_schema.ProductListParams,
+) -> Optional[Tuple[Any, int]]:
+    """Returns the (value, id) keyset encoded in 'params.cursor', if any."""
+    if params.cursor is None:
+        return None
+    try:
+        payload = _decode(params.cursor)
+        sort_by, order = payload["s"], payload["o"]
+        value, id = payload["v"], int(payload["id"])
+        if params.sort_by == product_schema.ProductSortField.price:
+            value = Decimal(value)
+    except (ValueError, KeyError, TypeError, InvalidOperation):
+        raise exceptions.BadRequest("Invalid cursor.")
+    if sort_by != params.sort_by.value or order != params.order.value:
+        raise exceptions.BadRequest("Cursor does not match the requested ordering.")
+    return value, id
+
+
+def encode_search_cursor(
+    params: product_schema.ProductSearchParams, rank: float, id: int
+) -> str:
+    """Cursor that points right after the result (rank, id) of the same query."""
+    return _encode({"q": params.q, "r": rank, "id": id})
+
+
+def decode_search_cursor(
+    params: product_schema.ProductSearchParams,
+) -> Optional[Tuple[float, int]]:
+    if params.cursor is None:
+        return None
+    try:
+        payload = _decode(params.cursor)
+        query, rank, id = payload["q"], float(payload["r"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise exceptions.BadRequest("Invalid cursor.")
+    if query != params.q:
+        raise exceptions.BadRequest("Cursor does not match the search query.")
+    return rank, id
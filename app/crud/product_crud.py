@@ -1,44 +1,584 @@
+from typing import List, Optional, Tuple
+
+from sqlalchemy import (
+    Float,
+    case,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    select,
+    table,
+    tuple_,
+    update,
+)
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
-from app import exceptions
+from app import cache, conditional, exceptions
+from app.crud import job_crud, pagination
+from app.database import product_stats, search
 from app.models import product_model
 from app.schemas import product_schema
 
+# Cache read-through das buscas por id, invalidado em toda escrita
+product_cache = cache.build_product_cache()
+
 
 def create_product(db: Session, product: product_schema.ProductCreate):
     db_product = product_model.Product(**product.model_dump())
     db.add(db_product)
+    touch_catalog(db)
     db.commit()
     db.refresh(db_product)
+    product_cache.invalidate(db_product.id)
     return db_product
 
 
-def get_products(db: Session):
-    return db.query(product_model.Product).all()
+def catalog_bump_statement(shard: int = product_model.CATALOG_ID):
+    """Bumps the table-level change counter; runs in the writer's transaction."""
+    ProductCatalog = product_model.ProductCatalog
+    return (
+        update(ProductCatalog)
+        .where(ProductCatalog.id == shard)
+        .values(version=ProductCatalog.version + 1, updated_at=product_model.utcnow())
+    )
+
+
+def touch_catalog(db: Session, shard: int = product_model.CATALOG_ID):
+    db.execute(catalog_bump_statement(shard))
+
+
+def catalog_statement():
+    ProductCatalog = product_model.ProductCatalog
+    return select(
+        func.sum(ProductCatalog.version).label("version"),
+        func.max(ProductCatalog.updated_at).label("updated_at"),
+    )
+
+
+def get_catalog(db: Session):
+    """
+    (version, updated_at) of the whole catalog, validator of the listings: the
+    sum of the counter shards and the last time any of them changed.
+    """
+    return db.execute(catalog_statement()).one()
+
+
+def stats_statement():
+    ProductStats = product_model.ProductStats
+    # Soma as partes de cada status
+    return select(
+        ProductStats.status,
+        func.sum(ProductStats.product_count),
+        func.sum(ProductStats.price_sum),
+        func.sum(ProductStats.stock_quantity_sum),
+        func.sum(ProductStats.inventory_value),
+    ).group_by(ProductStats.status)
+
+
+def price_histogram_statement():
+    ProductPriceBucket = product_model.ProductPriceBucket
+    return (
+        select(ProductPriceBucket.bucket, ProductPriceBucket.product_count)
+        .where(ProductPriceBucket.product_count > 0)
+        .order_by(ProductPriceBucket.bucket)
+    )
+
+
+def build_stats(catalog, status_rows, bucket_rows) -> product_schema.ProductStats:
+    """
+    Sums the per-status aggregates: one row per status and one per price
+    bucket in use, whatever the number of products.
+    """
+    status_counts = {status.value: 0 for status in product_schema.ProductStatus}
+    product_count = stock_quantity = 0
+    price_sum = inventory_value = 0.0
+    for status, count, prices, stock, value in status_rows:
+        status_counts[product_schema.ProductStatus[status].value] = count
+        product_count += count
+        price_sum += float(prices)
+        stock_quantity += stock
+        inventory_value += float(value)
+    return product_schema.ProductStats(
+        product_count=product_count,
+        status_counts=status_counts,
+        total_price=round(price_sum, 2),
+        average_price=round(price_sum / product_count, 2) if product_count else None,
+        total_stock_quantity=stock_quantity,
+        inventory_value=round(inventory_value, 2),
+        price_percentiles=product_stats.price_percentiles(bucket_rows),
+        version=catalog.version,
+        as_of=catalog.updated_at,
+    )
+
+
+def get_stats(db: Session, catalog) -> product_schema.ProductStats:
+    """
+    Summary as of 'catalog', read before it (get_catalog): the aggregates
+    include at least every write up to 'as_of'.
+    """
+    status_rows = db.execute(stats_statement()).all()
+    bucket_rows = db.execute(price_histogram_statement()).all()
+    return build_stats(catalog, status_rows, bucket_rows)
+
+
+def products_page_statement(params: product_schema.ProductListParams):
+    """
+    Builds the keyset-paginated listing query.
+
+    Rows are ordered by (sort column, id) so the cursor is always unique, and
+    one extra row is fetched to know whether there is a next page.
+    """
+    Product = product_model.Product
+    sort_column = getattr(Product, params.sort_by.value)
+    descending = params.order == product_schema.SortOrder.desc
+
+    stmt = select(Product)
+    if params.status is not None:
+        stmt = stmt.where(Product.status == params.status)
+    if params.min_price is not None:
+        stmt = stmt.where(Product.price >= params.min_price)
+    if params.max_price is not None:
+        stmt = stmt.where(Product.price <= params.max_price)
+    if params.min_stock is not None:
+        stmt = stmt.where(Product.stock_quantity >= params.min_stock)
+    if params.max_stock is not None:
+        stmt = stmt.where(Product.stock_quantity <= params.max_stock)
+
+    keyset = pagination.decode_cursor(params)
+    if keyset is not None:
+        if sort_column is Product.id:
+            stmt = stmt.where(
+                Product.id < keyset[1] if descending else Product.id > keyset[1]
+            )
+        else:
+            row = tuple_(sort_column, Product.id)
+            stmt = stmt.where(row < keyset if descending else row > keyset)
 
+    if sort_column is Product.id:
+        order_by = [Product.id.desc() if descending else Product.id.asc()]
+    elif descending:
+        order_by = [sort_column.desc(), Product.id.desc()]
+    else:
+        order_by = [sort_column.asc(), Product.id.asc()]
+    return stmt.order_by(*order_by).limit(params.limit + 1)
 
-def update_product(product_id: int, product: product_schema.ProductUpdate, db: Session):
+
+def build_products_page(
+    db_products: List[product_model.Product],
+    params: product_schema.ProductListParams,
+) -> Tuple[List[product_model.Product], Optional[str]]:
+    """Trims the extra row fetched by the query and builds the next cursor."""
+    if len(db_products) <= params.limit:
+        return db_products, None
+    db_products = db_products[: params.limit]
+    last = db_products[-1]
+    next_cursor = pagination.encode_cursor(
+        params, getattr(last, params.sort_by.value), last.id
+    )
+    return db_products, next_cursor
+
+
+def get_products(db: Session, params: product_schema.ProductListParams):
+    db_products = db.execute(products_page_statement(params)).scalars().all()
+    return build_products_page(list(db_products), params)
+
+
+def ranked_matches(terms: List[str], dialect: str):
+    """(id, rank) of every matching product; a lower rank is more relevant."""
+    if dialect == "postgresql":
+        search_vector = literal_column("products.search_vector")
+        query = func.to_tsquery(
+            search.TEXT_SEARCH_CONFIG, search.postgres_tsquery(terms)
+        )
+        rank = -cast(func.ts_rank_cd(search_vector, query), Float)
+        return select(product_model.Product.id.label("id"), rank.label("rank")).where(
+            search_vector.op("@@")(query)
+        )
+    fts = table(search.FTS_TABLE, column("rowid"))
+    fts_table = literal_column(search.FTS_TABLE)
+    # bm25 já é negativo: quanto menor, mais relevante
+    rank = func.bm25(fts_table, search.NAME_WEIGHT, 1.0)
+    return (
+        select(fts.c.rowid.label("id"), rank.label("rank"))
+        .select_from(fts)
+        .where(fts_table.match(search.sqlite_match(terms)))
+    )
+
+
+def search_statement(params: product_schema.ProductSearchParams, dialect: str):
+    """
+    Ranked search over the full-text index, paginated by a (rank, id)
+    keyset: only the matching rows are scored, never the whole catalog.
+    """
+    Product = product_model.Product
+    terms = search.search_terms(params.q)
+    if not terms:
+        return None
+    ranked = ranked_matches(terms, dialect).subquery()
+    stmt = select(Product, ranked.c.rank).join(ranked, Product.id == ranked.c.id)
+    keyset = pagination.decode_search_cursor(params)
+    if keyset is not None:
+        stmt = stmt.where(tuple_(ranked.c.rank, ranked.c.id) > keyset)
+    return stmt.order_by(ranked.c.rank, ranked.c.id).limit(params.limit + 1)
+
+
+def build_search_page(
+    rows, params: product_schema.ProductSearchParams
+) -> Tuple[List[product_model.Product], Optional[str]]:
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[: params.limit]
+        last_product, last_rank = rows[-1]
+        next_cursor = pagination.encode_search_cursor(
+            params, last_rank, last_product.id
+        )
+    return [product for product, _ in rows], next_cursor
+
+
+def search_products(db: Session, params: product_schema.ProductSearchParams):
+    stmt = search_statement(params, db.get_bind().dialect.name)
+    if stmt is None:
+        # Consulta sem nenhuma palavra (só pontuação, por exemplo)
+        return [], None
+    return build_search_page(list(db.execute(stmt).all()), params)
+
+
+def export_statement(chunk_size: int):
+    """
+    Selects only the exported columns, streamed from a server-side cursor
+    'chunk_size' rows at a time instead of loading ORM objects.
+    """
+    Product = product_model.Product
+    return (
+        select(
+            Product.id,
+            Product.name,
+            Product.description,
+            Product.price,
+            Product.status,
+            Product.stock_quantity,
+        )
+        .order_by(Product.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+
+def iter_products(db: Session, chunk_size: int):
+    """Yields the whole catalog in lists of at most 'chunk_size' rows."""
+    result = db.execute(export_statement(chunk_size))
+    for partition in result.partitions():
+        yield partition
+
+
+def check_precondition(db_product, if_match: Optional[str]):
+    """Optimistic concurrency: the If-Match ETag must still be the current one."""
+    if if_match is not None and not conditional.etag_matches(if_match, db_product):
+        raise exceptions.PreconditionFailed("Product")
+
+
+def update_product(
+    product_id: int,
+    product: product_schema.ProductUpdate,
+    db: Session,
+    if_match: Optional[str] = None,
+):
+    # Escrita primeiro: serializa com os outros escritores antes de ler a versão
+    touch_catalog(db)
     db_product = find_product_by_id(product_id, db)
+    check_precondition(db_product, if_match)
     for key, value in product.model_dump(exclude_unset=True).items():
         setattr(db_product, key, value)
-    db.commit()
+    try:
+        # O UPDATE filtra pela versão lida: outra escrita no meio não é perdida
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise exceptions.PreconditionFailed("Product")
     db.refresh(db_product)
+    product_cache.invalidate(product_id)
     return db_product
 
 
-def delete_product(product_id: int, db: Session):
+def delete_product(product_id: int, db: Session, if_match: Optional[str] = None):
+    """
+    Deletes the product and, in the same transaction, queues the purge of its
+    view logs. Returns the product and the purge job.
+    """
+    touch_catalog(db)
     db_product = find_product_by_id(product_id, db)
+    check_precondition(db_product, if_match)
     db.delete(db_product)
+    (job,) = job_crud.add_purge_jobs(db, [product_id])
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise exceptions.PreconditionFailed("Product")
+    product_cache.invalidate(product_id)
+    return db_product, job
+
+
+def bulk_insert_statement():
+    # RETURNING na ordem dos parâmetros para casar cada id com o item enviado
+    return insert(product_model.Product).returning(
+        product_model.Product.id, sort_by_parameter_order=True
+    )
+
+
+def existing_ids_statement(product_ids: List[int]):
+    return select(product_model.Product.id).where(
+        product_model.Product.id.in_(set(product_ids))
+    )
+
+
+def existing_versions_statement(product_ids: List[int]):
+    return select(product_model.Product.id, product_model.Product.version).where(
+        product_model.Product.id.in_(set(product_ids))
+    )
+
+
+def bulk_update_rows(
+    products: List[product_schema.ProductBulkUpdate], versions: dict
+) -> List[dict]:
+    """
+    One parameter set per existing product, for an UPDATE by primary key.
+    The version read is sent along so the ORM checks and increments it; a
+    product repeated in the payload expects the version left by the previous
+    occurrence.
+    """
+    versions = dict(versions)
+    rows = []
+    for product in products:
+        values = product.model_dump(exclude_unset=True, exclude={"id"})
+        if product.id in versions and values:
+            rows.append({"id": product.id, "version": versions[product.id], **values})
+            versions[product.id] += 1
+    return rows
+
+
+def bulk_results(product_ids: List[int], existing_ids: set, status: str):
+    return [
+        product_schema.ProductBulkResult(
+            index=index,
+            id=product_id,
+            status=status if product_id in existing_ids else "not_found",
+        )
+        for index, product_id in enumerate(product_ids)
+    ]
+
+
+def bulk_create_products(db: Session, products: List[product_schema.ProductCreate]):
+    """Inserts every product with a single executemany, in one transaction."""
+    product_ids = (
+        db.execute(
+            bulk_insert_statement(), [product.model_dump() for product in products]
+        )
+        .scalars()
+        .all()
+    )
+    touch_catalog(db)
+    db.commit()
+    product_cache.invalidate_many(product_ids)
+    return bulk_results(product_ids, set(product_ids), "created")
+
+
+def insert_products(db: Session, products: List[product_schema.ProductCreate]):
+    """Inserts one import chunk with a single executemany and commits it."""
+    db.execute(
+        insert(product_model.Product), [product.model_dump() for product in products]
+    )
+    touch_catalog(db)
+    db.commit()
+
+
+def bulk_update_products(db: Session, products: List[product_schema.ProductBulkUpdate]):
+    product_ids = [product.id for product in products]
+    # O contador é atualizado antes das leituras: o lock de escrita serializa
+    # os escritores, e as versões lidas não mudam até o commit
+    touch_catalog(db)
+    versions = dict(db.execute(existing_versions_statement(product_ids)).all())
+    rows = bulk_update_rows(products, versions)
+    if rows:
+        try:
+            db.execute(update(product_model.Product), rows)
+        except StaleDataError:
+            # Outra escrita alterou algum dos produtos depois da leitura das versões
+            db.rollback()
+            raise exceptions.PreconditionFailed("Product")
+    db.commit()
+    product_cache.invalidate_many(versions)
+    return bulk_results(product_ids, set(versions), "updated")
+
+
+def bulk_delete_products(db: Session, product_ids: List[int]):
+    touch_catalog(db)
+    existing_ids = set(db.execute(existing_ids_statement(product_ids)).scalars())
+    if existing_ids:
+        db.execute(
+            delete(product_model.Product).where(
+                product_model.Product.id.in_(existing_ids)
+            )
+        )
+        job_crud.add_purge_jobs(db, sorted(existing_ids))
     db.commit()
+    product_cache.invalidate_many(existing_ids)
+    return bulk_results(product_ids, existing_ids, "deleted")
+
+
+def stock_adjustment_statement(product_id: int, delta: int):
+    """
+    Applies 'delta' to the stock in a single conditional UPDATE: the row is
+    only changed if the stock does not go below 0, and the status follows the
+    ProductStatus rules (out of stock at 0, back in stock when restocked).
+    Concurrent adjustments never lose updates and no lock is held between a
+    read and the write. Returns the updated row, or none.
+    """
+    Product = product_model.Product
+    ProductStatus = product_schema.ProductStatus
+    stock_quantity = Product.stock_quantity + delta
+    # Os valores do SET são calculados sobre a linha antes da alteração
+    status = case(
+        (stock_quantity == 0, literal(ProductStatus.out_of_stock, Product.status.type)),
+        (
+            Product.status == ProductStatus.out_of_stock,
+            literal(ProductStatus.in_stock, Product.status.type),
+        ),
+        else_=Product.status,
+    )
+    return (
+        update(Product)
+        .where(Product.id == product_id, Product.stock_quantity >= -delta)
+        .values(
+            stock_quantity=stock_quantity,
+            status=status,
+            version=Product.version + 1,
+            updated_at=product_model.utcnow(),
+        )
+        .returning(*Product.__table__.columns)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def adjusted_stock_results(adjustments, applied: dict, existing_ids: set):
+    """
+    Results of a batch adjustment, in the payload order. 'applied' maps the
+    index of each item to whether its UPDATE matched a row; when any item
+    failed, nothing was committed and the others are reported 'not_applied'.
+    """
+    committed = all(applied.values())
+    results = []
+    for index, adjustment in enumerate(adjustments):
+        if applied[index]:
+            status = "adjusted" if committed else "not_applied"
+        elif adjustment.id in existing_ids:
+            status = "insufficient_stock"
+        else:
+            status = "not_found"
+        results.append(
+            product_schema.ProductBulkResult(
+                index=index, id=adjustment.id, status=status
+            )
+        )
+    return results
+
+
+def stock_adjustment_order(adjustments):
+    # Ordem de id: lotes concorrentes travam as linhas sempre na mesma ordem,
+    # sem deadlock; itens repetidos mantêm a ordem do payload
+    return sorted(enumerate(adjustments), key=lambda item: item[1].id)
+
+
+def stock_adjustment_shard(adjustments) -> int:
+    # Uma linha do contador por lote, a do primeiro produto
+    return product_model.catalog_shard(min(adjustment.id for adjustment in adjustments))
+
+
+def adjust_stock(db: Session, product_id: int, delta: int):
+    db_product = db.execute(stock_adjustment_statement(product_id, delta)).one_or_none()
+    if db_product is None:
+        find_product_by_id(product_id, db)  # NotFound se não existir
+        raise exceptions.Conflict("Insufficient stock.")
+    # O contador do catálogo por último: a linha dele fica travada só até o
+    # commit, e é a do produto, não a mesma para todos os ajustes
+    touch_catalog(db, product_model.catalog_shard(product_id))
+    db.commit()
+    product_cache.invalidate(product_id)
     return db_product
 
 
+def bulk_adjust_stock(
+    db: Session, adjustments: List[product_schema.ProductBulkStockAdjustment]
+):
+    """
+    Applies every adjustment in one transaction, all or nothing: if any
+    product is missing or lacks stock, the whole batch is rolled back.
+    """
+    applied = {}
+    for index, adjustment in stock_adjustment_order(adjustments):
+        row = db.execute(
+            stock_adjustment_statement(adjustment.id, adjustment.delta)
+        ).one_or_none()
+        applied[index] = row is not None
+    if all(applied.values()):
+        touch_catalog(db, stock_adjustment_shard(adjustments))
+        db.commit()
+        product_cache.invalidate_many([adjustment.id for adjustment in adjustments])
+        return adjusted_stock_results(adjustments, applied, set())
+    db.rollback()
+    failed_ids = [adjustments[index].id for index, ok in applied.items() if not ok]
+    existing_ids = set(db.execute(existing_ids_statement(failed_ids)).scalars())
+    return adjusted_stock_results(adjustments, applied, existing_ids)
+
+
+def get_product(product_id: int, db: Session) -> product_schema.Product:
+    """
+    Read-only lookup by id, served from 'product_cache' when possible. 'db'
+    must read from the primary: the row it returns is cached for the whole
+    TTL, and a lagging replica would cache the version a write just replaced.
+    The fill token keeps a write that commits during the read from being
+    overwritten by the row read before it.
+    """
+    product = product_cache.get(product_id)
+    if product is None:
+        token = product_cache.fill_token(product_id)
+        product = product_schema.Product.model_validate(
+            find_product_by_id(product_id, db), from_attributes=True
+        )
+        product_cache.set(product, token)
+    return product
+
+
+def product_validator_statement(product_id: int):
+    Product = product_model.Product
+    return select(Product.version, Product.updated_at).where(Product.id == product_id)
+
+
+def get_product_validator(product_id: int, db: Session):
+    """
+    (version, updated_at) of a product, for conditional requests: taken from
+    the cache or from a two-column query, never loading the whole row. Like
+    get_product, 'db' must read from the primary, or a lagging replica would
+    answer a conditional request with an outdated version.
+    """
+    validator = product_cache.get(product_id)
+    if validator is None:
+        validator = db.execute(product_validator_statement(product_id)).one_or_none()
+        if validator is None:
+            raise exceptions.NotFound("Product")
+    return validator
+
+
+def product_by_id_statement(product_id: int):
+    return select(product_model.Product).where(product_model.Product.id == product_id)
+
+
 def find_product_by_id(product_id: int, db: Session):
-    db_product = (
-        db.query(product_model.Product)
-        .filter(product_model.Product.id == product_id)
-        .first()
-    )
+    db_product = db.execute(product_by_id_statement(product_id)).scalar_one_or_none()
     if not db_product:
         raise exceptions.NotFound("Product")
     return db_product
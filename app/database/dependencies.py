@@ -1,9 +1,53 @@
-from app.database.sqlite import SessionLocal
+from app.database.sql import (
+    AsyncPrimarySessionLocal,
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    PrimarySessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+)
 
 
 def get_db():
+    """Routing session: writes go to the primary, reads to a replica."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """Session bound to the read replicas only, for GET endpoints."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_primary_db():
+    """
+    Session bound to the primary only, for the lookups that fill the product
+    cache: on a cache hit it never opens a connection.
+    """
+    db = PrimarySessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+async def get_async_primary_db():
+    async with AsyncPrimarySessionLocal() as db:
+        yield db
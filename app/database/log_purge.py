@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import threading
+
+from app.config import get_settings
+from app.crud import async_job_crud, job_crud
+from app.models.product_model import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """The job was claimed again by another worker while it was running."""
+
+
+class LogPurgeWorker:
+    """
+    Runs the queued view log purges (jobs table) from a background thread.
+
+    Jobs are claimed with a conditional UPDATE, so several processes can share
+    the table. The lease of a job is renewed before each delete batch, so a
+    long purge is never claimed twice, while a job left running by a process
+    that died is claimed again once its lease expires. A purge deletes in
+    batches of 'batch_size' and can safely run again, so a failed job is
+    retried after an exponentially growing delay, up to 'max_attempts' times.
+    """
+
+    def __init__(
+        self,
+        client,
+        session_factory,
+        batch_size: int,
+        max_attempts: int,
+        retry_delay: float,
+        lease: float,
+        poll_interval: float,
+    ):
+        self.client = client
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._run_lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_settings(cls, client, session_factory) -> "LogPurgeWorker":
+        settings = get_settings()
+        return cls(
+            client,
+            session_factory,
+            batch_size=settings.log_purge_batch_size,
+            max_attempts=settings.log_purge_max_attempts,
+            retry_delay=settings.log_purge_retry_delay,
+            lease=settings.log_purge_lease,
+            poll_interval=settings.log_purge_poll_interval,
+        )
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="log-purge-worker", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        # Jobs não concluídos continuam na tabela e são retomados no próximo start
+        self._stopping.set()
+        self.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self):
+        """Wakes the worker up right away (a job was just queued)."""
+        self._wakeup.set()
+
+    def run_pending(self) -> int:
+        """Runs every job that is due when it starts; returns how many were run."""
+        processed = 0
+        # Jobs reagendados durante esta passada ficam para a próxima
+        started = utcnow()
+        with self._run_lock, self.session_factory() as db:
+            while True:
+                job = job_crud.claim_next_job(db, self.lease, started)
+                if job is None:
+                    break
+                job_id, attempt = job.id, job.attempts
+
+                def renew():
+                    if not job_crud.renew_job(db, job_id, attempt):
+                        raise LeaseLost()
+
+                try:
+                    result = self.client.purge_product_logs(
+                        job.product_id, self.batch_size, on_batch=renew
+                    )
+                except LeaseLost:
+                    # O worker que pegou o job de novo é quem o conclui
+                    logger.warning("View log purge job %d lost its lease", job_id)
+                    continue
+                except Exception as error:
+                    logger.exception("View log purge job %d failed", job.id)
+                    job_crud.fail_job(
+                        db, job, repr(error), self.max_attempts, self.retry_delay
+                    )
+                else:
+                    job_crud.finish_job(db, job, result)
+                processed += 1
+        return processed
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                # Banco indisponível, por exemplo: tenta de novo no próximo ciclo
+                logger.exception("Failed to run the view log purge jobs")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+class AsyncLogPurgeWorker(LogPurgeWorker):
+    """
+    Variant of LogPurgeWorker for AsyncProductLogClient and AsyncSession: the
+    worker is a task on the event loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_wakeup = None
+        self._async_run_lock = None
+        self._task = None
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping.clear()
+        self._async_wakeup = asyncio.Event()
+        self._async_run_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run_async())
+
+    async def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        self.notify()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._task = None
+
+    def notify(self):
+        if self._async_wakeup is not None:
+            self._async_wakeup.set()
+
+    async def run_pending(self) -> int:
+        if self._async_run_lock is None:
+            self._async_run_lock = asyncio.Lock()
+        processed = 0
+        started = utcnow()
+        async with self._async_run_lock, self.session_factory() as db:
+            while True:
+                job = await async_job_crud.claim_next_job(db, self.lease, started)
+                if job is None:
+                    break
+                job_id, attempt = job.id, job.attempts
+
+                async def renew():
+                    if not await async_job_crud.renew_job(db, job_id, attempt):
+                        raise LeaseLost()
+
+                try:
+                    result = await self.client.purge_product_logs(
+                        job.product_id, self.batch_size, on_batch=renew
+                    )
+                except LeaseLost:
+                    logger.warning("View log purge job %d lost its lease", job_id)
+                    continue
+                except Exception as error:
+                    logger.exception("View log purge job %d failed", job.id)
+                    await async_job_crud.fail_job(
+                        db, job, repr(error), self.max_attempts, self.retry_delay
+                    )
+                else:
+                    await async_job_crud.finish_job(db, job, result)
+                processed += 1
+        return processed
+
+    async def _run_async(self):
+        while not self._stopping.is_set():
+            try:
+                await self.run_pending()
+            except Exception:
+                logger.exception("Failed to run the view log purge jobs")
+            try:
+                await asyncio.wait_for(self._async_wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._async_wakeup.clear()
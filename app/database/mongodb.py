@@ -1,51 +1,878 @@
 import os
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Tuple
 
-from dotenv import load_dotenv
-from pymongo import MongoClient
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
 
-load_dotenv()
+from app import metrics
+from app.config import get_settings
+
+VIEWS_COLLECTION = "product_views"
+COUNTERS_COLLECTION = "product_view_counters"
+BUCKETS_COLLECTION = "product_view_buckets"
+# Eventos da outbox já aplicados, pelo id estável de cada evento
+APPLIED_EVENTS_COLLECTION = "product_view_events_applied"
+
+# Tipos de evento: visualizações geram log e buckets; impressões (produto
+# exibido numa listagem) só incrementam um contador próprio
+VIEW_EVENT = "view"
+IMPRESSION_EVENT = "impression"
+
+# Logs de um produto (relatório e exclusão por product_id, em ordem de data)
+VIEWS_INDEX = [("product_id", ASCENDING), ("viewed_at", ASCENDING)]
+# TTL em viewed_at, para uma product_views comum (anterior à time-series)
+VIEWS_TTL_INDEX = "viewed_at_ttl"
+MINUTE_BUCKETS_TTL_INDEX = "minute_buckets_ttl"
+APPLIED_EVENTS_TTL_INDEX = "applied_at_ttl"
+
+BUCKETS_INDEX = [
+    ("product_id", ASCENDING),
+    ("granularity", ASCENDING),
+    ("start", ASCENDING),
+]
+# Ranking de produtos: todos os buckets de uma granularidade a partir de uma data
+TOP_BUCKETS_INDEX = [("granularity", ASCENDING), ("start", ASCENDING)]
+
+BUCKET_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+# Janela do ranking -> (granularidade dos buckets somados, número de buckets)
+TOP_WINDOWS = {"1h": ("minute", 60), "24h": ("hour", 24), "7d": ("hour", 168)}
+HISTOGRAM_PERIODS = {"minute": 60, "hour": 24, "day": 30}
+
+
+def mongodb_connection_config(environment: str = None) -> Tuple[str, str]:
+    """Returns the (url, database name) pair of the given environment."""
+    if environment == "test":
+        mongodb_url = os.getenv("MONGODB_TEST_URL")
+        mongodb_database_name = os.getenv("MONGODB_TEST_DATABASE_NAME")
+    else:
+        mongodb_url = os.getenv("MONGODB_PRODUCTION_URL")
+        mongodb_database_name = os.getenv("MONGODB_PRODUCTION_DATABASE_NAME")
+
+    if not mongodb_url:
+        raise ValueError("A variável de ambiente 'MONGODB_URL' não está definida.")
+    if not mongodb_database_name:
+        raise ValueError(
+            "A variável de ambiente 'MONGODB_TEST_DATABASE_NAME' não está definida."
+        )
+    return mongodb_url, mongodb_database_name
+
+
+def mongodb_client_options() -> dict:
+    """Pool size, timeouts and command monitoring shared by both clients."""
+    settings = get_settings()
+    return {
+        "maxPoolSize": settings.mongodb_max_pool_size,
+        "minPoolSize": settings.mongodb_min_pool_size,
+        "connectTimeoutMS": settings.mongodb_connect_timeout_ms,
+        "serverSelectionTimeoutMS": settings.mongodb_server_selection_timeout_ms,
+        "socketTimeoutMS": settings.mongodb_socket_timeout_ms,
+        "event_listeners": [metrics.mongo_listener],
+    }
+
+
+DAY_SECONDS = 86400
+HOUR_SECONDS = 3600
+
+
+def retention_seconds(amount: int, unit: int) -> Optional[int]:
+    # 0 (ou negativo) desativa a expiração
+    return amount * unit if amount > 0 else None
+
+
+def views_collection_options() -> dict:
+    """
+    Raw view logs are a time-series collection: product_id is the meta field,
+    so deletes by product stay supported, and old logs expire through TTL.
+    """
+    options = {
+        "timeseries": {
+            "timeField": "viewed_at",
+            "metaField": "product_id",
+            "granularity": "seconds",
+        }
+    }
+    retention = retention_seconds(get_settings().view_log_retention_days, DAY_SECONDS)
+    if retention is not None:
+        options["expireAfterSeconds"] = retention
+    return options
+
+
+def ttl_index_action(indexes: dict, name: str, seconds: Optional[int]):
+    """What brings the TTL index 'name' to 'seconds': create, modify, drop or None."""
+    current = indexes.get(name)
+    if seconds is None:
+        return "drop" if current is not None else None
+    if current is None:
+        return "create"
+    if current.get("expireAfterSeconds") != seconds:
+        return "modify"
+    return None
+
+
+def collection_stats(name: str, storage: dict, index_stats: List[dict]) -> dict:
+    """Size and per-index usage of a collection, from $collStats and $indexStats."""
+    index_sizes = storage.get("indexSizes", {})
+    return {
+        "name": name,
+        "count": storage.get("count", 0),
+        "size_bytes": storage.get("size", 0),
+        "storage_size_bytes": storage.get("storageSize", 0),
+        "index_size_bytes": storage.get("totalIndexSize", 0),
+        "indexes": [
+            {
+                "name": index["name"],
+                "size_bytes": index_sizes.get(index["name"], 0),
+                "accesses": index["accesses"]["ops"],
+                "since": index["accesses"]["since"],
+            }
+            for index in index_stats
+        ],
+    }
+
+
+STORAGE_STATS_PIPELINE = [{"$collStats": {"storageStats": {}}}]
+INDEX_STATS_PIPELINE = [{"$indexStats": {}}]
+
+
+def truncate(moment: datetime, granularity: str) -> datetime:
+    moment = moment.replace(second=0, microsecond=0)
+    if granularity == "minute":
+        return moment
+    moment = moment.replace(minute=0)
+    if granularity == "hour":
+        return moment
+    return moment.replace(hour=0)
+
+
+# Faixa de 'viewed_at' removida por vez na purga de uma time-series
+PURGE_WINDOW = timedelta(days=1)
+
+
+def purge_windows(first: datetime, last: datetime) -> List[Tuple[datetime, datetime]]:
+    """[start, end) ranges of PURGE_WINDOW covering the views from first to last."""
+    start = truncate(first, "day")
+    windows = []
+    while start <= last:
+        windows.append((start, start + PURGE_WINDOW))
+        start += PURGE_WINDOW
+    return windows
+
+
+def purge_bounds_query(product_id: int, direction: int) -> dict:
+    return {
+        "filter": {"product_id": product_id},
+        "projection": {"viewed_at": True},
+        "sort": [("viewed_at", direction)],
+    }
+
+
+def series_start(now: datetime, granularity: str, periods: int) -> datetime:
+    """Start of the oldest of the last 'periods' buckets, the current one included."""
+    return truncate(now, granularity) - BUCKET_STEPS[granularity] * (periods - 1)
+
+
+def is_impression(event: dict) -> bool:
+    return event.get("kind", VIEW_EVENT) == IMPRESSION_EVENT
+
+
+def view_documents(events: List[dict]) -> List[dict]:
+    """
+    Raw log documents: only views are stored, impressions are just counted.
+    Events relayed from the outbox keep their id as the document _id.
+    """
+    documents = []
+    for event in events:
+        if is_impression(event):
+            continue
+        document = {key: value for key, value in event.items() if key != "event_id"}
+        if "event_id" in event:
+            document["_id"] = event["event_id"]
+        documents.append(document)
+    return documents
+
+
+def rollup_operations(events: List[dict]) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+    """
+    Rolls the events up into one $inc upsert per product and per
+    (product, minute), (product, hour) and (product, day) bucket. A sampled
+    event counts as 'weight' events; impressions only update the counter.
+    """
+    counters = {}
+    bucket_counts = Counter()
+    for event in events:
+        weight = event.get("weight", 1)
+        field = "impressions" if is_impression(event) else "total"
+        increments = counters.setdefault(event["product_id"], Counter())
+        increments[field] += weight
+        if field == "impressions":
+            continue
+        minute = truncate(event["viewed_at"], "minute")
+        hour = minute.replace(minute=0)
+        bucket_counts[(event["product_id"], "minute", minute)] += weight
+        bucket_counts[(event["product_id"], "hour", hour)] += weight
+        bucket_counts[(event["product_id"], "day", hour.replace(hour=0))] += weight
+
+    counter_operations = [
+        UpdateOne({"_id": product_id}, {"$inc": dict(increments)}, upsert=True)
+        for product_id, increments in counters.items()
+    ]
+    bucket_operations = [
+        UpdateOne(
+            {"product_id": product_id, "granularity": granularity, "start": start},
+            {"$inc": {"count": count}},
+            upsert=True,
+        )
+        for (product_id, granularity, start), count in bucket_counts.items()
+    ]
+    return counter_operations, bucket_operations
+
+
+# Estados de um evento no registro de aplicados
+PENDING_EVENT = "pending"
+APPLIED_EVENT = "applied"
+DUPLICATE_KEY = 11000
+
+
+class EventsInFlight(Exception):
+    """Part of a batch is being applied by another relay; retry it later."""
+
+
+def event_ids(events: List[dict]) -> List[str]:
+    return [event["event_id"] for event in events if "event_id" in event]
+
+
+def applied_event_documents(ids: List[str], owner: ObjectId, now: datetime):
+    return [
+        {"_id": id, "state": PENDING_EVENT, "owner": owner, "at": now} for id in ids
+    ]
+
+
+def only_duplicate_keys(error: BulkWriteError) -> bool:
+    """Whether the only failures of an unordered insert were existing _ids."""
+    details = error.details or {}
+    return not details.get("writeConcernErrors") and all(
+        write_error["code"] == DUPLICATE_KEY
+        for write_error in details.get("writeErrors", [])
+    )
+
+
+def stale_events_filter(ids: List[str], now: datetime, lease: float) -> dict:
+    # Pendentes há mais de um lease: o relay que os pegou parou no meio do lote
+    return {
+        "_id": {"$in": ids},
+        "state": PENDING_EVENT,
+        "at": {"$lt": now - timedelta(seconds=lease)},
+    }
+
+
+def split_claimed_events(
+    events: List[dict], records: List[dict], owner: ObjectId
+) -> Tuple[List[dict], List[str]]:
+    """
+    Events this relay must apply (claimed by 'owner', or without an id) and
+    the ids another relay is still applying. Events already applied are left
+    out of both.
+    """
+    owned = {record["_id"] for record in records if record["owner"] == owner}
+    in_flight = [
+        record["_id"]
+        for record in records
+        if record["owner"] != owner and record["state"] == PENDING_EVENT
+    ]
+    claimed = [
+        event
+        for event in events
+        if "event_id" not in event or event["event_id"] in owned
+    ]
+    return claimed, in_flight
+
+
+def applied_by(events: List[dict], ids: List[str]) -> List[dict]:
+    """Events without an id and those whose id is in 'ids'."""
+    ids = set(ids)
+    return [
+        event for event in events if "event_id" not in event or event["event_id"] in ids
+    ]
+
+
+def top_products_pipeline(window: str, limit: int, now: datetime) -> List[dict]:
+    """Sums the buckets of the window per product, entirely on the server."""
+    granularity, periods = TOP_WINDOWS[window]
+    return [
+        {
+            "$match": {
+                "granularity": granularity,
+                "start": {"$gte": series_start(now, granularity, periods)},
+            }
+        },
+        {"$group": {"_id": "$product_id", "views": {"$sum": "$count"}}},
+        {"$sort": {"views": -1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "product_id": "$_id", "views": 1}},
+    ]
+
+
+def histogram_pipeline(product_id: int, granularity: str, since: datetime):
+    return [
+        {
+            "$match": {
+                "product_id": product_id,
+                "granularity": granularity,
+                "start": {"$gte": since},
+            }
+        },
+        {"$sort": {"start": 1}},
+        {"$project": {"_id": 0, "start": 1, "count": 1}},
+    ]
+
+
+def fill_series(
+    buckets: List[dict], granularity: str, since: datetime, periods: int
+) -> List[dict]:
+    """One entry per bucket of the range, with zero where there were no views."""
+    counts = {bucket["start"]: bucket["count"] for bucket in buckets}
+    step = BUCKET_STEPS[granularity]
+    series = []
+    for index in range(periods):
+        start = since + step * index
+        series.append({"start": start, "count": counts.get(start, 0)})
+    return series
+
+
+def histogram_range(granularity: str, periods: Optional[int], now: datetime):
+    periods = periods or HISTOGRAM_PERIODS[granularity]
+    return series_start(now, granularity, periods), periods
 
 
 class ProductLogClient:
     # Seria interessante separar as responsabilidades, uma class de config outra com os métodos de log
     def __init__(self, environment: str = None):
+        # O MongoClient conecta em background: aqui só falha uma configuração
+        # inválida, que deve interromper o startup em vez de deixar o cliente
+        # sem 'collection'
+        mongodb_url, mongodb_database_name = mongodb_connection_config(environment)
+
+        self.mongo_client = MongoClient(mongodb_url, **mongodb_client_options())
+        self.db = self.mongo_client[mongodb_database_name]  # Cria a database
+        self.collection = self.db[VIEWS_COLLECTION]  # Cria a collection
+        # Contadores pré-agregados (total por produto e buckets por hora/dia)
+        self.counters = self.db[COUNTERS_COLLECTION]
+        self.buckets = self.db[BUCKETS_COLLECTION]
+        self.applied_events = self.db[APPLIED_EVENTS_COLLECTION]
+
+    def ensure_indexes(self):
+        """Creates the collections and indexes and applies the retention policy."""
         try:
-            if environment is None:
-                mongodb_url = os.getenv("MONGODB_PRODUCTION_URL")
-                mongodb_database_name = os.getenv("MONGODB_PRODUCTION_DATABASE_NAME")
-            if environment == "test":
-                mongodb_url = os.getenv("MONGODB_TEST_URL")
-                mongodb_database_name = os.getenv("MONGODB_TEST_DATABASE_NAME")
-
-            if not mongodb_url:
-                raise ValueError(
-                    "A variável de ambiente 'MONGODB_URL' não está definida."
-                )
-            if not mongodb_database_name:
-                raise ValueError(
-                    "A variável de ambiente 'MONGODB_TEST_DATABASE_NAME' não está definida."
-                )
+            self.db.create_collection(VIEWS_COLLECTION, **views_collection_options())
+        except CollectionInvalid:
+            # Já existe (criada por outra instância ou antes da time-series)
+            pass
+        self.collection.create_index(VIEWS_INDEX, name="product_id_viewed_at")
+        self.buckets.create_index(BUCKETS_INDEX, unique=True)
+        self.buckets.create_index(TOP_BUCKETS_INDEX)
+        # Um reenvio acontece em poucos leases: o registro expira depois de um dia
+        self.applied_events.create_index(
+            "at", name=APPLIED_EVENTS_TTL_INDEX, expireAfterSeconds=DAY_SECONDS
+        )
+        self.apply_retention()
+
+    def apply_retention(self):
+        settings = get_settings()
+        views_retention = retention_seconds(
+            settings.view_log_retention_days, DAY_SECONDS
+        )
+        if self.is_time_series(VIEWS_COLLECTION):
+            # Na time-series a retenção é uma opção da coleção, não um índice
+            self.db.command(
+                "collMod",
+                VIEWS_COLLECTION,
+                expireAfterSeconds=views_retention or "off",
+            )
+        else:
+            self.ensure_ttl_index(
+                self.collection, "viewed_at", VIEWS_TTL_INDEX, views_retention
+            )
+        # Só os buckets por minuto expiram; os por hora e por dia são mantidos
+        self.ensure_ttl_index(
+            self.buckets,
+            "start",
+            MINUTE_BUCKETS_TTL_INDEX,
+            retention_seconds(
+                settings.view_minute_bucket_retention_hours, HOUR_SECONDS
+            ),
+            partialFilterExpression={"granularity": "minute"},
+        )
 
-            self.mongo_client = MongoClient(mongodb_url)
-            self.db = self.mongo_client[mongodb_database_name]  # Cria a database
-            self.collection = self.db["product_views"]  # Cria a collection
+    def is_time_series(self, name: str) -> bool:
+        collections = self.db.list_collections(filter={"name": name})
+        info = next(iter(collections), None)
+        return info is not None and info.get("type") == "timeseries"
 
-        except ConnectionError as e:
-            print(f"Erro de conexão com MongoDB.")
-        except ValueError as e:
-            print(f"Erro na configuração da URL de conexão.")
-        except Exception as e:
-            print(f"Ocorreu um erro inesperado.")
+    def ensure_ttl_index(self, collection, field: str, name: str, seconds, **options):
+        action = ttl_index_action(collection.index_information(), name, seconds)
+        if action == "create":
+            collection.create_index(
+                field, name=name, expireAfterSeconds=seconds, **options
+            )
+        elif action == "modify":
+            self.db.command(
+                "collMod",
+                collection.name,
+                index={"name": name, "expireAfterSeconds": seconds},
+            )
+        elif action == "drop":
+            collection.drop_index(name)
+
+    def get_storage_stats(self) -> dict:
+        collections = []
+        for collection in (self.collection, self.counters, self.buckets):
+            storage = next(iter(collection.aggregate(STORAGE_STATS_PIPELINE)), {})
+            index_stats = list(collection.aggregate(INDEX_STATS_PIPELINE))
+            collections.append(
+                collection_stats(
+                    collection.name, storage.get("storageStats", {}), index_stats
+                )
+            )
+        return {
+            "retention_days": get_settings().view_log_retention_days or None,
+            "collections": collections,
+        }
 
     def log_product_view(self, product_id: int):
-        self.collection.insert_one(
-            {"product_id": product_id, "viewed_at": datetime.now()}
+        self.log_product_views(
+            [{"product_id": product_id, "viewed_at": datetime.now()}]
         )
 
-    def get_product_view_logs(self, product_id: int):
-        logs = self.collection.find({"product_id": product_id})
+    def log_product_views(self, events: List[dict]):
+        """
+        Writes a batch of events. Events relayed from the outbox carry an
+        'event_id' and are applied at most once, even when the relay sends
+        the batch again: each one is claimed in the applied events collection
+        and marked applied before any of its writes, and only the events this
+        call marked reach the logs and counters.
+
+        A claim that is still pending after the relay lease (a relay that
+        stopped before marking it) is taken over, since nothing was written
+        for it. A failure after the mark loses the writes of those events
+        instead of repeating them. Raises EventsInFlight when another relay
+        holds part of the batch.
+        """
+        claimed, in_flight, owner = self.claim_events(events)
+        self.write_events(self.mark_applied(claimed, owner))
+        if in_flight:
+            raise EventsInFlight(f"{len(in_flight)} events are being applied.")
+
+    def claim_events(self, events: List[dict]):
+        ids = event_ids(events)
+        if not ids:
+            return events, [], None
+        owner, now = ObjectId(), datetime.now()
+        try:
+            self.applied_events.insert_many(
+                applied_event_documents(ids, owner, now), ordered=False
+            )
+        except BulkWriteError as error:
+            # Ids já registrados: aplicados ou em aplicação por outro relay
+            if not only_duplicate_keys(error):
+                raise
+        self.applied_events.update_many(
+            stale_events_filter(ids, now, get_settings().view_log_relay_lease),
+            {"$set": {"owner": owner, "at": now}},
+        )
+        records = list(
+            self.applied_events.find(
+                {"_id": {"$in": ids}}, {"state": True, "owner": True}
+            )
+        )
+        return (*split_claimed_events(events, records, owner), owner)
+
+    def mark_applied(self, events: List[dict], owner: ObjectId) -> List[dict]:
+        """
+        Marks the claimed events as applied; returns those still owned by this
+        call (another relay may have taken over a claim since).
+        """
+        ids = event_ids(events)
+        if not ids:
+            return events
+        claims = {"_id": {"$in": ids}, "owner": owner}
+        self.applied_events.update_many(
+            {**claims, "state": PENDING_EVENT}, {"$set": {"state": APPLIED_EVENT}}
+        )
+        applied = self.applied_events.distinct(
+            "_id", {**claims, "state": APPLIED_EVENT}
+        )
+        return applied_by(events, applied)
+
+    def write_events(self, events: List[dict]):
+        # Escrita em lote, sem ordem, para não interromper o lote em caso de erro
+        documents = view_documents(events)
+        if documents:
+            self.collection.insert_many(documents, ordered=False)
+        counter_operations, bucket_operations = rollup_operations(events)
+        if counter_operations:
+            self.counters.bulk_write(counter_operations, ordered=False)
+        if bucket_operations:
+            self.buckets.bulk_write(bucket_operations, ordered=False)
+
+    def get_product_view_count(self, product_id: int) -> int:
+        return self.get_product_counters(product_id)[0]
+
+    def get_product_counters(self, product_id: int) -> Tuple[int, int]:
+        """Views and list impressions of a product."""
+        counter = self.counters.find_one({"_id": product_id}) or {}
+        return counter.get("total", 0), counter.get("impressions", 0)
+
+    def get_product_view_logs(self, product_id: int, limit: int = 100, skip: int = 0):
+        logs = (
+            self.collection.find(
+                {"product_id": product_id}, {"_id": False, "viewed_at": True}
+            )
+            .skip(skip)
+            .limit(limit)
+        )
         return [{"viewed_at": log["viewed_at"]} for log in logs]
 
+    def get_top_products(self, window: str, limit: int) -> List[dict]:
+        pipeline = top_products_pipeline(window, limit, datetime.now())
+        return list(self.buckets.aggregate(pipeline))
+
+    def get_view_histogram(
+        self, product_id: int, granularity: str, periods: Optional[int] = None
+    ) -> List[dict]:
+        since, periods = histogram_range(granularity, periods, datetime.now())
+        buckets = self.buckets.aggregate(
+            histogram_pipeline(product_id, granularity, since)
+        )
+        return fill_series(list(buckets), granularity, since, periods)
+
+    def purge_product_logs(
+        self,
+        product_id: int,
+        batch_size: int,
+        on_batch: Optional[Callable[[], None]] = None,
+    ) -> int:
+        """
+        Deletes the logs of a (deleted) product 'batch_size' documents at a
+        time, so no single delete runs for long. Running it again after a
+        failure just deletes what is left. Returns the documents deleted.
+
+        'on_batch' is called before each delete: the purge worker renews the
+        lease of its job there, and stops the purge by raising.
+        """
+        self.counters.delete_one({"_id": product_id})
+        deleted = 0
+        for collection in (self.buckets, self.collection):
+            if self.is_time_series(collection.name):
+                deleted += self.purge_time_series(collection, product_id, on_batch)
+                continue
+            while True:
+                batch = collection.find({"product_id": product_id}, {"_id": True})
+                ids = [document["_id"] for document in batch.limit(batch_size)]
+                if not ids:
+                    break
+                if on_batch is not None:
+                    on_batch()
+                deleted += collection.delete_many({"_id": {"$in": ids}}).deleted_count
+        return deleted
+
+    def purge_time_series(
+        self,
+        collection,
+        product_id: int,
+        on_batch: Optional[Callable[[], None]] = None,
+    ) -> int:
+        """
+        Deletes the logs of a product from a time-series collection one
+        PURGE_WINDOW of views at a time, calling 'on_batch' before each
+        delete. Filters on the time field need MongoDB 7: an older server gets
+        a single delete on the meta field, with no renewal while it runs.
+        """
+        first, last = (
+            collection.find_one(**purge_bounds_query(product_id, direction))
+            for direction in (ASCENDING, DESCENDING)
+        )
+        if first is None:
+            return 0
+        deleted = 0
+        for start, end in purge_windows(first["viewed_at"], last["viewed_at"]):
+            if on_batch is not None:
+                on_batch()
+            window = {
+                "product_id": product_id,
+                "viewed_at": {"$gte": start, "$lt": end},
+            }
+            try:
+                deleted += collection.delete_many(window).deleted_count
+            except OperationFailure:
+                # Só filtros no metaField: remove buckets inteiros de uma vez
+                result = collection.delete_many({"product_id": product_id})
+                return deleted + result.deleted_count
+        return deleted
+
     def clear_product_logs(self, product_id: int):
         self.collection.delete_many({"product_id": product_id})
+        self.counters.delete_one({"_id": product_id})
+        self.buckets.delete_many({"product_id": product_id})
+
+    def clear_products_logs(self, product_ids: List[int]):
+        """Removes the logs of several products with one delete per collection."""
+        self.collection.delete_many({"product_id": {"$in": product_ids}})
+        self.counters.delete_many({"_id": {"$in": product_ids}})
+        self.buckets.delete_many({"product_id": {"$in": product_ids}})
+
+    def close(self):
+        self.mongo_client.close()
+
+
+class AsyncProductLogClient:
+    """Same interface as ProductLogClient, on pymongo's AsyncMongoClient."""
+
+    def __init__(self, environment: str = None):
+        mongodb_url, mongodb_database_name = mongodb_connection_config(environment)
+
+        self.mongo_client = AsyncMongoClient(mongodb_url, **mongodb_client_options())
+        self.db = self.mongo_client[mongodb_database_name]
+        self.collection = self.db[VIEWS_COLLECTION]
+        self.counters = self.db[COUNTERS_COLLECTION]
+        self.buckets = self.db[BUCKETS_COLLECTION]
+        self.applied_events = self.db[APPLIED_EVENTS_COLLECTION]
+
+    async def ensure_indexes(self):
+        try:
+            await self.db.create_collection(
+                VIEWS_COLLECTION, **views_collection_options()
+            )
+        except CollectionInvalid:
+            pass
+        await self.collection.create_index(VIEWS_INDEX, name="product_id_viewed_at")
+        await self.buckets.create_index(BUCKETS_INDEX, unique=True)
+        await self.buckets.create_index(TOP_BUCKETS_INDEX)
+        await self.applied_events.create_index(
+            "at", name=APPLIED_EVENTS_TTL_INDEX, expireAfterSeconds=DAY_SECONDS
+        )
+        await self.apply_retention()
+
+    async def apply_retention(self):
+        settings = get_settings()
+        views_retention = retention_seconds(
+            settings.view_log_retention_days, DAY_SECONDS
+        )
+        if await self.is_time_series(VIEWS_COLLECTION):
+            await self.db.command(
+                "collMod",
+                VIEWS_COLLECTION,
+                expireAfterSeconds=views_retention or "off",
+            )
+        else:
+            await self.ensure_ttl_index(
+                self.collection, "viewed_at", VIEWS_TTL_INDEX, views_retention
+            )
+        await self.ensure_ttl_index(
+            self.buckets,
+            "start",
+            MINUTE_BUCKETS_TTL_INDEX,
+            retention_seconds(
+                settings.view_minute_bucket_retention_hours, HOUR_SECONDS
+            ),
+            partialFilterExpression={"granularity": "minute"},
+        )
+
+    async def is_time_series(self, name: str) -> bool:
+        collections = await self.db.list_collections(filter={"name": name})
+        infos = await collections.to_list(1)
+        return bool(infos) and infos[0].get("type") == "timeseries"
+
+    async def ensure_ttl_index(
+        self, collection, field: str, name: str, seconds, **options
+    ):
+        indexes = await collection.index_information()
+        action = ttl_index_action(indexes, name, seconds)
+        if action == "create":
+            await collection.create_index(
+                field, name=name, expireAfterSeconds=seconds, **options
+            )
+        elif action == "modify":
+            await self.db.command(
+                "collMod",
+                collection.name,
+                index={"name": name, "expireAfterSeconds": seconds},
+            )
+        elif action == "drop":
+            await collection.drop_index(name)
+
+    async def get_storage_stats(self) -> dict:
+        collections = []
+        for collection in (self.collection, self.counters, self.buckets):
+            cursor = await collection.aggregate(STORAGE_STATS_PIPELINE)
+            storage = next(iter(await cursor.to_list(1)), {})
+            cursor = await collection.aggregate(INDEX_STATS_PIPELINE)
+            index_stats = await cursor.to_list(None)
+            collections.append(
+                collection_stats(
+                    collection.name, storage.get("storageStats", {}), index_stats
+                )
+            )
+        return {
+            "retention_days": get_settings().view_log_retention_days or None,
+            "collections": collections,
+        }
+
+    async def log_product_view(self, product_id: int):
+        await self.log_product_views(
+            [{"product_id": product_id, "viewed_at": datetime.now()}]
+        )
+
+    async def log_product_views(self, events: List[dict]):
+        claimed, in_flight, owner = await self.claim_events(events)
+        await self.write_events(await self.mark_applied(claimed, owner))
+        if in_flight:
+            raise EventsInFlight(f"{len(in_flight)} events are being applied.")
+
+    async def claim_events(self, events: List[dict]):
+        ids = event_ids(events)
+        if not ids:
+            return events, [], None
+        owner, now = ObjectId(), datetime.now()
+        try:
+            await self.applied_events.insert_many(
+                applied_event_documents(ids, owner, now), ordered=False
+            )
+        except BulkWriteError as error:
+            if not only_duplicate_keys(error):
+                raise
+        await self.applied_events.update_many(
+            stale_events_filter(ids, now, get_settings().view_log_relay_lease),
+            {"$set": {"owner": owner, "at": now}},
+        )
+        cursor = self.applied_events.find(
+            {"_id": {"$in": ids}}, {"state": True, "owner": True}
+        )
+        records = await cursor.to_list(None)
+        return (*split_claimed_events(events, records, owner), owner)
+
+    async def mark_applied(self, events: List[dict], owner: ObjectId) -> List[dict]:
+        ids = event_ids(events)
+        if not ids:
+            return events
+        claims = {"_id": {"$in": ids}, "owner": owner}
+        await self.applied_events.update_many(
+            {**claims, "state": PENDING_EVENT}, {"$set": {"state": APPLIED_EVENT}}
+        )
+        applied = await self.applied_events.distinct(
+            "_id", {**claims, "state": APPLIED_EVENT}
+        )
+        return applied_by(events, applied)
+
+    async def write_events(self, events: List[dict]):
+        documents = view_documents(events)
+        if documents:
+            await self.collection.insert_many(documents, ordered=False)
+        counter_operations, bucket_operations = rollup_operations(events)
+        if counter_operations:
+            await self.counters.bulk_write(counter_operations, ordered=False)
+        if bucket_operations:
+            await self.buckets.bulk_write(bucket_operations, ordered=False)
+
+    async def get_product_view_count(self, product_id: int) -> int:
+        return (await self.get_product_counters(product_id))[0]
+
+    async def get_product_counters(self, product_id: int) -> Tuple[int, int]:
+        counter = await self.counters.find_one({"_id": product_id}) or {}
+        return counter.get("total", 0), counter.get("impressions", 0)
+
+    async def get_product_view_logs(
+        self, product_id: int, limit: int = 100, skip: int = 0
+    ):
+        logs = (
+            self.collection.find(
+                {"product_id": product_id}, {"_id": False, "viewed_at": True}
+            )
+            .skip(skip)
+            .limit(limit)
+        )
+        return [{"viewed_at": log["viewed_at"]} async for log in logs]
+
+    async def get_top_products(self, window: str, limit: int) -> List[dict]:
+        pipeline = top_products_pipeline(window, limit, datetime.now())
+        return [product async for product in await self.buckets.aggregate(pipeline)]
+
+    async def get_view_histogram(
+        self, product_id: int, granularity: str, periods: Optional[int] = None
+    ) -> List[dict]:
+        since, periods = histogram_range(granularity, periods, datetime.now())
+        buckets = await self.buckets.aggregate(
+            histogram_pipeline(product_id, granularity, since)
+        )
+        buckets = [bucket async for bucket in buckets]
+        return fill_series(buckets, granularity, since, periods)
+
+    async def purge_product_logs(
+        self,
+        product_id: int,
+        batch_size: int,
+        on_batch: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> int:
+        await self.counters.delete_one({"_id": product_id})
+        deleted = 0
+        for collection in (self.buckets, self.collection):
+            if await self.is_time_series(collection.name):
+                deleted += await self.purge_time_series(
+                    collection, product_id, on_batch
+                )
+                continue
+            while True:
+                batch = collection.find({"product_id": product_id}, {"_id": True})
+                ids = [document["_id"] async for document in batch.limit(batch_size)]
+                if not ids:
+                    break
+                if on_batch is not None:
+                    await on_batch()
+                result = await collection.delete_many({"_id": {"$in": ids}})
+                deleted += result.deleted_count
+        return deleted
+
+    async def purge_time_series(
+        self,
+        collection,
+        product_id: int,
+        on_batch: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> int:
+        first = await collection.find_one(**purge_bounds_query(product_id, ASCENDING))
+        if first is None:
+            return 0
+        last = await collection.find_one(**purge_bounds_query(product_id, DESCENDING))
+        deleted = 0
+        for start, end in purge_windows(first["viewed_at"], last["viewed_at"]):
+            if on_batch is not None:
+                await on_batch()
+            window = {
+                "product_id": product_id,
+                "viewed_at": {"$gte": start, "$lt": end},
+            }
+            try:
+                result = await collection.delete_many(window)
+            except OperationFailure:
+                result = await collection.delete_many({"product_id": product_id})
+                return deleted + result.deleted_count
+            deleted += result.deleted_count
+        return deleted
+
+    async def clear_product_logs(self, product_id: int):
+        await self.collection.delete_many({"product_id": product_id})
+        await self.counters.delete_one({"_id": product_id})
+        await self.buckets.delete_many({"product_id": product_id})
+
+    async def clear_products_logs(self, product_ids: List[int]):
+        await self.collection.delete_many({"product_id": {"$in": product_ids}})
+        await self.counters.delete_many({"_id": {"$in": product_ids}})
+        await self.buckets.delete_many({"product_id": {"$in": product_ids}})
+
+    async def close(self):
+        await self.mongo_client.close()
@@ -0,0 +1,199 @@
+import math
+from typing import Dict, Iterable, List, Tuple
+
+# Agregados de 'products' mantidos por triggers a cada INSERT, UPDATE e
+# DELETE, inclusive os feitos em lote ou fora da API:
+# - product_stats: contagem, soma dos preços, do estoque e do valor do
+#   estoque (price * stock_quantity) por status, em STATS_SHARDS linhas por
+#   status (id % STATS_SHARDS): ajustes de estoque simultâneos de produtos
+#   diferentes raramente disputam a mesma linha. A leitura soma as partes
+# - product_price_histogram: contagem por faixa logarítmica de preço, de onde
+#   saem os percentis com erro relativo de até PRICE_RELATIVE_ACCURACY. Só é
+#   atualizado quando o preço muda, não a cada ajuste de estoque
+# As migrations têm uma cópia congelada deste DDL; aqui ele é usado pelo
+# create_all (testes e bancos novos)
+
+PRICE_RELATIVE_ACCURACY = 0.01
+# Faixa i: preços em (GAMMA^(i-1), GAMMA^i]
+GAMMA = (1 + PRICE_RELATIVE_ACCURACY) / (1 - PRICE_RELATIVE_ACCURACY)
+LN_GAMMA = math.log(GAMMA)
+
+PRICE_PERCENTILES = (50, 90, 95, 99)
+
+STATS_SHARDS = 16
+
+
+def price_bucket(price: str) -> str:
+    # ln e ceil: funções nativas no PostgreSQL, math functions no SQLite (3.35+)
+    return f"CAST(ceil(ln({price}) / {LN_GAMMA!r}) AS INTEGER)"
+
+
+STATS_ADD = f"""
+    INSERT INTO product_stats
+        (status, shard, product_count, price_sum, stock_quantity_sum,
+         inventory_value)
+    VALUES (
+        CAST({{row}}status AS TEXT), {{row}}id % {STATS_SHARDS}, 1, {{row}}price,
+        {{row}}stock_quantity, {{row}}price * {{row}}stock_quantity
+    )
+    ON CONFLICT (status, shard) DO UPDATE SET
+        product_count = product_stats.product_count + 1,
+        price_sum = product_stats.price_sum + excluded.price_sum,
+        stock_quantity_sum =
+            product_stats.stock_quantity_sum + excluded.stock_quantity_sum,
+        inventory_value = product_stats.inventory_value + excluded.inventory_value;
+"""
+
+STATS_REMOVE = f"""
+    UPDATE product_stats SET
+        product_count = product_count - 1,
+        price_sum = price_sum - {{row}}price,
+        stock_quantity_sum = stock_quantity_sum - {{row}}stock_quantity,
+        inventory_value = inventory_value - {{row}}price * {{row}}stock_quantity
+    WHERE status = CAST({{row}}status AS TEXT)
+        AND shard = {{row}}id % {STATS_SHARDS};
+"""
+
+HISTOGRAM_ADD = f"""
+    INSERT INTO product_price_histogram (bucket, product_count)
+    VALUES ({price_bucket("{row}price")}, 1)
+    ON CONFLICT (bucket) DO UPDATE SET
+        product_count = product_price_histogram.product_count + 1;
+"""
+
+HISTOGRAM_REMOVE = f"""
+    UPDATE product_price_histogram SET product_count = product_count - 1
+    WHERE bucket = {price_bucket("{row}price")};
+"""
+
+# Recalcula os agregados a partir das linhas que já existiam
+REBUILD = [
+    "DELETE FROM product_stats",
+    "DELETE FROM product_price_histogram",
+    f"""
+    INSERT INTO product_stats
+        (status, shard, product_count, price_sum, stock_quantity_sum,
+         inventory_value)
+    SELECT CAST(status AS TEXT), id % {STATS_SHARDS}, COUNT(*), SUM(price),
+        SUM(stock_quantity), SUM(price * stock_quantity)
+    FROM products GROUP BY CAST(status AS TEXT), id % {STATS_SHARDS}
+    """,
+    f"""
+    INSERT INTO product_price_histogram (bucket, product_count)
+    SELECT {price_bucket("price")}, COUNT(*) FROM products
+    GROUP BY {price_bucket("price")}
+    """,
+]
+
+SQLITE_CREATE = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_insert AFTER INSERT ON products BEGIN
+        {STATS_ADD.format(row="new.")}
+        {HISTOGRAM_ADD.format(row="new.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_delete AFTER DELETE ON products BEGIN
+        {STATS_REMOVE.format(row="old.")}
+        {HISTOGRAM_REMOVE.format(row="old.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_stats_update
+    AFTER UPDATE OF status, price, stock_quantity ON products BEGIN
+        {STATS_REMOVE.format(row="old.")}
+        {STATS_ADD.format(row="new.")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_price_histogram_update
+    AFTER UPDATE OF price ON products WHEN old.price <> new.price BEGIN
+        {HISTOGRAM_REMOVE.format(row="old.")}
+        {HISTOGRAM_ADD.format(row="new.")}
+    END
+    """,
+    *REBUILD,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS products_price_histogram_update",
+    "DROP TRIGGER IF EXISTS products_stats_update",
+    "DROP TRIGGER IF EXISTS products_stats_delete",
+    "DROP TRIGGER IF EXISTS products_stats_insert",
+]
+
+POSTGRES_CREATE = [
+    f"""
+    CREATE OR REPLACE FUNCTION products_stats_update() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {STATS_REMOVE.format(row="OLD.")}
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {STATS_ADD.format(row="NEW.")}
+        END IF;
+        IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.price <> NEW.price) THEN
+            {HISTOGRAM_REMOVE.format(row="OLD.")}
+        END IF;
+        IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND OLD.price <> NEW.price) THEN
+            {HISTOGRAM_ADD.format(row="NEW.")}
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS products_stats_update ON products",
+    """
+    CREATE TRIGGER products_stats_update
+    AFTER INSERT OR DELETE OR UPDATE OF status, price, stock_quantity ON products
+    FOR EACH ROW EXECUTE FUNCTION products_stats_update()
+    """,
+    *REBUILD,
+]
+
+POSTGRES_DROP = [
+    "DROP TRIGGER IF EXISTS products_stats_update ON products",
+    "DROP FUNCTION IF EXISTS products_stats_update()",
+]
+
+CREATE_STATEMENTS = {"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE}
+DROP_STATEMENTS = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}
+
+
+def create_stats_triggers(connection):
+    for statement in CREATE_STATEMENTS.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+def drop_stats_triggers(connection):
+    for statement in DROP_STATEMENTS.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+def bucket_price(bucket: int) -> float:
+    """Estimate for the prices of a bucket, within the relative accuracy."""
+    return 2 * GAMMA**bucket / (GAMMA + 1)
+
+
+def price_percentiles(
+    buckets: Iterable[Tuple[int, int]], percentiles: Iterable[int] = PRICE_PERCENTILES
+) -> Dict[str, float]:
+    """
+    Nearest-rank percentiles from the (bucket, count) rows of the price
+    histogram, in bucket order. Reads at most one row per bucket in use, not
+    one per product.
+    """
+    buckets: List[Tuple[int, int]] = list(buckets)
+    total = sum(count for _, count in buckets)
+    if not total:
+        return {}
+    result = {}
+    targets = sorted(percentiles)
+    seen = 0
+    for bucket, count in buckets:
+        seen += count
+        while targets and seen >= math.ceil(targets[0] / 100 * total):
+            result[f"p{targets.pop(0)}"] = round(bucket_price(bucket), 2)
+        if not targets:
+            break
+    return result
@@ -0,0 +1,139 @@
+import re
+from typing import List
+
+# Índice de busca textual sobre name e description de 'products':
+# - SQLite: tabela virtual FTS5 de conteúdo externo (products_fts), mantida
+#   por triggers e ranqueada por bm25
+# - PostgreSQL: coluna tsvector (search_vector) com índice GIN, mantida por
+#   trigger e ranqueada por ts_rank_cd
+# As migrations têm uma cópia congelada deste DDL; aqui ele é usado pelo
+# create_all (testes e bancos novos)
+
+FTS_TABLE = "products_fts"
+SEARCH_VECTOR_COLUMN = "search_vector"
+SEARCH_VECTOR_INDEX = "ix_products_search_vector"
+TEXT_SEARCH_CONFIG = "pg_catalog.simple"
+# Peso de uma ocorrência no nome em relação à descrição
+NAME_WEIGHT = 10.0
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO products_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    # Indexa as linhas que já existiam
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS products_fts_update",
+    "DROP TRIGGER IF EXISTS products_fts_delete",
+    "DROP TRIGGER IF EXISTS products_fts_insert",
+    "DROP TABLE IF EXISTS products_fts",
+]
+
+POSTGRES_SEARCH_VECTOR = (
+    "setweight(to_tsvector('pg_catalog.simple', coalesce({row}name, '')), 'A') || "
+    "setweight(to_tsvector('pg_catalog.simple', coalesce({row}description, '')), 'B')"
+)
+
+POSTGRES_CREATE = [
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    f"""
+    CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {POSTGRES_SEARCH_VECTOR.format(row="NEW.")};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS products_search_vector_update ON products",
+    """
+    CREATE TRIGGER products_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, description ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector_update()
+    """,
+    f"UPDATE products SET search_vector = {POSTGRES_SEARCH_VECTOR.format(row='')}",
+    """
+    CREATE INDEX IF NOT EXISTS ix_products_search_vector
+    ON products USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_DROP = [
+    "DROP TRIGGER IF EXISTS products_search_vector_update ON products",
+    "DROP FUNCTION IF EXISTS products_search_vector_update()",
+    "DROP INDEX IF EXISTS ix_products_search_vector",
+    "ALTER TABLE products DROP COLUMN IF EXISTS search_vector",
+]
+
+CREATE_STATEMENTS = {"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE}
+DROP_STATEMENTS = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}
+
+
+def create_search_index(connection):
+    for statement in CREATE_STATEMENTS.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+def drop_search_index(connection):
+    for statement in DROP_STATEMENTS.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+def is_search_object(name: str, type_: str) -> bool:
+    """
+    Whether a reflected table, column or index belongs to the search index:
+    it is created outside the ORM metadata, so autogenerate must skip it.
+    """
+    if type_ == "table":
+        # A tabela FTS5 e as tabelas internas dela (products_fts_data, _idx...)
+        return name == FTS_TABLE or name.startswith(f"{FTS_TABLE}_")
+    if type_ == "column":
+        return name == SEARCH_VECTOR_COLUMN
+    if type_ == "index":
+        return name == SEARCH_VECTOR_INDEX
+    return False
+
+
+def search_terms(query: str) -> List[str]:
+    """
+    Words of the user's query. Operators and quotes are discarded, so the
+    input never reaches the FTS5 or tsquery parsers as syntax.
+    """
+    return re.findall(r"\w+", query.lower())
+
+
+def sqlite_match(terms: List[str]) -> str:
+    # Todos os termos são exigidos; o último também casa como prefixo
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def postgres_tsquery(terms: List[str]) -> str:
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
@@ -0,0 +1,258 @@
+import random
+from typing import List, Sequence
+
+from sqlalchemy import Delete, Insert, Update, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.config import get_settings
+
+# Drivers assíncronos equivalentes aos drivers síncronos padrão
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Maps a sync database URL to the same database on its async driver."""
+    scheme, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+def to_read_only_url(url: str) -> str:
+    """Opens the same SQLite file through a 'mode=ro' URI."""
+    url = make_url(url)
+    return url.set(
+        database=f"file:{url.database}", query={"mode": "ro", "uri": "true"}
+    ).render_as_string(hide_password=False)
+
+
+def is_sqlite_file(url: str) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def sqlite_pragmas(read_only: bool = False) -> dict:
+    settings = get_settings()
+    pragmas = {
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "mmap_size": settings.sqlite_mmap_size,
+        "cache_size": settings.sqlite_cache_size,
+        "temp_store": settings.sqlite_temp_store,
+    }
+    if not read_only:
+        # Modo de journal e sincronismo só podem ser alterados por quem escreve
+        pragmas["journal_mode"] = settings.sqlite_journal_mode
+        pragmas["synchronous"] = settings.sqlite_synchronous
+    return pragmas
+
+
+def apply_sqlite_pragmas(sync_engine, read_only: bool = False):
+    """Registers a 'connect' hook that applies the tuning profile."""
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def engine_options(url: str, poolclass) -> dict:
+    """Explicit pool sizing: the dialect defaults vary between drivers."""
+    settings = get_settings()
+    options = {
+        "poolclass": poolclass,
+        "pool_size": settings.sql_pool_size,
+        "max_overflow": settings.sql_max_overflow,
+        "pool_timeout": settings.sql_pool_timeout,
+        "pool_recycle": settings.sql_pool_recycle,
+    }
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    elif backend == "postgresql":
+        # Conexões de rede: descarta conexões mortas e reaproveita as mais
+        # recentes (LIFO), deixando as ociosas expirarem no servidor
+        options["pool_pre_ping"] = settings.sql_pool_pre_ping
+        options["pool_use_lifo"] = True
+    return options
+
+
+def build_engine(url: str, read_only: bool = False):
+    engine = create_engine(url, **engine_options(url, QueuePool))
+    if engine.dialect.name == "sqlite":
+        apply_sqlite_pragmas(engine, read_only)
+    return engine
+
+
+def build_async_engine(url: str, read_only: bool = False):
+    async_engine = create_async_engine(
+        url, **engine_options(url, AsyncAdaptedQueuePool)
+    )
+    if async_engine.dialect.name == "sqlite":
+        apply_sqlite_pragmas(async_engine.sync_engine, read_only)
+    return async_engine
+
+
+def replica_urls(primary_url: str, configured: Sequence[str]) -> List[str]:
+    """
+    Replicas configured in DATABASE_REPLICA_URLS. Without them, a SQLite
+    primary is read through a read-only (mode=ro) connection to the same
+    file, so readers never queue behind the writer.
+    """
+    if configured:
+        return list(configured)
+    if get_settings().sqlite_read_only_engine and is_sqlite_file(primary_url):
+        return [to_read_only_url(primary_url)]
+    return []
+
+
+class RoutingSession(Session):
+    """
+    Session that sends writes (flushes and INSERT/UPDATE/DELETE statements)
+    to the primary and reads to a random replica. Once it has written, it
+    sticks to the primary so the request reads its own writes.
+    """
+
+    def __init__(self, primary=None, replicas=None, **kwargs):
+        super().__init__(**kwargs)
+        self.primary = primary
+        self.replicas = replicas or []
+        self.replica = random.choice(self.replicas) if self.replicas else None
+        self.wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.wrote = True
+        if self.wrote or self.replica is None:
+            return self.primary
+        return self.replica
+
+
+def routing_sessionmaker(primary, replicas: List):
+    return sessionmaker(
+        class_=RoutingSession,
+        primary=primary,
+        replicas=replicas,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+def async_routing_sessionmaker(primary, replicas: List):
+    # A AsyncSession delega o roteamento para a Session síncrona interna
+    return async_sessionmaker(
+        sync_session_class=RoutingSession,
+        primary=primary.sync_engine if primary is not None else None,
+        replicas=[replica.sync_engine for replica in replicas],
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+def read_sessionmaker(replicas: List, primary):
+    """Sessions for read-only endpoints: bound to one replica, never the primary."""
+    return sessionmaker(
+        class_=RoutingSession,
+        primary=replicas[0] if replicas else primary,
+        replicas=replicas,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+settings = get_settings()
+
+SQLALCHEMY_DATABASE_URL = settings.database_url
+SQLALCHEMY_ASYNC_DATABASE_URL = settings.async_database_url or to_async_url(
+    SQLALCHEMY_DATABASE_URL
+)
+SQLALCHEMY_REPLICA_URLS = replica_urls(
+    SQLALCHEMY_DATABASE_URL, settings.database_replica_urls
+)
+
+# Engines criadas por init_engines, no lifespan de cada worker: um pool de
+# conexões herdado de um fork seria compartilhado entre processos
+engine = None
+replica_engines: List = []
+async_engine = None
+async_replica_engines: List = []
+
+# As fábricas de sessão existem desde o import e são ligadas às engines no startup
+SessionLocal = routing_sessionmaker(None, [])
+ReadSessionLocal = read_sessionmaker([], None)
+AsyncSessionLocal = async_routing_sessionmaker(None, [])
+AsyncReadSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+# Leituras que alimentam o cache de produtos: uma réplica atrasada logo após
+# uma invalidação recolocaria a linha antiga no cache por todo o TTL
+PrimarySessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncPrimarySessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+def init_engines():
+    """
+    Creates the engines of this process and binds the session factories to
+    them. Called at startup, once per worker; does nothing if they exist.
+    """
+    global engine, replica_engines, async_engine, async_replica_engines
+    if engine is not None:
+        return
+    engine = build_engine(SQLALCHEMY_DATABASE_URL)
+    replica_engines = [
+        build_engine(url, read_only=True) for url in SQLALCHEMY_REPLICA_URLS
+    ]
+    async_engine = build_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL)
+    async_replica_engines = [
+        build_async_engine(to_async_url(url), read_only=True)
+        for url in SQLALCHEMY_REPLICA_URLS
+    ]
+    SessionLocal.configure(primary=engine, replicas=replica_engines)
+    ReadSessionLocal.configure(
+        primary=replica_engines[0] if replica_engines else engine,
+        replicas=replica_engines,
+    )
+    AsyncSessionLocal.configure(
+        primary=async_engine.sync_engine,
+        replicas=[replica.sync_engine for replica in async_replica_engines],
+    )
+    AsyncReadSessionLocal.configure(bind=(async_replica_engines or [async_engine])[0])
+    PrimarySessionLocal.configure(bind=engine)
+    AsyncPrimarySessionLocal.configure(bind=async_engine)
+
+
+async def dispose_engines():
+    """Closes the pooled connections of this process (graceful shutdown)."""
+    global engine, replica_engines, async_engine, async_replica_engines
+    for sync_engine in [engine, *replica_engines]:
+        if sync_engine is not None:
+            sync_engine.dispose()
+    for any_async_engine in [async_engine, *async_replica_engines]:
+        if any_async_engine is not None:
+            await any_async_engine.dispose()
+    engine, replica_engines = None, []
+    async_engine, async_replica_engines = None, []
+
+
+def all_engines() -> dict:
+    """Every engine of this process by name, for the pool metrics."""
+    if engine is None:
+        return {}
+    engines = {"primary": engine, "async_primary": async_engine.sync_engine}
+    for index, replica in enumerate(replica_engines):
+        engines[f"replica_{index}"] = replica
+    for index, replica in enumerate(async_replica_engines):
+        engines[f"async_replica_{index}"] = replica.sync_engine
+    return engines
+
+
+Base = declarative_base()
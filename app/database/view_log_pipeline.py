@@ -0,0 +1,417 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Iterable
+
+from app.config import get_settings
+from app.database.mongodb import VIEW_EVENT
+
+logger = logging.getLogger(__name__)
+
+
+class ViewLogPipeline:
+    """
+    Buffers product view events in a bounded in-memory queue and writes them
+    to MongoDB in batches from a background thread.
+
+    A batch is flushed when 'batch_size' events are waiting or every
+    'flush_interval' seconds, whichever happens first. When the queue is full
+    the caller waits at most 'enqueue_timeout' seconds for room (backpressure)
+    and the remaining events are dropped and counted, so the request path
+    never waits on MongoDB.
+
+    With an 'outbox', batches are appended to it instead, and a separate relay
+    thread moves them from the outbox to MongoDB. A MongoDB outage then only
+    delays the events: failed writes stay in the outbox and are retried after
+    a delay that doubles up to 'max_retry_delay', and the flusher keeps
+    draining the queue meanwhile. A batch that partially reached MongoDB
+    before failing is relayed again; the client applies each outbox event at
+    most once, by its 'event_id'.
+
+    The outbox only protects events once they leave the queue: the events
+    still queued when the process crashes, and those dropped while the queue
+    is full, are lost. Drops are counted as 'dropped'
+    (view_log_pipeline_dropped_total on /metrics).
+    """
+
+    def __init__(
+        self,
+        client,
+        max_queue_size: int,
+        batch_size: int,
+        flush_interval: float,
+        enqueue_timeout: float = 0.0,
+        outbox=None,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+    ):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.outbox = outbox
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._wakeup = threading.Event()
+        self._relay_wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._relay_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._relay_thread = None
+        # Espera atual antes de tentar o MongoDB de novo (0: sem falhas recentes)
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    @classmethod
+    def from_settings(cls, client, outbox=None) -> "ViewLogPipeline":
+        settings = get_settings()
+        return cls(
+            client,
+            max_queue_size=settings.view_log_queue_size,
+            batch_size=settings.view_log_batch_size,
+            flush_interval=settings.view_log_flush_interval,
+            enqueue_timeout=settings.view_log_enqueue_timeout,
+            outbox=outbox,
+            retry_delay=settings.view_log_relay_retry_delay,
+            max_retry_delay=settings.view_log_relay_max_retry_delay,
+        )
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="view-log-flusher", daemon=True
+        )
+        self._thread.start()
+        if self.outbox is not None:
+            self._relay_thread = threading.Thread(
+                target=self._run_relay, name="view-log-relay", daemon=True
+            )
+            self._relay_thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Stops the flusher and drains whatever is still queued. Events left in
+        the outbox are relayed by another worker or after the next start.
+        """
+        self._stopping.set()
+        self._notify()
+        for thread in (self._thread, self._relay_thread):
+            if thread is not None:
+                thread.join(timeout)
+        self._thread = self._relay_thread = None
+        self._drain()
+
+    def submit(self, product_id: int):
+        self.submit_many([product_id])
+
+    def submit_many(
+        self, product_ids: Iterable[int], kind: str = VIEW_EVENT, weight: int = 1
+    ):
+        """
+        Queues one event per product. 'weight' is how many events each one
+        stands for (sampling); both fields are omitted at their defaults.
+        """
+        viewed_at = datetime.now()
+        enqueued = dropped = 0
+        waited = False
+        for product_id in product_ids:
+            event = {"product_id": product_id, "viewed_at": viewed_at}
+            if kind != VIEW_EVENT:
+                event["kind"] = kind
+            if weight != 1:
+                event["weight"] = weight
+            try:
+                self._queue.put_nowait(event)
+                enqueued += 1
+                continue
+            except queue.Full:
+                pass
+            # Fila cheia: acorda o flusher e espera (uma única vez) por espaço
+            self._notify()
+            if not waited and self.enqueue_timeout > 0:
+                waited = True
+                try:
+                    self._queue.put(event, timeout=self.enqueue_timeout)
+                    enqueued += 1
+                    continue
+                except queue.Full:
+                    pass
+            dropped += 1
+
+        self._record("enqueued", enqueued)
+        self._record("dropped", dropped)
+        if self._queue.qsize() >= self.batch_size:
+            self._notify()
+
+    def flush(self):
+        """Writes every queued event to MongoDB, through the outbox if there is one."""
+        self._drain()
+        if self.outbox is not None:
+            self.relay()
+
+    def _drain(self):
+        """
+        Moves the queued events, in batches of 'batch_size', to the outbox or,
+        without one, straight to MongoDB.
+        """
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                if self.outbox is None or not self._append_to_outbox(batch):
+                    self._write(batch)
+        if self.outbox is not None:
+            self._relay_wakeup.set()
+
+    def relay(self) -> int:
+        """
+        Moves the outbox to MongoDB until it is empty or a write fails;
+        returns how many events were written.
+        """
+        relayed = 0
+        with self._relay_lock:
+            if time.monotonic() < self._retry_at:
+                return relayed
+            while True:
+                ids, events = self.outbox.claim(self.batch_size)
+                if not ids:
+                    break
+                if not self._write(events):
+                    self.outbox.release(ids)
+                    self._schedule_retry()
+                    break
+                self.outbox.complete(ids)
+                relayed += len(ids)
+                self._backoff = 0.0
+        return relayed
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = {
+                "queued": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+            }
+        if self.outbox is not None:
+            stats.update(self.outbox.lag())
+        return stats
+
+    def _append_to_outbox(self, batch: list) -> bool:
+        try:
+            self.outbox.append(batch)
+        except Exception:
+            # Disco cheio ou arquivo bloqueado: o lote vai direto para o MongoDB
+            logger.exception(
+                "Failed to append %d view events to the outbox", len(batch)
+            )
+            return False
+        return True
+
+    def _write(self, batch: list) -> bool:
+        try:
+            self.client.log_product_views(batch)
+        except Exception:
+            logger.exception("Failed to write %d product view logs", len(batch))
+            self._record("failed", len(batch))
+            return False
+        self._record("written", len(batch))
+        return True
+
+    def _schedule_retry(self):
+        self._backoff = min(
+            max(self._backoff * 2, self.retry_delay), self.max_retry_delay
+        )
+        self._retry_at = time.monotonic() + self._backoff
+
+    def _take_batch(self) -> list:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _record(self, name: str, amount: int):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _notify(self):
+        self._wakeup.set()
+        self._relay_wakeup.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+
+    def _run_relay(self):
+        while not self._stopping.is_set():
+            try:
+                self.relay()
+            except Exception:
+                # Outbox inacessível: tenta de novo no próximo ciclo
+                logger.exception("Failed to relay the view event outbox")
+            self._relay_wakeup.wait(max(self._backoff, self.flush_interval))
+            self._relay_wakeup.clear()
+
+
+class AsyncViewLogPipeline(ViewLogPipeline):
+    """
+    Variant of ViewLogPipeline for AsyncProductLogClient: the flusher is a
+    task on the event loop. Events submitted while the queue is full are
+    dropped right away, since waiting for room would block the loop.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_queue_size: int,
+        batch_size: int,
+        flush_interval: float,
+        enqueue_timeout: float = 0.0,
+        outbox=None,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+    ):
+        super().__init__(
+            client,
+            max_queue_size,
+            batch_size,
+            flush_interval,
+            0.0,
+            outbox,
+            retry_delay,
+            max_retry_delay,
+        )
+        self._async_wakeup = None
+        self._async_relay_wakeup = None
+        self._async_flush_lock = None
+        self._async_relay_lock = None
+        self._task = None
+        self._relay_task = None
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping.clear()
+        self._async_wakeup = asyncio.Event()
+        self._async_relay_wakeup = asyncio.Event()
+        self._async_flush_lock = asyncio.Lock()
+        self._async_relay_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        self._task = loop.create_task(self._run_async())
+        if self.outbox is not None:
+            self._relay_task = loop.create_task(self._run_relay_async())
+
+    async def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        self._notify()
+        for task in (self._task, self._relay_task):
+            if task is not None:
+                try:
+                    await asyncio.wait_for(task, timeout)
+                except asyncio.TimeoutError:
+                    pass
+        self._task = self._relay_task = None
+        await self._drain()
+
+    async def flush(self):
+        await self._drain()
+        if self.outbox is not None:
+            await self.relay()
+
+    async def _drain(self):
+        if self._async_flush_lock is None:
+            self._async_flush_lock = asyncio.Lock()
+        async with self._async_flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                # O SQLite da outbox é síncrono: roda fora do event loop
+                if self.outbox is None or not await asyncio.to_thread(
+                    self._append_to_outbox, batch
+                ):
+                    await self._write(batch)
+        if self._async_relay_wakeup is not None:
+            self._async_relay_wakeup.set()
+
+    async def relay(self) -> int:
+        if self._async_relay_lock is None:
+            self._async_relay_lock = asyncio.Lock()
+        relayed = 0
+        async with self._async_relay_lock:
+            if time.monotonic() < self._retry_at:
+                return relayed
+            while True:
+                ids, events = await asyncio.to_thread(
+                    self.outbox.claim, self.batch_size
+                )
+                if not ids:
+                    break
+                if not await self._write(events):
+                    await asyncio.to_thread(self.outbox.release, ids)
+                    self._schedule_retry()
+                    break
+                await asyncio.to_thread(self.outbox.complete, ids)
+                relayed += len(ids)
+                self._backoff = 0.0
+        return relayed
+
+    async def _write(self, batch: list) -> bool:
+        try:
+            await self.client.log_product_views(batch)
+        except Exception:
+            logger.exception("Failed to write %d product view logs", len(batch))
+            self._record("failed", len(batch))
+            return False
+        self._record("written", len(batch))
+        return True
+
+    def _notify(self):
+        if self._async_wakeup is not None:
+            self._async_wakeup.set()
+            self._async_relay_wakeup.set()
+
+    async def _run_async(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._async_wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._async_wakeup.clear()
+            await self._drain()
+
+    async def _run_relay_async(self):
+        while not self._stopping.is_set():
+            try:
+                await self.relay()
+            except Exception:
+                logger.exception("Failed to relay the view event outbox")
+            try:
+                await asyncio.wait_for(
+                    self._async_relay_wakeup.wait(),
+                    max(self._backoff, self.flush_interval),
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._async_relay_wakeup.clear()
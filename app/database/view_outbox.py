@@ -0,0 +1,167 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from app.config import get_settings
+from app.database.mongodb import VIEW_EVENT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS view_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id INTEGER NOT NULL,
+    viewed_at TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'view',
+    weight INTEGER NOT NULL DEFAULT 1,
+    claimed_until REAL
+)
+"""
+
+# Identifica o arquivo: os ids das linhas só são únicos dentro dele
+META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS view_outbox_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+)
+"""
+
+# Um único UPDATE ... RETURNING: dois relays nunca pegam o mesmo evento
+CLAIM = """
+UPDATE view_outbox SET claimed_until = ?
+WHERE id IN (
+    SELECT id FROM view_outbox
+    WHERE claimed_until IS NULL OR claimed_until < ?
+    ORDER BY id LIMIT ?
+)
+RETURNING id, product_id, viewed_at, kind, weight
+"""
+
+
+class ViewOutbox:
+    """
+    Durable buffer of view events between the request path and MongoDB: a
+    local SQLite file (WAL) that events are appended to and only removed
+    from once the relay has written them to MongoDB.
+
+    The worker processes of a host can share the file. A relay claims a batch
+    for 'lease' seconds, so each event is relayed by a single worker, and the
+    batch of a worker that died is claimed again once the lease expires.
+
+    A batch can therefore be relayed more than once. Each claimed event has a
+    stable 'event_id' (the id of this file plus the row id), which MongoDB
+    uses to apply it only once.
+    """
+
+    def __init__(self, path: str, lease: float = 60.0, busy_timeout: float = 5.0):
+        self.path = path
+        self.lease = lease
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Usada pelo flusher, pelo relay e pelas coletas de métricas
+        self._connection = sqlite3.connect(
+            path, timeout=busy_timeout, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(SCHEMA)
+            self._connection.execute(META_SCHEMA)
+            # Processos que abrem o arquivo juntos leem o mesmo id
+            self._connection.execute(
+                "INSERT OR IGNORE INTO view_outbox_meta (key, value) "
+                "VALUES ('instance', ?)",
+                (uuid.uuid4().hex,),
+            )
+            (self.instance,) = self._connection.execute(
+                "SELECT value FROM view_outbox_meta WHERE key = 'instance'"
+            ).fetchone()
+
+    @classmethod
+    def from_settings(cls, environment: str = None) -> Optional["ViewOutbox"]:
+        """The configured outbox, or None when VIEW_LOG_OUTBOX_PATH is empty."""
+        settings = get_settings()
+        # Nos testes os eventos vão direto para o MongoDB de teste: uma outbox
+        # compartilhada levaria eventos de uma execução para a seguinte
+        if environment == "test" or not settings.view_log_outbox_path:
+            return None
+        return cls(settings.view_log_outbox_path, lease=settings.view_log_relay_lease)
+
+    def append(self, events: List[dict]):
+        rows = [
+            (
+                event["product_id"],
+                event["viewed_at"].isoformat(),
+                event.get("kind", VIEW_EVENT),
+                event.get("weight", 1),
+            )
+            for event in events
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO view_outbox (product_id, viewed_at, kind, weight) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def claim(self, limit: int) -> Tuple[List[int], List[dict]]:
+        """Claims the oldest unclaimed events; returns their ids and the events."""
+        now = time.time()
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                CLAIM, (now + self.lease, now, limit)
+            ).fetchall()
+        rows.sort()
+        ids, events = [], []
+        for id, product_id, viewed_at, kind, weight in rows:
+            ids.append(id)
+            event = {
+                "event_id": f"{self.instance}:{id}",
+                "product_id": product_id,
+                "viewed_at": datetime.fromisoformat(viewed_at),
+            }
+            # Mesmo formato dos eventos da fila: campos padrão são omitidos
+            if kind != VIEW_EVENT:
+                event["kind"] = kind
+            if weight != 1:
+                event["weight"] = weight
+            events.append(event)
+        return ids, events
+
+    def complete(self, ids: List[int]):
+        """Removes events that were written to MongoDB."""
+        self._execute_for_ids("DELETE FROM view_outbox WHERE id IN ({})", ids)
+
+    def release(self, ids: List[int]):
+        """Returns events whose write failed, so they can be claimed again."""
+        self._execute_for_ids(
+            "UPDATE view_outbox SET claimed_until = NULL WHERE id IN ({})", ids
+        )
+
+    def lag(self) -> dict:
+        """Events waiting to be relayed and the age (s) of the oldest one."""
+        with self._lock:
+            pending, oldest = self._connection.execute(
+                "SELECT COUNT(*), MIN(viewed_at) FROM view_outbox"
+            ).fetchone()
+        age = 0.0
+        if oldest is not None:
+            age = max(
+                (datetime.now() - datetime.fromisoformat(oldest)).total_seconds(), 0.0
+            )
+        return {"outbox_pending": pending, "outbox_lag_seconds": age}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _execute_for_ids(self, statement: str, ids: List[int]):
+        if not ids:
+            return
+        placeholders = ",".join("?" * len(ids))
+        with self._lock, self._connection:
+            self._connection.execute(statement.format(placeholders), ids)
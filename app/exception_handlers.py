@@ -1,8 +1,21 @@
+from typing import List
+
 from fastapi import Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
-from app.exceptions import NotFound
+from app.exceptions import BadRequest, Conflict, NotFound, PreconditionFailed
+
+
+def format_validation_errors(errors) -> List[str]:
+    # Extraindo as mensagens de erro de validação e simplificando-as
+    error_details = []
+    for err in errors:
+        loc = err.get("loc")  # Localização do erro, onde o erro ocorreu
+        field = loc[-1] if loc else "__root__"
+        msg = err.get("msg")  # Mensagem do erro
+        error_details.append(f"Field '{str(field)}': {str(msg).lower()}")
+    return error_details
 
 
 async def not_found_exception_handler(request: Request, exception: NotFound):
@@ -11,13 +24,25 @@ async def not_found_exception_handler(request: Request, exception: NotFound):
     )
 
 
+async def bad_request_exception_handler(request: Request, exception: BadRequest):
+    return JSONResponse(status_code=400, content={"message": exception.message})
+
+
+async def conflict_exception_handler(request: Request, exception: Conflict):
+    return JSONResponse(status_code=409, content={"message": exception.message})
+
+
+async def precondition_failed_exception_handler(
+    request: Request, exception: PreconditionFailed
+):
+    return JSONResponse(
+        status_code=412,
+        content={"message": f"{exception.name} has been modified by another request."},
+    )
+
+
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    # Extraindo as mensagens de erro de validação e simplificando-as
-    error_details = []
-    for err in exc.errors():
-        field = err.get("loc")[-1]  # Localização do erro, onde o erro ocorreu
-        msg = err.get("msg")  # Mensagem do erro
-        error_details.append(f"Field '{str(field)}': {str(msg).lower()}")
+    error_details = format_validation_errors(exc.errors())
 
     # Retornando uma resposta mais amigável
     return JSONResponse(
@@ -1,3 +1,18 @@
 class NotFound(Exception):
     def __init__(self, name: str):
         self.name = name
+
+
+class BadRequest(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+
+class PreconditionFailed(Exception):
+    def __init__(self, name: str):
+        self.name = name
+
+
+class Conflict(Exception):
+    def __init__(self, message: str):
+        self.message = message
@@ -0,0 +1,42 @@
+import csv
+import io
+import json
+from typing import Iterable, Sequence
+
+from app.schemas import product_schema
+
+# Colunas exportadas, na ordem do cabeçalho do CSV
+EXPORT_COLUMNS = ("id", "name", "description", "price", "status", "stock_quantity")
+
+MEDIA_TYPES = {
+    product_schema.ExportFormat.ndjson: "application/x-ndjson",
+    product_schema.ExportFormat.csv: "text/csv",
+}
+
+
+def _row_values(row: Sequence) -> tuple:
+    id, name, description, price, status, stock_quantity = row
+    return id, name, description, float(price), status.value, stock_quantity
+
+
+def format_header(export_format: product_schema.ExportFormat) -> str:
+    if export_format == product_schema.ExportFormat.csv:
+        return format_rows(export_format, [EXPORT_COLUMNS], header=True)
+    return ""
+
+
+def format_rows(
+    export_format: product_schema.ExportFormat,
+    rows: Iterable[Sequence],
+    header: bool = False,
+) -> str:
+    """Formats a chunk of (EXPORT_COLUMNS) rows as one block of text."""
+    if export_format == product_schema.ExportFormat.ndjson:
+        return "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, _row_values(row)))) + "\n"
+            for row in rows
+        )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows(rows if header else map(_row_values, rows))
+    return buffer.getvalue()
@@ -0,0 +1,127 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Awaitable, Callable, List, Tuple
+
+from pydantic import ValidationError
+
+from app.exception_handlers import format_validation_errors
+from app.export import EXPORT_COLUMNS
+from app.schemas import product_schema
+
+# Máximo de linhas rejeitadas detalhadas no resumo da importação
+MAX_REPORTED_ERRORS = 1000
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Splits a stream of bytes into (line number, line) pairs, incrementally."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield line_number + 1, buffer.rstrip("\r")
+
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]):
+    async for line_number, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ValueError(f"Invalid JSON: {e.msg.lower()}")
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]):
+    """
+    Yields one dict per CSV record, keyed by the header row. A record whose
+    quotes are still open continues on the next line (quoted newlines).
+    """
+    header = None
+    pending, start = [], None
+    async for line_number, line in iter_lines(chunks):
+        if not pending:
+            start = line_number
+        pending.append(line)
+        record = "\n".join(pending)
+        if record.count('"') % 2:
+            continue
+        pending = []
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = values
+            continue
+        if len(values) != len(header):
+            yield start, ValueError(
+                f"Expected {len(header)} columns, got {len(values)}."
+            )
+            continue
+        yield start, dict(zip(header, values))
+    if pending:
+        yield start, ValueError("Unterminated quoted field.")
+
+
+RECORD_READERS = {
+    product_schema.ExportFormat.ndjson: iter_ndjson_records,
+    product_schema.ExportFormat.csv: iter_csv_records,
+}
+
+
+async def import_products(
+    chunks: AsyncIterator[bytes],
+    import_format: product_schema.ExportFormat,
+    chunk_size: int,
+    write_chunk: Callable[[List[product_schema.ProductCreate]], Awaitable[None]],
+) -> product_schema.ProductImportSummary:
+    """
+    Validates each record against ProductCreate as it is read and hands the
+    valid ones to 'write_chunk' every 'chunk_size' products, so only one
+    chunk is ever held in memory. Chunks already written stay committed if a
+    later chunk fails.
+    """
+    summary = product_schema.ProductImportSummary()
+    products = []
+    async for line_number, record in RECORD_READERS[import_format](chunks):
+        if isinstance(record, dict):
+            # A coluna 'id' da exportação é ignorada: o banco gera novos ids
+            record = {key: record[key] for key in EXPORT_COLUMNS[1:] if key in record}
+            try:
+                products.append(product_schema.ProductCreate.model_validate(record))
+            except ValidationError as e:
+                record = e
+        elif not isinstance(record, Exception):
+            record = ValueError("Each record must be a JSON object.")
+
+        if isinstance(record, Exception):
+            summary.rejected += 1
+            if len(summary.errors) < MAX_REPORTED_ERRORS:
+                errors = (
+                    format_validation_errors(record.errors())
+                    if isinstance(record, ValidationError)
+                    else [str(record)]
+                )
+                summary.errors.append(
+                    product_schema.ProductImportError(line=line_number, errors=errors)
+                )
+            continue
+
+        if len(products) >= chunk_size:
+            await write_chunk(products)
+            summary.accepted += len(products)
+            summary.chunks += 1
+            products = []
+
+    if products:
+        await write_chunk(products)
+        summary.accepted += len(products)
+        summary.chunks += 1
+    return summary
@@ -1,16 +1,84 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 
-from app import exception_handlers, exceptions
-from app.controllers import product_controller
+from app import (
+    compression,
+    exception_handlers,
+    exceptions,
+    metrics,
+    responses,
+    startup,
+)
+from app.config import get_settings
+from app.controllers import (
+    admin_controller,
+    health_controller,
+    metrics_controller,
+    product_controller,
+)
+from app.database import sql
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Engines e clientes externos criados no startup de cada worker (depois
+    # do fork) e fechados no shutdown; nada disso acontece no import
+    with startup.profile.phase("sql_engines"):
+        sql.init_engines()
+    await product_controller.product_controller.startup()
+    if settings.metrics_enabled:
+        metrics_controller.metrics_controller.startup()
+    startup.profile.mark_ready()
+    yield
+    # Daqui em diante /health/ready responde 503
+    startup.profile.mark_stopping()
+    if settings.metrics_enabled:
+        # Último snapshot antes de fechar o que os coletores leem (outbox, pools)
+        metrics_controller.metrics_controller.shutdown()
+    await product_controller.product_controller.shutdown()
+    await sql.dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=responses.json_response_class())
 
-app = FastAPI()
+settings = get_settings()
+if settings.compression_encodings:
+    app.add_middleware(
+        compression.CompressionMiddleware,
+        encodings=settings.compression_encodings,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+if settings.metrics_enabled:
+    metrics.instrument_sqlalchemy(settings.slow_query_threshold_ms / 1000)
+    metrics_controller.metrics_controller.register_collectors()
+    # Adicionado por último: o mais externo, mede também a compressão
+    app.add_middleware(metrics.MetricsMiddleware, server_timing=settings.server_timing)
 
 app.add_exception_handler(
     exceptions.NotFound, exception_handlers.not_found_exception_handler
 )
+app.add_exception_handler(
+    exceptions.BadRequest, exception_handlers.bad_request_exception_handler
+)
+app.add_exception_handler(
+    exceptions.Conflict, exception_handlers.conflict_exception_handler
+)
+app.add_exception_handler(
+    exceptions.PreconditionFailed,
+    exception_handlers.precondition_failed_exception_handler,
+)
 app.add_exception_handler(
     RequestValidationError, exception_handlers.validation_exception_handler
 )
 
 app.include_router(product_controller.product_controller.router)
+app.include_router(admin_controller.admin_controller.router)
+app.include_router(health_controller.health_controller.router)
+if settings.metrics_enabled:
+    app.include_router(metrics_controller.metrics_controller.router)
+
+startup.profile.mark_imported()
@@ -0,0 +1,501 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> List[Tuple[str, tuple, float]]:
+        with self._lock:
+            return [("", key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # Por combinação de labels: contagem por bucket (não cumulativa), soma, total
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            counts, total = self._values.setdefault(
+                label_values, [[0] * (len(self.buckets) + 1), [0.0, 0]]
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+            total[1] += 1
+
+    def count(self, *label_values) -> int:
+        values = self._values.get(label_values)
+        return values[1][1] if values else 0
+
+    def samples(self) -> List[Tuple[str, tuple, float]]:
+        samples = []
+        with self._lock:
+            for key, (counts, (total, count)) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket_count
+                    samples.append(("_bucket", key + (("le", bound),), cumulative))
+                samples.append(("_sum", key, total))
+                samples.append(("_count", key, count))
+        return samples
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_pairs(names: tuple, key: tuple) -> tuple:
+    # Labels declarados primeiro; pares extras (como 'le') vêm no fim da chave
+    return tuple(zip(names, key[: len(names)])) + tuple(key[len(names) :])
+
+
+def _format_labels(pairs: tuple) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render_families(families: List[dict]) -> str:
+    """Prometheus text of metric families, as returned by Registry.collect."""
+    lines = []
+    for family in families:
+        if family["help"]:
+            lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for suffix, labels, value in family["samples"]:
+            lines.append(f"{family['name']}{suffix}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+        # Coletores chamados a cada scrape, para valores lidos no momento (pools, filas)
+        self.collectors: List[Callable[[], List[Tuple[str, str, dict, float]]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), **kw):
+        metric = Histogram(name, help, labels, **kw)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable):
+        self.collectors.append(collector)
+
+    def collect(self) -> List[dict]:
+        """
+        Current values grouped in families: name, type, help and the samples
+        as (suffix, label pairs, value).
+        """
+        families = [
+            {
+                "name": metric.name,
+                "type": metric.type,
+                "help": metric.help,
+                "samples": [
+                    (suffix, _label_pairs(metric.labels, key), value)
+                    for suffix, key, value in metric.samples()
+                ],
+            }
+            for metric in self.metrics
+        ]
+        collected = {}
+        for collector in self.collectors:
+            try:
+                samples = collector()
+            except Exception:
+                logger.exception("Metrics collector failed.")
+                continue
+            for name, type, labels, value in samples:
+                if name not in collected:
+                    collected[name] = {
+                        "name": name,
+                        "type": type,
+                        "help": None,
+                        "samples": [],
+                    }
+                    families.append(collected[name])
+                collected[name]["samples"].append(("", tuple(labels.items()), value))
+        return families
+
+    def render(self) -> str:
+        return render_families(self.collect())
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Time until the response is complete, per route.",
+    ("method", "route"),
+)
+http_request_sql_queries = registry.histogram(
+    "http_request_sql_queries",
+    "SQL statements executed per request.",
+    ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+sql_query_duration = registry.histogram(
+    "sql_query_duration_seconds", "SQL statement execution time.", ("statement",)
+)
+sql_slow_queries = registry.counter(
+    "sql_slow_queries_total", "SQL statements slower than the slow query threshold."
+)
+mongodb_command_duration = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command execution time.", ("command",)
+)
+mongodb_command_failures = registry.counter(
+    "mongodb_command_failures_total", "MongoDB commands that failed.", ("command",)
+)
+
+
+class RequestTimings:
+    """Time spent by one request in each backend, for Server-Timing."""
+
+    def __init__(self):
+        self.sql_seconds = 0.0
+        self.sql_queries = 0
+        self.mongo_seconds = 0.0
+        self.mongo_commands = 0
+
+
+# O objeto é compartilhado com o threadpool (o contexto é copiado, não o objeto)
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+def statement_type(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+# Limite (segundos) a partir do qual um comando SQL é registrado no log
+_sql_settings = {"slow_query_threshold": 0.2}
+
+
+def instrument_sqlalchemy(slow_query_threshold: float):
+    """Times every statement of every engine (sync and async) of this process."""
+    _sql_settings["slow_query_threshold"] = slow_query_threshold
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    sql_query_duration.observe(elapsed, statement_type(statement))
+    timings = current_timings.get()
+    if timings is not None:
+        timings.sql_seconds += elapsed
+        timings.sql_queries += 1
+    if elapsed >= _sql_settings["slow_query_threshold"]:
+        sql_slow_queries.inc()
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement[:500])
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        mongodb_command_failures.inc(event.command_name)
+        self._record(event)
+
+    def _record(self, event):
+        elapsed = event.duration_micros / 1_000_000
+        mongodb_command_duration.observe(elapsed, event.command_name)
+        timings = current_timings.get()
+        if timings is not None:
+            timings.mongo_seconds += elapsed
+            timings.mongo_commands += 1
+
+
+mongo_listener = MongoCommandListener()
+
+
+def pool_collector(engines: Callable[[], Dict[str, Engine]]):
+    """Checked-out, idle and overflow connections of each SQLAlchemy pool."""
+
+    def collect():
+        samples = []
+        for name, engine in engines().items():
+            pool = engine.pool
+            for metric, method in (
+                ("sql_pool_size", "size"),
+                ("sql_pool_checked_out", "checkedout"),
+                ("sql_pool_checked_in", "checkedin"),
+                ("sql_pool_overflow", "overflow"),
+            ):
+                if hasattr(pool, method):
+                    samples.append(
+                        (metric, "gauge", {"engine": name}, getattr(pool, method)())
+                    )
+        return samples
+
+    return collect
+
+
+def stats_collector(name: str, stats: Callable[[], Optional[dict]], gauges=()):
+    """Exposes a component's stats() dict: counters, except the 'gauges' keys."""
+
+    def collect():
+        values = stats() or {}
+        return [
+            (
+                f"{name}_{key}" if key in gauges else f"{name}_{key}_total",
+                "gauge" if key in gauges else "counter",
+                {},
+                value,
+            )
+            for key, value in values.items()
+        ]
+
+    return collect
+
+
+def server_timing(timings: RequestTimings, total: float) -> str:
+    app_seconds = max(total - timings.sql_seconds - timings.mongo_seconds, 0.0)
+    return ", ".join(
+        [
+            f'sql;dur={timings.sql_seconds * 1000:.2f};desc="{timings.sql_queries} queries"',
+            f'mongo;dur={timings.mongo_seconds * 1000:.2f};desc="{timings.mongo_commands} commands"',
+            f"app;dur={app_seconds * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ]
+    )
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, status and SQL query count of each request under its
+    route template, and optionally reports the time spent in SQL, MongoDB and
+    the application itself (handler and serialization) in Server-Timing.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_metrics(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing",
+                        server_timing(timings, time.perf_counter() - started),
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            current_timings.reset(token)
+            route = scope.get("route")
+            route = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            http_requests.inc(method, route, status)
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+            http_request_sql_queries.observe(timings.sql_queries, method, route)
+
+
+# Snapshots de workers encerrados: contadores e histogramas continuam somados
+EXITED_PREFIX = "exited-"
+
+
+def merge_families(snapshots: Iterable[Tuple[Optional[str], List[dict]]]) -> List[dict]:
+    """
+    Merges the families of several processes, given as (pid, families):
+    counters and histograms are summed and gauges get a 'pid' label. A pid of
+    None marks a process that exited, whose gauges are dropped.
+    """
+    merged: Dict[str, dict] = {}
+    for pid, families in snapshots:
+        for family in families:
+            target = merged.setdefault(family["name"], {**family, "samples": {}})
+            for suffix, labels, value in family["samples"]:
+                labels = tuple(tuple(pair) for pair in labels)
+                if family["type"] == "gauge":
+                    if pid is None:
+                        continue
+                    labels += (("pid", pid),)
+                key = (suffix, labels)
+                target["samples"][key] = target["samples"].get(key, 0) + value
+    return [
+        {
+            **family,
+            "samples": [
+                (suffix, labels, value)
+                for (suffix, labels), value in family["samples"].items()
+            ],
+        }
+        for family in merged.values()
+    ]
+
+
+class MultiprocessMetrics:
+    """
+    Metrics of every worker of the server, shared through a directory: each
+    worker writes a snapshot of its registry to '<pid>.json' every 'interval'
+    seconds and when it stops, and a scrape, answered by any worker, merges
+    the snapshots. The other workers' values can be up to 'interval' seconds
+    old.
+    """
+
+    def __init__(self, registry: Registry, directory: str, interval: float):
+        self.registry = registry
+        self.directory = Path(directory)
+        self.interval = interval
+        self.pid = os.getpid()
+        self._stopping = threading.Event()
+        self._thread = None
+        # Gravador periódico e scrapes escrevem o mesmo arquivo temporário
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, registry: Registry) -> "MultiprocessMetrics":
+        settings = get_settings()
+        return cls(
+            registry,
+            settings.metrics_multiprocess_dir,
+            settings.metrics_multiprocess_interval,
+        )
+
+    def write(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{self.pid}.json"
+        temporary = path.with_suffix(".tmp")
+        with self._write_lock:
+            temporary.write_text(json.dumps(self.registry.collect()))
+            # Troca atômica: quem lê nunca encontra um arquivo pela metade
+            os.replace(temporary, path)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.write()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.write()
+            except Exception:
+                logger.exception("Failed to write the metrics snapshot")
+
+    def collect(self) -> List[dict]:
+        # O próprio snapshot é atualizado antes: os valores deste worker são atuais
+        self.write()
+        snapshots = []
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                families = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue  # Removido ou substituído durante a leitura
+            pid = path.stem
+            snapshots.append((None if pid.startswith(EXITED_PREFIX) else pid, families))
+        return merge_families(snapshots)
+
+    def render(self) -> str:
+        return render_families(self.collect())
+
+
+def clear_multiprocess_dir(directory: str):
+    """Removes the snapshots of a previous run (server startup)."""
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    for snapshot in path.glob("*.json"):
+        snapshot.unlink(missing_ok=True)
+
+
+def mark_process_exited(directory: str, pid: int):
+    """
+    Keeps the counters of a worker that exited in the aggregate and drops its
+    gauges. A rename, so a concurrent scrape never counts the worker twice.
+    """
+    path = Path(directory) / f"{pid}.json"
+    if path.exists():
+        # Com o instante no nome: o pid pode ser reutilizado por outro worker
+        exited = f"{EXITED_PREFIX}{pid}-{time.time_ns()}.json"
+        os.replace(path, path.with_name(exited))
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, DateTime, Enum, Index, Integer, String
+
+from app.database.sql import Base
+from app.models.product_model import utcnow
+from app.schemas import job_schema
+
+
+class Job(Base):
+    """
+    Background job stored in the SQL database, so it is enqueued in the same
+    transaction as the write that requires it.
+    """
+
+    __tablename__ = "jobs"
+    # Próximo job a executar: pendentes cujo horário já chegou, em ordem de id
+    __table_args__ = (
+        Index("ix_jobs_status_run_after_id", "status", "run_after", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(Enum(job_schema.JobKind), nullable=False)
+    product_id = Column(Integer, nullable=False)
+    status = Column(
+        Enum(job_schema.JobStatus),
+        nullable=False,
+        default=job_schema.JobStatus.pending,
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(Integer)
+    last_error = Column(String(255))
+    # Só é executado a partir deste horário (espera entre as tentativas)
+    run_after = Column(DateTime, nullable=False, default=utcnow)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow)
@@ -1,11 +1,51 @@
-from sqlalchemy import Column, Enum, Integer, Numeric, String
+from datetime import datetime, timezone
 
-from app.database.sqlite import Base
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    event,
+    func,
+    insert,
+)
+
+from app.database import product_stats, search
+from app.database.sql import Base
 from app.schemas import product_schema
 
+# Linhas de product_catalog, criadas junto com a tabela: o contador do
+# catálogo é a soma delas. Os ajustes de estoque atualizam a linha do produto
+# (catalog_shard), as demais escritas a primeira
+CATALOG_ID = 1
+CATALOG_SHARDS = 16
+
+
+def catalog_shard(product_id: int) -> int:
+    return CATALOG_ID + product_id % CATALOG_SHARDS
+
+
+def utcnow() -> datetime:
+    # Datas gravadas em UTC, sem fuso (portável entre SQLite e PostgreSQL)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class Product(Base):
     __tablename__ = "products"
+    # Índices compostos (coluna, id) usados pela paginação por cursor
+    __table_args__ = (
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_stock_quantity_id", "stock_quantity", "id"),
+        Index("ix_products_status_id", "status", "id"),
+        Index("ix_products_status_price_id", "status", "price", "id"),
+        # Ids de produtos excluídos não voltam: os jobs de purga são por id
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(128), nullable=False)
@@ -13,3 +53,83 @@ class Product(Base):
     price = Column(Numeric, nullable=False)
     status = Column(Enum(product_schema.ProductStatus))
     stock_quantity = Column(Integer, nullable=False)
+    # Versão da linha: incrementada pelo ORM a cada UPDATE, que só é aplicado
+    # se a versão no banco ainda for a que foi lida (concorrência otimista)
+    version = Column(Integer, nullable=False, server_default="1")
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=utcnow,
+        onupdate=utcnow,
+        server_default=func.now(),
+    )
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class ProductCatalog(Base):
+    """
+    Table-level change counter of 'products', split in CATALOG_SHARDS rows:
+    one of them is bumped in the same transaction as every write, so listings
+    can be validated without reading any product.
+    """
+
+    __tablename__ = "product_catalog"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, server_default="0")
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class ProductStats(Base):
+    """
+    Running totals of 'products' per status (ProductStatus name) and shard
+    (id % STATS_SHARDS), kept up to date by triggers on every write.
+    """
+
+    __tablename__ = "product_stats"
+
+    status = Column(String(32), primary_key=True)
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+    product_count = Column(BigInteger, nullable=False, server_default="0")
+    price_sum = Column(Numeric, nullable=False, server_default="0")
+    stock_quantity_sum = Column(BigInteger, nullable=False, server_default="0")
+    inventory_value = Column(Numeric, nullable=False, server_default="0")
+
+
+class ProductPriceBucket(Base):
+    """Product count per logarithmic price bucket, kept up to date by triggers."""
+
+    __tablename__ = "product_price_histogram"
+
+    bucket = Column(Integer, primary_key=True, autoincrement=False)
+    product_count = Column(BigInteger, nullable=False, server_default="0")
+
+
+@event.listens_for(ProductCatalog.__table__, "after_create")
+def create_catalog_row(target, connection, **kw):
+    # create_all (testes e bancos novos) também precisa das linhas iniciais
+    connection.execute(
+        insert(target),
+        [
+            {"id": CATALOG_ID + shard, "updated_at": utcnow()}
+            for shard in range(CATALOG_SHARDS)
+        ],
+    )
+
+
+@event.listens_for(Product.__table__, "after_create")
+def create_search_index(target, connection, **kw):
+    # Índice de busca textual (FTS5 ou tsvector) e os triggers que o mantêm
+    search.create_search_index(connection)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_stats_triggers(target, connection, **kw):
+    # Depois de todas as tabelas: os triggers de 'products' gravam nas de agregados
+    product_stats.create_stats_triggers(connection)
+
+
+@event.listens_for(Product.__table__, "before_drop")
+def drop_search_index(target, connection, **kw):
+    search.drop_search_index(connection)
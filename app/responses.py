@@ -0,0 +1,43 @@
+from typing import List, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.config import get_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_response_class():
+    """Default response class: orjson when selected (JSON_RENDERER) and installed."""
+    if get_settings().json_renderer == "orjson" and orjson is not None:
+        return ORJSONResponse
+    return JSONResponse
+
+
+def product_row(product) -> dict:
+    """
+    JSON-ready dict of a product that is already known to be valid (an ORM
+    row read from the database or a cached schema), in the same shape as
+    product_schema.Product, without going through Pydantic.
+    """
+    return {
+        "name": product.name,
+        "description": product.description,
+        "price": float(product.price),
+        "status": product.status.value,
+        "stock_quantity": product.stock_quantity,
+        "id": product.id,
+        "version": product.version,
+        "updated_at": product.updated_at.isoformat(),
+    }
+
+
+def view_rows(views: List[dict]) -> List[dict]:
+    return [{"viewed_at": view["viewed_at"].isoformat()} for view in views]
+
+
+def render(content, headers: Optional[dict] = None, status_code: int = 200):
+    return json_response_class()(content, status_code=status_code, headers=headers)
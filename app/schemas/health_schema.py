@@ -0,0 +1,17 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class Liveness(BaseModel):
+    # starting | ready | stopping
+    status: str
+
+
+class Readiness(BaseModel):
+    # ready, ou o motivo de não estar: starting | stopping | unavailable
+    status: str
+    # Do início do processo até o fim do startup
+    startup_seconds: Optional[float] = None
+    # Resultado de cada verificação, ex.: {"database": "ok"}
+    checks: Dict[str, str]
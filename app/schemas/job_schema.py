@@ -0,0 +1,33 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class JobKind(Enum):
+    purge_view_logs = "purge_view_logs"
+
+
+class JobStatus(Enum):
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class Job(BaseModel):
+    id: int
+    kind: JobKind
+    product_id: int
+    status: JobStatus
+    attempts: int
+    # Documentos removidos (purge concluído) e erro da última tentativa
+    result: Optional[int] = None
+    last_error: Optional[str] = None
+    run_after: datetime
+    created_at: datetime
+    updated_at: datetime
+
+    class ConfigDict:
+        from_attributes = True
@@ -1,8 +1,12 @@
+from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field, model_validator
 
+# Limite de itens aceitos por requisição nos endpoints em lote
+BULK_MAX_ITEMS = 1000
+
 
 class ProductStatus(Enum):
     in_stock = "em_estoque"
@@ -10,6 +14,35 @@ class ProductStatus(Enum):
     out_of_stock = "em_falta"
 
 
+class ProductSortField(Enum):
+    id = "id"
+    name = "name"
+    price = "price"
+    stock_quantity = "stock_quantity"
+
+
+class SortOrder(Enum):
+    asc = "asc"
+    desc = "desc"
+
+
+class ExportFormat(Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class ViewWindow(Enum):
+    last_hour = "1h"
+    last_day = "24h"
+    last_week = "7d"
+
+
+class ViewBucket(Enum):
+    minute = "minute"
+    hour = "hour"
+    day = "day"
+
+
 class ProductBase(BaseModel):
     name: str = Field(max_length=128)
     description: str = Field(max_length=255)
@@ -60,8 +93,134 @@ class ProductUpdate(ProductBase):
         return product
 
 
+class ProductBulkUpdate(ProductUpdate):
+    id: int
+
+
+class ProductBulkDelete(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
+
+
+class ProductStockAdjustment(BaseModel):
+    """Stock change: negative reserves (decrements), positive restocks."""
+
+    delta: int
+
+    @model_validator(mode="after")
+    def validate_delta(cls, adjustment):
+        if adjustment.delta == 0:
+            raise ValueError("Delta must not be 0.")
+        return adjustment
+
+
+class ProductBulkStockAdjustment(ProductStockAdjustment):
+    id: int
+
+
+class ProductBulkResult(BaseModel):
+    index: int
+    id: Optional[int]
+    status: str
+
+
+class ProductBulkResponse(BaseModel):
+    results: List[ProductBulkResult]
+
+
+class ProductImportError(BaseModel):
+    line: int
+    errors: List[str]
+
+
+class ProductImportSummary(BaseModel):
+    accepted: int = 0
+    rejected: int = 0
+    chunks: int = 0
+    errors: List[ProductImportError] = []
+
+
 class Product(ProductBase):
     id: int
+    # Versão da linha e data da última escrita (ETag / Last-Modified)
+    version: int
+    updated_at: datetime
 
     class ConfigDict:
         from_attributes = True
+
+
+class ProductListParams(BaseModel):
+    """Query parameters accepted by the product listing (keyset pagination)."""
+
+    cursor: Optional[str] = None
+    limit: int = Field(default=50, gt=0, le=500)
+    status: Optional[ProductStatus] = None
+    min_price: Optional[float] = Field(default=None, ge=0)
+    max_price: Optional[float] = Field(default=None, ge=0)
+    min_stock: Optional[int] = Field(default=None, ge=0)
+    max_stock: Optional[int] = Field(default=None, ge=0)
+    sort_by: ProductSortField = ProductSortField.id
+    order: SortOrder = SortOrder.asc
+
+
+class ProductSearchParams(BaseModel):
+    """Query parameters of the full-text search, ranked by relevance."""
+
+    q: str = Field(min_length=1, max_length=200)
+    cursor: Optional[str] = None
+    limit: int = Field(default=50, gt=0, le=500)
+
+
+class ProductStats(BaseModel):
+    """Catalog summary, read from the aggregates maintained on every write."""
+
+    product_count: int
+    # Contagem por valor de ProductStatus
+    status_counts: Dict[str, int]
+    total_price: float
+    average_price: Optional[float]
+    total_stock_quantity: int
+    inventory_value: float
+    # Percentis estimados (erro relativo de até 1%), ex.: {"p50": 19.9}
+    price_percentiles: Dict[str, float]
+    # Versão do catálogo e data da escrita até onde os agregados vão
+    version: int
+    as_of: datetime
+
+
+class ProductViewCount(BaseModel):
+    product_id: int
+    views: int
+
+
+class ViewBucketCount(BaseModel):
+    start: datetime
+    count: int
+
+
+class ProductViewHistogram(BaseModel):
+    product_id: int
+    bucket: ViewBucket
+    series: List[ViewBucketCount]
+
+
+class ViewLogIndexUsage(BaseModel):
+    name: str
+    size_bytes: int
+    # Operações que usaram o índice desde 'since' (reinício do servidor)
+    accesses: int
+    since: datetime
+
+
+class ViewLogCollectionStats(BaseModel):
+    name: str
+    count: int
+    size_bytes: int
+    storage_size_bytes: int
+    index_size_bytes: int
+    indexes: List[ViewLogIndexUsage]
+
+
+class ViewLogStats(BaseModel):
+    retention_days: Optional[int]
+    collections: List[ViewLogCollectionStats]
@@ -0,0 +1,111 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Estados do processo, expostos por /health/ready
+STARTING = "starting"
+READY = "ready"
+STOPPING = "stopping"
+
+
+def process_uptime() -> Optional[float]:
+    """Seconds since this process started (from /proc), or None elsewhere."""
+    try:
+        with open("/proc/self/stat") as stat:
+            # Campos depois do nome do executável, que pode conter espaços
+            fields = stat.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as uptime:
+            system_uptime = float(uptime.read().split()[0])
+        # 'starttime' (campo 22): ticks do relógio desde o boot
+        return system_uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """
+    Startup timeline of this process: time spent in each initialization phase,
+    when the application became ready and whether it is shutting down.
+
+    Times are measured from the start of the process where /proc is available
+    (a forked server worker counts from its fork), otherwise from the import
+    of this module.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.created = clock()
+        self.phases: Dict[str, float] = {}
+        self.state = STARTING
+        self.startup_seconds: Optional[float] = None
+
+    def elapsed(self) -> float:
+        uptime = process_uptime()
+        return uptime if uptime is not None else self.clock() - self.created
+
+    def mark_imported(self):
+        """Called at the end of app.main: process start until the app exists."""
+        self.phases["import"] = self.elapsed()
+
+    @contextmanager
+    def phase(self, name: str):
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.clock() - started
+
+    def mark_ready(self):
+        self.state = READY
+        self.startup_seconds = self.elapsed()
+        settings = get_settings()
+        if settings.startup_profile:
+            logger.info("Startup profile:\n%s", self.report())
+        if self.startup_seconds > settings.startup_target_seconds:
+            logger.warning(
+                "Startup took %.2fs, above the %.2fs target (STARTUP_TARGET_SECONDS)",
+                self.startup_seconds,
+                settings.startup_target_seconds,
+            )
+
+    def mark_stopping(self):
+        self.state = STOPPING
+
+    def report(self) -> str:
+        lines = [
+            f"  {name:<20} {seconds * 1000:10.1f} ms"
+            for name, seconds in self.phases.items()
+        ]
+        if self.startup_seconds is not None:
+            lines.append(
+                f"  {'ready after':<20} {self.startup_seconds * 1000:10.1f} ms"
+            )
+        return "\n".join(lines)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "startup_seconds": self.startup_seconds,
+            "phases": dict(self.phases),
+        }
+
+    def collect(self):
+        """Metric samples: seconds per phase, time to ready and readiness."""
+        samples = [
+            ("app_startup_phase_seconds", "gauge", {"phase": name}, seconds)
+            for name, seconds in self.phases.items()
+        ]
+        if self.startup_seconds is not None:
+            samples.append(("app_startup_seconds", "gauge", {}, self.startup_seconds))
+        samples.append(("app_ready", "gauge", {}, int(self.state == READY)))
+        return samples
+
+
+# Um perfil por processo (cada worker do servidor tem o seu)
+profile = StartupProfile()
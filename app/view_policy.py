@@ -0,0 +1,180 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import get_settings
+from app.database.mongodb import IMPRESSION_EVENT, VIEW_EVENT
+
+# Rotas que geram eventos de visualização
+DETAIL_ROUTE = "detail"
+LIST_ROUTE = "list"
+
+# O que uma listagem registra para cada produto da página
+LIST_EVENTS = {"views": VIEW_EVENT, "impressions": IMPRESSION_EVENT, "none": None}
+
+
+def client_key(request) -> str:
+    """
+    Identifies the client for deduplication: address and User-Agent (behind a
+    proxy, the address comes from the server's forwarded headers settings).
+    """
+    host = request.client.host if request.client else ""
+    return f"{host}|{request.headers.get('user-agent', '')}"
+
+
+class BloomFilter:
+    """
+    Set membership in 'capacity * -ln(error_rate) / ln(2)^2' bits: no false
+    negatives and about 'error_rate' false positives once 'capacity' keys
+    were added (roughly 1.2 MB for a million keys at 1%).
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key: str) -> List[int]:
+        # Hashing duplo: k posições a partir de dois hashes de 64 bits
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def contains(self, positions: List[int]) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add(self, positions: List[int]):
+        for p in positions:
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+
+class ViewDeduplicator:
+    """
+    Remembers the keys seen in the last 'window' seconds with two Bloom
+    filters: the current one and the one it replaced. A key is a duplicate
+    when either contains it, so it is remembered for 'window' to '2 * window'
+    seconds in constant memory.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        capacity: int,
+        error_rate: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window = window
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at = clock()
+
+    def seen(self, key: str) -> bool:
+        """Whether 'key' was seen within the window; records it either way."""
+        with self._lock:
+            now = self.clock()
+            if now - self._rotated_at >= self.window:
+                # Após duas janelas sem rotação, o filtro anterior também expirou
+                expired = now - self._rotated_at >= 2 * self.window
+                self._previous = (
+                    BloomFilter(self.capacity, self.error_rate)
+                    if expired
+                    else self._current
+                )
+                self._current = BloomFilter(self.capacity, self.error_rate)
+                self._rotated_at = now
+            positions = self._current.positions(key)
+            if self._current.contains(positions):
+                return True
+            self._current.add(positions)
+            return self._previous.contains(positions)
+
+
+class ViewPolicy:
+    """
+    Decides which product view events are written, in front of the view log
+    pipeline:
+
+    - sampling per route: 1 in 'sample_every[route]' requests is logged, each
+      event weighing that many views, so the counters stay unbiased
+    - listings log views, impressions (counted apart from detail views, with
+      no raw log) or nothing, according to 'list_events'
+    - repeated views of a product by the same client within the dedup window
+      are dropped
+    """
+
+    def __init__(
+        self,
+        sample_every: Optional[Dict[str, int]] = None,
+        list_events: str = "views",
+        deduplicator: Optional[ViewDeduplicator] = None,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.sample_every = sample_every or {}
+        self.list_event = LIST_EVENTS[list_events]
+        self.deduplicator = deduplicator
+        self.rng = rng
+        self._stats_lock = threading.Lock()
+        self.sampled_out = 0
+        self.deduplicated = 0
+
+    @classmethod
+    def from_settings(cls) -> "ViewPolicy":
+        settings = get_settings()
+        deduplicator = None
+        if settings.view_dedup_window > 0:
+            deduplicator = ViewDeduplicator(
+                settings.view_dedup_window,
+                settings.view_dedup_capacity,
+                settings.view_dedup_error_rate,
+            )
+        return cls(
+            sample_every={
+                DETAIL_ROUTE: settings.view_detail_sample_every,
+                LIST_ROUTE: settings.view_list_sample_every,
+            },
+            list_events=settings.view_list_events,
+            deduplicator=deduplicator,
+        )
+
+    def select(
+        self, route: str, client: str, product_ids: Iterable[int]
+    ) -> Tuple[Optional[str], int, List[int]]:
+        """
+        The (event kind, weight, product ids) to log for a request of 'route'
+        by 'client'; no product ids when nothing should be logged.
+        """
+        kind = VIEW_EVENT if route == DETAIL_ROUTE else self.list_event
+        if kind is None:
+            return kind, 1, []
+        product_ids = list(product_ids)
+        if self.deduplicator is not None:
+            unique = [
+                product_id
+                for product_id in product_ids
+                if not self.deduplicator.seen(f"{route}:{client}:{product_id}")
+            ]
+            self._record("deduplicated", len(product_ids) - len(unique))
+            product_ids = unique
+        weight = self.sample_every.get(route, 1)
+        # Uma decisão por requisição: a página inteira entra ou sai da amostra
+        if product_ids and weight > 1 and self.rng() * weight >= 1:
+            self._record("sampled_out", len(product_ids))
+            product_ids = []
+        return kind, weight, product_ids
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"sampled_out": self.sampled_out, "deduplicated": self.deduplicated}
+
+    def _record(self, name: str, amount: int):
+        if amount:
+            with self._stats_lock:
+                setattr(self, name, getattr(self, name) + amount)
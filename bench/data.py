@@ -0,0 +1,26 @@
+from typing import List
+
+from app.schemas import product_schema
+
+STATUSES = list(product_schema.ProductStatus)
+
+
+def product_rows(start: int, count: int) -> List[dict]:
+    """Deterministic, valid product rows (no Faker: it is too slow for millions)."""
+    rows = []
+    for index in range(start, start + count):
+        status = STATUSES[index % len(STATUSES)]
+        rows.append(
+            {
+                "name": f"product {index:08d}",
+                "description": f"benchmark product number {index}",
+                "price": round(10 + (index * 7919) % 500000 / 100, 2),
+                "status": status,
+                "stock_quantity": (
+                    0
+                    if status == product_schema.ProductStatus.out_of_stock
+                    else 1 + index % 200
+                ),
+            }
+        )
+    return rows
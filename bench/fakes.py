@@ -0,0 +1,139 @@
+import threading
+from collections import defaultdict
+from typing import List, Tuple
+
+from app.database.mongodb import is_impression
+
+# Substitutos em memória dos clientes de log do MongoDB: o benchmark mede a
+# API e o pipeline de visualizações, não um servidor MongoDB
+
+
+class FakeProductLogClient:
+    """In-memory ProductLogClient: keeps the counters and the last views per product."""
+
+    max_logs_per_product = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.impressions = defaultdict(int)
+        self.logs = defaultdict(list)
+        # Ids dos eventos da outbox já aplicados: um lote reenviado não conta duas vezes
+        self.applied = set()
+
+    def ensure_indexes(self):
+        pass
+
+    def log_product_view(self, product_id: int):
+        raise NotImplementedError("Views are written through the pipeline.")
+
+    def log_product_views(self, events: List[dict]):
+        with self.lock:
+            for event in events:
+                if "event_id" in event:
+                    if event["event_id"] in self.applied:
+                        continue
+                    self.applied.add(event["event_id"])
+                product_id = event["product_id"]
+                if is_impression(event):
+                    self.impressions[product_id] += event.get("weight", 1)
+                    continue
+                self.counters[product_id] += event.get("weight", 1)
+                logs = self.logs[product_id]
+                if len(logs) < self.max_logs_per_product:
+                    logs.append({"viewed_at": event["viewed_at"]})
+
+    def get_product_view_count(self, product_id: int) -> int:
+        return self.counters.get(product_id, 0)
+
+    def get_product_counters(self, product_id: int) -> Tuple[int, int]:
+        return self.counters.get(product_id, 0), self.impressions.get(product_id, 0)
+
+    def get_product_view_logs(self, product_id: int, limit: int = 100, skip: int = 0):
+        return self.logs.get(product_id, [])[skip : skip + limit]
+
+    def get_top_products(self, window: str, limit: int) -> List[dict]:
+        # Sem buckets por tempo: o ranking usa o total de cada produto
+        with self.lock:
+            counters = sorted(
+                self.counters.items(), key=lambda item: (-item[1], item[0])
+            )
+        return [{"product_id": id, "views": views} for id, views in counters[:limit]]
+
+    def get_view_histogram(self, product_id: int, granularity: str, periods=None):
+        return []
+
+    def get_storage_stats(self) -> dict:
+        return {"retention_days": None, "collections": []}
+
+    def purge_product_logs(
+        self, product_id: int, batch_size: int, on_batch=None
+    ) -> int:
+        if on_batch is not None:
+            on_batch()
+        with self.lock:
+            self.counters.pop(product_id, None)
+            self.impressions.pop(product_id, None)
+            return len(self.logs.pop(product_id, []))
+
+    def clear_product_logs(self, product_id: int):
+        self.clear_products_logs([product_id])
+
+    def clear_products_logs(self, product_ids: List[int]):
+        with self.lock:
+            for product_id in product_ids:
+                self.counters.pop(product_id, None)
+                self.impressions.pop(product_id, None)
+                self.logs.pop(product_id, None)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncProductLogClient:
+    """Same store as FakeProductLogClient, behind the AsyncProductLogClient API."""
+
+    def __init__(self):
+        self.client = FakeProductLogClient()
+
+    async def ensure_indexes(self):
+        pass
+
+    async def log_product_views(self, events: List[dict]):
+        self.client.log_product_views(events)
+
+    async def get_product_view_count(self, product_id: int) -> int:
+        return self.client.get_product_view_count(product_id)
+
+    async def get_product_counters(self, product_id: int) -> Tuple[int, int]:
+        return self.client.get_product_counters(product_id)
+
+    async def get_product_view_logs(
+        self, product_id: int, limit: int = 100, skip: int = 0
+    ):
+        return self.client.get_product_view_logs(product_id, limit, skip)
+
+    async def get_top_products(self, window: str, limit: int) -> List[dict]:
+        return self.client.get_top_products(window, limit)
+
+    async def get_view_histogram(self, product_id: int, granularity: str, periods=None):
+        return self.client.get_view_histogram(product_id, granularity, periods)
+
+    async def get_storage_stats(self) -> dict:
+        return self.client.get_storage_stats()
+
+    async def purge_product_logs(
+        self, product_id: int, batch_size: int, on_batch=None
+    ) -> int:
+        if on_batch is not None:
+            await on_batch()
+        return self.client.purge_product_logs(product_id, batch_size)
+
+    async def clear_product_logs(self, product_id: int):
+        self.client.clear_product_logs(product_id)
+
+    async def clear_products_logs(self, product_ids: List[int]):
+        self.client.clear_products_logs(product_ids)
+
+    async def close(self):
+        pass
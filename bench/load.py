@@ -0,0 +1,97 @@
+import asyncio
+import math
+import resource
+import sys
+import time
+from collections import Counter
+from typing import List, Optional
+
+from bench.scenarios import BenchState, Scenario
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], wall: float, status_codes: Counter) -> dict:
+    latencies = sorted(latencies)
+    errors = sum(count for status, count in status_codes.items() if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_codes": {str(status): count for status, count in status_codes.items()},
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "mean": (
+                round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0
+            ),
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+    }
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Peak resident set size (VmHWM) of a process; this one by default."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid is not None:
+        return None
+    # Fora do Linux: ru_maxrss está em KB (Linux) ou bytes (macOS)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(max_rss / divisor, 1)
+
+
+async def run_scenario(
+    client, scenario: Scenario, state: BenchState, requests: int, concurrency: int
+) -> dict:
+    """Sends the scenario's requests from 'concurrency' workers and times each one."""
+    if scenario.prepare is not None:
+        await scenario.prepare(client, state)
+    total = min(requests, scenario.max_requests or requests)
+    pending = iter(range(total))
+    latencies, status_codes = [], Counter()
+
+    async def worker():
+        for _ in pending:
+            request = scenario.build(state)
+            started = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append(time.perf_counter() - started)
+            status_codes[response.status_code] += 1
+            if response.status_code < 400 and scenario.record is not None:
+                scenario.record(response, state)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    return summarize(latencies, time.perf_counter() - started, status_codes)
+
+
+async def run_suite(
+    client,
+    scenarios: List[Scenario],
+    state: BenchState,
+    requests: int,
+    concurrency: int,
+    pid: Optional[int] = None,
+) -> dict:
+    """Runs the scenarios in order; 'pid' is the server process, if not this one."""
+    results = {}
+    for scenario in scenarios:
+        results[scenario.name] = await run_scenario(
+            client, scenario, state, requests, concurrency
+        )
+        results[scenario.name]["peak_rss_mb"] = peak_rss_mb(pid)
+    return results
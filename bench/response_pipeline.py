@@ -0,0 +1,103 @@
+"""
+CPU cost per request of the response pipeline, before and after:
+
+- baseline: stdlib JSONResponse, response_model validation, no compression
+- optimized: ORJSONResponse, rows rendered directly, gzip/brotli compression
+
+Usage: python -m bench.response_pipeline [--products 500] [--requests 200]
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy.orm import sessionmaker
+
+from app import compression
+from app.controllers.product_controller import ProductController
+from app.database import dependencies, sql
+from bench import seed
+
+
+class NullViewLogPipeline:
+    """Drops the view events: the benchmark measures only the response path."""
+
+    def submit(self, product_id: int):
+        pass
+
+    def submit_many(self, product_ids, kind=None, weight=1):
+        list(product_ids)
+
+
+def build_app(session_factory, optimized: bool) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse if optimized else JSONResponse)
+    if optimized:
+        app.add_middleware(compression.CompressionMiddleware)
+    controller = ProductController(validate_responses=not optimized)
+    controller.view_log_pipeline = NullViewLogPipeline()
+    app.include_router(controller.router)
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[dependencies.get_db] = get_db
+    app.dependency_overrides[dependencies.get_read_db] = get_db
+    app.dependency_overrides[dependencies.get_primary_db] = get_db
+    return app
+
+
+async def measure(app: FastAPI, path: str, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        headers={"Accept-Encoding": "br, gzip"},
+    ) as client:
+        await client.get(path)  # aquecimento (cache de produtos, pool, imports)
+        wire_bytes = 0
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(path)
+            wire_bytes += response.num_bytes_downloaded
+        cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    return {
+        "cpu_ms_per_request": round(cpu / requests * 1000, 3),
+        "wall_ms_per_request": round(wall / requests * 1000, 3),
+        "bytes_per_response": wire_bytes // requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = sql.build_engine(f"sqlite:///{Path(directory) / 'bench.db'}")
+        session_factory = sessionmaker(autoflush=False, bind=engine)
+        seed.seed_products(engine, args.products)
+
+        paths = [f"/products/?limit={min(args.products, 500)}", "/products/1"]
+        results = {}
+        for name, optimized in (("baseline", False), ("optimized", True)):
+            app = build_app(session_factory, optimized)
+            results[name] = {
+                path: asyncio.run(measure(app, path, args.requests)) for path in paths
+            }
+        engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
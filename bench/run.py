@@ -0,0 +1,170 @@
+"""
+Seeds N products and drives every ProductController route, in-process through
+httpx's ASGITransport and against a real uvicorn server, reporting latency
+percentiles, throughput and peak RSS as JSON.
+
+Usage:
+    python -m bench.run --products 100000 --requests 500 --concurrency 16
+    python -m bench.run --targets uvicorn --scenarios list_first_page,get_product
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from bench.load import peak_rss_mb, run_suite
+from bench.scenarios import SCENARIO_NAMES, BenchState, select_scenarios
+
+TARGETS = ("inprocess", "uvicorn")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Products API benchmark.")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument(
+        "--scenarios", default="", help=f"Subset of: {','.join(SCENARIO_NAMES)}"
+    )
+    parser.add_argument("--database", default="./bench/bench.db")
+    parser.add_argument(
+        "--skip-seed", action="store_true", help="Reuse an already seeded database"
+    )
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+    args.targets = [target for target in args.targets.split(",") if target]
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+    args.scenarios = [name for name in args.scenarios.split(",") if name]
+    return args
+
+
+async def run_in_process(args, scenarios) -> dict:
+    from app.main import app
+    from bench.server import bench_lifespan
+
+    # O ASGITransport não executa o lifespan: os fakes são instalados aqui
+    async with bench_lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            return await run_suite(
+                client,
+                scenarios,
+                BenchState(args.products),
+                args.requests,
+                args.concurrency,
+            )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(client: httpx.AsyncClient, process, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The uvicorn server exited during startup.")
+        try:
+            response = await client.get("/health/ready")
+            if response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("The uvicorn server did not start in time.")
+
+
+async def run_uvicorn(args, scenarios, database_url: str) -> dict:
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": database_url}
+    env.pop("DATABASE_REPLICA_URLS", None)
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "bench.server:create_app",
+            "--factory",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            timeout=None,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        ) as client:
+            await wait_until_ready(client, process)
+            return await run_suite(
+                client,
+                scenarios,
+                BenchState(args.products),
+                args.requests,
+                args.concurrency,
+                pid=process.pid,
+            )
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = select_scenarios(args.scenarios)
+    database = Path(args.database).resolve()
+    database_url = f"sqlite:///{database}"
+    # As URLs do app são lidas no import, já apontando para o banco do benchmark
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("DATABASE_REPLICA_URLS", None)
+
+    from app.database import sql
+    from bench.seed import seed_products
+
+    sql.init_engines()
+
+    report = {"config": {**vars(args), "database": str(database)}, "results": {}}
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed_products(sql.engine, args.products, args.batch_size)
+        report["seed_seconds"] = round(time.perf_counter() - started, 2)
+
+    if "inprocess" in args.targets:
+        report["results"]["inprocess"] = asyncio.run(run_in_process(args, scenarios))
+    if "uvicorn" in args.targets:
+        # Cada alvo começa do mesmo catálogo semeado
+        if not args.skip_seed and "inprocess" in args.targets:
+            sql.init_engines()  # Fechadas no shutdown do alvo em processo
+            seed_products(sql.engine, args.products, args.batch_size)
+        report["results"]["uvicorn"] = asyncio.run(
+            run_uvicorn(args, scenarios, database_url)
+        )
+    report["runner_peak_rss_mb"] = peak_rss_mb()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import json
+import random
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from bench.data import product_rows
+
+
+@dataclass
+class BenchState:
+    """Shared by the scenarios: what is in the database and what was created."""
+
+    product_count: int
+    rng: random.Random = field(default_factory=lambda: random.Random(42))
+    created_ids: List[int] = field(default_factory=list)
+    bulk_created_ids: List[int] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    listing_etag: Optional[str] = None
+    product_etag: Optional[str] = None
+
+    def random_id(self) -> int:
+        return self.rng.randint(1, self.product_count)
+
+
+@dataclass
+class Scenario:
+    name: str
+    # Monta os argumentos de client.request(...) de uma requisição
+    build: Callable[[BenchState], dict]
+    # Executado uma vez antes das requisições (ex.: obter um cursor ou ETag)
+    prepare: Optional[Callable] = None
+    # Executado com cada resposta bem-sucedida (ex.: guardar ids criados)
+    record: Optional[Callable] = None
+    max_requests: Optional[int] = None
+
+
+def new_products(state: BenchState, count: int) -> List[dict]:
+    rows = product_rows(state.rng.randint(0, 10**9), count)
+    return [{**row, "status": row["status"].value} for row in rows]
+
+
+async def prepare_cursor(client, state: BenchState):
+    response = await client.get("/products/", params={"limit": 50})
+    state.next_cursor = response.headers.get("X-Next-Cursor")
+    state.listing_etag = response.headers.get("ETag")
+
+
+async def prepare_product_etag(client, state: BenchState):
+    response = await client.get("/products/1")
+    state.product_etag = response.headers.get("ETag")
+
+
+def record_created(response, state: BenchState):
+    state.created_ids.append(response.json()["id"])
+
+
+def record_bulk_created(response, state: BenchState):
+    state.bulk_created_ids.extend(result["id"] for result in response.json()["results"])
+
+
+def search_term(state: BenchState) -> str:
+    # Número do nome de um produto semeado ("product 00000041" tem o id 42)
+    return f"{state.random_id() - 1:08d}"
+
+
+def random_ids(state: BenchState, count: int) -> List[int]:
+    """Distinct random ids, like the lines of one order."""
+    return state.rng.sample(range(1, state.product_count + 1), count)
+
+
+def take_ids(state: BenchState, ids: List[int], count: int) -> List[int]:
+    """Pops ids created by an earlier scenario, or random ones if there are none."""
+    taken = ids[-count:]
+    del ids[-count:]
+    return taken + [state.random_id() for _ in range(count - len(taken))]
+
+
+SCENARIOS = [
+    Scenario(
+        "list_first_page",
+        lambda state: {"method": "GET", "url": "/products/?limit=50"},
+    ),
+    Scenario(
+        "list_filtered_sorted",
+        lambda state: {
+            "method": "GET",
+            "url": "/products/?status=em_estoque&sort_by=price&order=desc&limit=50",
+        },
+    ),
+    Scenario(
+        "list_next_page",
+        lambda state: {
+            "method": "GET",
+            "url": "/products/",
+            "params": {"limit": 50, "cursor": state.next_cursor or ""},
+        },
+        prepare=prepare_cursor,
+    ),
+    Scenario(
+        "list_not_modified",
+        lambda state: {
+            "method": "GET",
+            "url": "/products/?limit=50",
+            "headers": {"If-None-Match": state.listing_etag or ""},
+        },
+        prepare=prepare_cursor,
+    ),
+    Scenario(
+        "search_common_term",
+        lambda state: {
+            "method": "GET",
+            "url": "/products/search",
+            "params": {"q": "benchmark product", "limit": 50},
+        },
+    ),
+    Scenario(
+        "search_by_name",
+        lambda state: {
+            "method": "GET",
+            "url": "/products/search",
+            "params": {"q": search_term(state)},
+        },
+    ),
+    Scenario(
+        "product_stats",
+        lambda state: {"method": "GET", "url": "/products/stats"},
+    ),
+    Scenario(
+        "get_product",
+        lambda state: {"method": "GET", "url": f"/products/{state.random_id()}"},
+    ),
+    Scenario(
+        "get_product_not_modified",
+        lambda state: {
+            "method": "GET",
+            "url": "/products/1",
+            "headers": {"If-None-Match": state.product_etag or ""},
+        },
+        prepare=prepare_product_etag,
+    ),
+    Scenario(
+        "view_report",
+        lambda state: {
+            "method": "GET",
+            "url": f"/products/{state.random_id()}/views?include_views=true",
+        },
+    ),
+    Scenario(
+        "top_viewed_products",
+        lambda state: {"method": "GET", "url": "/products/views/top?window=24h"},
+    ),
+    Scenario(
+        "view_histogram",
+        lambda state: {
+            "method": "GET",
+            "url": f"/products/{state.random_id()}/views/histogram?bucket=hour",
+        },
+    ),
+    Scenario(
+        "export_ndjson",
+        lambda state: {"method": "GET", "url": "/products/export?format=ndjson"},
+        max_requests=5,
+    ),
+    Scenario(
+        "create_product",
+        lambda state: {
+            "method": "POST",
+            "url": "/products/",
+            "json": new_products(state, 1)[0],
+        },
+        record=record_created,
+    ),
+    Scenario(
+        "update_product",
+        lambda state: {
+            "method": "PUT",
+            "url": f"/products/{state.random_id()}",
+            "json": {"price": round(state.rng.uniform(1, 5000), 2)},
+        },
+    ),
+    # Reposições (delta positivo): nunca falham por falta de estoque, então a
+    # medição não depende do estoque que sobrou de execuções anteriores
+    Scenario(
+        "adjust_stock",
+        lambda state: {
+            "method": "POST",
+            "url": f"/products/{state.random_id()}/stock/adjust",
+            "json": {"delta": 1},
+        },
+    ),
+    Scenario(
+        "bulk_adjust_stock",
+        lambda state: {
+            "method": "POST",
+            "url": "/products/bulk/stock/adjust",
+            "json": [
+                {"id": product_id, "delta": 1}
+                for product_id in random_ids(state, min(20, state.product_count))
+            ],
+        },
+        max_requests=50,
+    ),
+    Scenario(
+        "bulk_create",
+        lambda state: {
+            "method": "POST",
+            "url": "/products/bulk",
+            "json": new_products(state, 100),
+        },
+        record=record_bulk_created,
+        max_requests=50,
+    ),
+    Scenario(
+        "bulk_update",
+        lambda state: {
+            "method": "PATCH",
+            "url": "/products/bulk",
+            "json": [
+                {"id": state.random_id(), "price": round(state.rng.uniform(1, 5000), 2)}
+                for _ in range(100)
+            ],
+        },
+        max_requests=50,
+    ),
+    Scenario(
+        "import_ndjson",
+        lambda state: {
+            "method": "POST",
+            "url": "/products/import?format=ndjson",
+            "content": "".join(
+                json.dumps(product) + "\n" for product in new_products(state, 100)
+            ),
+        },
+        max_requests=50,
+    ),
+    Scenario(
+        "delete_product",
+        lambda state: {
+            "method": "DELETE",
+            "url": f"/products/{take_ids(state, state.created_ids, 1)[0]}",
+        },
+    ),
+    Scenario(
+        "bulk_delete",
+        lambda state: {
+            "method": "DELETE",
+            "url": "/products/bulk",
+            "json": {"ids": take_ids(state, state.bulk_created_ids, 100)},
+        },
+        max_requests=50,
+    ),
+]
+
+SCENARIO_NAMES = [scenario.name for scenario in SCENARIOS]
+
+
+def select_scenarios(names: Optional[List[str]]) -> List[Scenario]:
+    if not names:
+        return list(SCENARIOS)
+    unknown = set(names) - set(SCENARIO_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}.")
+    return [scenario for scenario in SCENARIOS if scenario.name in names]
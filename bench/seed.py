@@ -0,0 +1,28 @@
+from typing import Iterator, List
+
+from sqlalchemy import insert
+
+from app.crud import product_crud
+from app.database import sql
+from app.models import product_model
+from bench.data import product_rows
+
+
+def batches(count: int, batch_size: int) -> Iterator[List[dict]]:
+    for start in range(0, count, batch_size):
+        yield product_rows(start, min(batch_size, count - start))
+
+
+def seed_products(engine, count: int, batch_size: int = 10000) -> int:
+    """
+    Creates the tables and inserts 'count' products with one executemany per
+    batch, one transaction per batch, so 10M rows never sit in memory at once.
+    """
+    sql.Base.metadata.drop_all(bind=engine)
+    sql.Base.metadata.create_all(bind=engine)
+    for rows in batches(count, batch_size):
+        with engine.begin() as connection:
+            connection.execute(insert(product_model.Product.__table__), rows)
+    with engine.begin() as connection:
+        connection.execute(product_crud.catalog_bump_statement())
+    return count
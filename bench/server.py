@@ -0,0 +1,51 @@
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from app import startup
+from app.controllers.product_controller import AsyncProductController
+from app.database import log_purge, sql, view_log_pipeline
+from bench.fakes import FakeAsyncProductLogClient, FakeProductLogClient
+
+
+def install_fakes(controller):
+    """Replaces the MongoDB log clients of a controller with in-memory fakes."""
+    if isinstance(controller, AsyncProductController):
+        controller.product_log_client = FakeAsyncProductLogClient()
+        pipeline_class = view_log_pipeline.AsyncViewLogPipeline
+        controller.log_purge_worker = log_purge.AsyncLogPurgeWorker.from_settings(
+            controller.product_log_client, sql.AsyncSessionLocal
+        )
+    else:
+        controller.product_log_client = FakeProductLogClient()
+        pipeline_class = view_log_pipeline.ViewLogPipeline
+        controller.log_purge_worker = log_purge.LogPurgeWorker.from_settings(
+            controller.product_log_client, sql.SessionLocal
+        )
+    controller.view_log_pipeline = pipeline_class.from_settings(
+        controller.product_log_client
+    )
+    controller.view_log_pipeline.start()
+    controller.log_purge_worker.start()
+
+
+@asynccontextmanager
+async def bench_lifespan(app: FastAPI):
+    from app.controllers.product_controller import product_controller
+
+    with startup.profile.phase("sql_engines"):
+        sql.init_engines()
+    install_fakes(product_controller)
+    startup.profile.mark_ready()
+    yield
+    startup.profile.mark_stopping()
+    await product_controller.shutdown()
+    await sql.dispose_engines()
+
+
+def create_app() -> FastAPI:
+    """uvicorn factory: the real application, with the fake view log clients."""
+    from app.main import app
+
+    app.router.lifespan_context = bench_lifespan
+    return app
@@ -0,0 +1,159 @@
+"""
+Measures the cold start of the API in fresh interpreters: the import time of
+each module (python -X importtime) and the startup phases up to the first
+answered request, checked against STARTUP_TARGET_SECONDS.
+
+The database must exist (alembic upgrade head), otherwise the readiness check
+of the first request fails.
+
+Usage:
+    python -m bench.startup
+    python -m bench.startup --fakes --top 30 --target 2 --output startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+IMPORT_TARGET = "app.main"
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_import_times(output: str) -> List[ImportTime]:
+    """Rows of the 'python -X importtime' report (written to stderr)."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        # A indentação do nome indica o nível de aninhamento do import
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append(ImportTime(name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def import_report(rows: List[ImportTime], top: int) -> dict:
+    """Slowest modules (own time) and total import time per top-level package."""
+    packages: Dict[str, int] = defaultdict(int)
+    for row in rows:
+        packages[row.module.split(".")[0]] += row.self_us
+    slowest = sorted(rows, key=lambda row: row.self_us, reverse=True)[:top]
+    return {
+        "total_ms": round(sum(row.self_us for row in rows) / 1000, 1),
+        "packages_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        },
+        "slowest_modules_ms": {
+            row.module: round(row.self_us / 1000, 1) for row in slowest
+        },
+    }
+
+
+def measure_imports(top: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {IMPORT_TARGET}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return import_report(parse_import_times(result.stderr), top)
+
+
+async def first_request(fakes: bool) -> dict:
+    """
+    Runs in a fresh interpreter: imports the app, runs its startup and sends
+    the first request, timing everything from the start of the process.
+    """
+    import httpx
+
+    from app import startup
+
+    if fakes:
+        from bench.server import create_app
+
+        app = create_app()
+    else:
+        from app.main import app
+
+    # O ASGITransport não executa o lifespan: é executado aqui
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://startup"
+        ) as client:
+            response = await client.get("/health/ready")
+        first_request_seconds = startup.profile.elapsed()
+        return {
+            "phases_ms": {
+                name: round(seconds * 1000, 1)
+                for name, seconds in startup.profile.phases.items()
+            },
+            "ready_seconds": round(startup.profile.startup_seconds, 3),
+            "first_request_status": response.status_code,
+            "first_request_seconds": round(first_request_seconds, 3),
+        }
+
+
+def measure_first_request(fakes: bool) -> dict:
+    command = [sys.executable, "-m", "bench.startup", "--child"]
+    if fakes:
+        command.append("--fakes")
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Products API cold start profile.")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument(
+        "--target",
+        type=float,
+        help="Time to first request (s); default: STARTUP_TARGET_SECONDS",
+    )
+    parser.add_argument(
+        "--fakes",
+        action="store_true",
+        help="In-memory view log clients, so MongoDB is not required",
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(asyncio.run(first_request(args.fakes))))
+        return 0
+
+    from app.config import get_settings
+
+    target = args.target or get_settings().startup_target_seconds
+    report = {
+        "imports": measure_imports(args.top),
+        "startup": measure_first_request(args.fakes),
+        "target_seconds": target,
+    }
+    within_target = report["startup"]["first_request_seconds"] <= target
+    report["within_target"] = within_target
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+    return 0 if within_target else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+# Servidor de produção: gunicorn gerencia os processos e cada worker uvicorn
+# executa o lifespan do app, criando as suas engines e clientes do MongoDB
+# depois do fork
+from app import metrics
+from app.config import check_worker_settings, get_settings
+
+settings = get_settings()
+
+bind = f"0.0.0.0:{settings.app_port}"
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = settings.web_concurrency
+keepalive = settings.server_keepalive
+backlog = settings.server_backlog
+timeout = settings.server_timeout
+graceful_timeout = settings.server_graceful_timeout
+max_requests = settings.server_max_requests
+max_requests_jitter = settings.server_max_requests_jitter
+
+# Sem preload: nenhum pool de conexões é criado no master e herdado pelos workers
+preload_app = False
+accesslog = "-"
+
+# Cache em memória e métricas sem diretório compartilhado são por processo:
+# o servidor não sobe com vários workers nessas condições
+check_worker_settings(settings, workers)
+
+
+def on_starting(server):
+    if settings.metrics_enabled and settings.metrics_multiprocess_dir:
+        metrics.clear_multiprocess_dir(settings.metrics_multiprocess_dir)
+
+
+def child_exit(server, worker):
+    # Os contadores de um worker encerrado (ou reciclado) continuam no /metrics
+    if settings.metrics_enabled and settings.metrics_multiprocess_dir:
+        metrics.mark_process_exited(settings.metrics_multiprocess_dir, worker.pid)
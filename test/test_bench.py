@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.orm import sessionmaker
+
+from app.controllers.product_controller import ProductController
+from app.database import dependencies, sql
+from bench import load, scenarios, seed, server, startup
+
+
+def test_percentile_uses_nearest_rank():
+    """Checks the nearest-rank percentile used in the latency report."""
+    values = [float(value) for value in range(1, 101)]
+    assert load.percentile(values, 0.50) == 50.0
+    assert load.percentile(values, 0.99) == 99.0
+    assert load.percentile([], 0.95) == 0.0
+
+
+def test_import_report_groups_modules_by_package():
+    """Checks the parsing of the 'python -X importtime' report."""
+    output = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       300 |        300 |     sqlalchemy.sql",
+            "import time:       100 |        400 |   sqlalchemy",
+            "import time:      2000 |       2400 | app.main",
+        ]
+    )
+    rows = startup.parse_import_times(output)
+    assert [(row.module, row.depth) for row in rows] == [
+        ("sqlalchemy.sql", 2),
+        ("sqlalchemy", 1),
+        ("app.main", 0),
+    ]
+    report = startup.import_report(rows, top=1)
+    assert report["total_ms"] == 2.4
+    assert report["packages_ms"] == {"app": 2.0}
+    assert report["slowest_modules_ms"] == {"app.main": 2.0}
+
+
+def test_seed_products_inserts_valid_rows_in_batches(tmp_path):
+    """Checks that the bulk seeder writes the requested number of products."""
+    engine = sql.build_engine(f"sqlite:///{tmp_path / 'seed.db'}")
+    assert seed.seed_products(engine, 2500, batch_size=1000) == 2500
+    with engine.connect() as connection:
+        count = connection.exec_driver_sql("SELECT COUNT(*) FROM products").scalar()
+        out_of_stock = connection.exec_driver_sql(
+            "SELECT COUNT(*) FROM products WHERE status = 'out_of_stock' "
+            "AND stock_quantity != 0"
+        ).scalar()
+    engine.dispose()
+    assert count == 2500
+    assert out_of_stock == 0
+
+
+def test_suite_runs_every_scenario_in_process(tmp_path):
+    """Checks that each scenario completes against the API without errors."""
+    engine = sql.build_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+    seed.seed_products(engine, 200)
+    session_factory = sessionmaker(autoflush=False, bind=engine)
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    controller = ProductController()
+    app = FastAPI()
+    app.include_router(controller.router)
+    app.dependency_overrides[dependencies.get_db] = get_db
+    app.dependency_overrides[dependencies.get_read_db] = get_db
+    app.dependency_overrides[dependencies.get_primary_db] = get_db
+
+    async def run():
+        server.install_fakes(controller)
+        try:
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://bench"
+            ) as client:
+                return await load.run_suite(
+                    client,
+                    scenarios.select_scenarios(None),
+                    scenarios.BenchState(200),
+                    requests=4,
+                    concurrency=2,
+                )
+        finally:
+            await controller.shutdown()
+
+    results = asyncio.run(run())
+    engine.dispose()
+    assert list(results) == scenarios.SCENARIO_NAMES
+    for name, result in results.items():
+        assert result["errors"] == 0, name
+        assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+        assert result["throughput_rps"] > 0
+    assert results["list_not_modified"]["status_codes"] == {"304": 4}
@@ -0,0 +1,67 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+
+app = FastAPI()
+app.add_middleware(
+    compression.CompressionMiddleware, encodings=("br", "gzip"), minimum_size=100
+)
+
+
+@app.get("/text")
+def text():
+    return PlainTextResponse("product " * 100)
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse(iter([b"first chunk " * 20, b"second chunk " * 20]))
+
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate", "gzip"),
+        ("br;q=1.0, gzip;q=0.8", "br"),
+        ("br;q=0, gzip", "gzip"),
+        ("*", "br"),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_negotiate_encoding(header, expected):
+    """Checks that the server's preference is used among the accepted encodings."""
+    assert compression.negotiate_encoding(header, ("br", "gzip")) == expected
+
+
+def test_missing_brotli_falls_back_to_gzip(monkeypatch):
+    """Checks that 'br' is dropped when the brotli package is not installed."""
+    monkeypatch.setattr(compression, "brotli", None)
+    assert compression.available_encodings(("br", "gzip")) == ["gzip"]
+
+
+def test_streaming_response_is_compressed_incrementally():
+    """Checks that each streamed chunk is compressed and the result is valid gzip."""
+    with client.stream(
+        "GET", "/stream", headers={"Accept-Encoding": "gzip"}
+    ) as response:
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in response.headers
+        body = b"".join(response.iter_raw())
+    assert gzip.decompress(body) == b"first chunk " * 20 + b"second chunk " * 20
+
+
+def test_plain_response_is_compressed():
+    """Checks that a complete body is compressed with its final Content-Length."""
+    response = client.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert int(response.headers["Content-Length"]) < 800
+    assert response.text == "product " * 100
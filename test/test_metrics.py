@@ -0,0 +1,182 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import metrics
+from app.config import check_worker_settings, get_settings
+from app.database import sql
+from app.main import app as main_app
+
+engine = create_engine("sqlite://")
+
+app = FastAPI()
+app.add_middleware(metrics.MetricsMiddleware, server_timing=True)
+
+
+@app.get("/items/{item_id}")
+def get_item(item_id: int):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        connection.execute(text("SELECT 2"))
+    return {"id": item_id}
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def instrumented():
+    metrics.instrument_sqlalchemy(0.2)
+    yield
+    metrics.instrument_sqlalchemy(0.2)
+
+
+def test_registry_renders_prometheus_text():
+    registry = metrics.Registry()
+    counter = registry.counter("jobs_total", "Jobs.", ("queue",))
+    histogram = registry.histogram("job_seconds", "Job time.", buckets=(0.1, 1))
+    counter.inc('de"fault')
+    counter.inc('de"fault', amount=2)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    registry.add_collector(lambda: [("jobs_queued", "gauge", {"queue": "a"}, 4)])
+
+    lines = registry.render().splitlines()
+    assert "# TYPE jobs_total counter" in lines
+    assert 'jobs_total{queue="de\\"fault"} 3' in lines
+    assert 'job_seconds_bucket{le="0.1"} 1' in lines
+    assert 'job_seconds_bucket{le="1"} 2' in lines
+    assert 'job_seconds_bucket{le="+Inf"} 2' in lines
+    assert "job_seconds_count 2" in lines
+    assert "# TYPE jobs_queued gauge" in lines
+    assert 'jobs_queued{queue="a"} 4' in lines
+
+
+def test_request_metrics_use_route_template():
+    before = metrics.http_requests.value("GET", "/items/{item_id}", 200)
+    queries = metrics.http_request_sql_queries.count("GET", "/items/{item_id}")
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+    assert metrics.http_requests.value("GET", "/items/{item_id}", 200) == before + 2
+    assert (
+        metrics.http_request_sql_queries.count("GET", "/items/{item_id}") == queries + 2
+    )
+
+
+def test_unmatched_requests_share_one_label():
+    before = metrics.http_requests.value("GET", "unmatched", 404)
+    assert client.get("/missing/123").status_code == 404
+    assert metrics.http_requests.value("GET", "unmatched", 404) == before + 1
+
+
+def test_server_timing_reports_sql_queries():
+    response = client.get("/items/1")
+    server_timing = response.headers["server-timing"]
+    assert 'desc="2 queries"' in server_timing
+    assert "total;dur=" in server_timing
+
+
+def test_slow_queries_are_logged(caplog):
+    metrics.instrument_sqlalchemy(0)
+    before = metrics.sql_slow_queries.value()
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        client.get("/items/1")
+    assert metrics.sql_slow_queries.value() == before + 2
+    assert "SELECT 1" in caplog.text
+
+
+def test_mongo_listener_records_commands():
+    timings = metrics.RequestTimings()
+    token = metrics.current_timings.set(timings)
+    try:
+        event = SimpleNamespace(command_name="insert", duration_micros=1500)
+        failures = metrics.mongodb_command_failures.value("insert")
+        metrics.mongo_listener.succeeded(event)
+        metrics.mongo_listener.failed(event)
+    finally:
+        metrics.current_timings.reset(token)
+    assert timings.mongo_commands == 2
+    assert timings.mongo_seconds == pytest.approx(0.003)
+    assert metrics.mongodb_command_failures.value("insert") == failures + 1
+
+
+def test_metrics_endpoint():
+    # Sem o lifespan: as engines são criadas aqui
+    sql.init_engines()
+    main_client = TestClient(main_app)
+    main_client.get("/metrics")
+    response = main_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_requests_total{method="GET",route="/metrics",status="200"}' in (
+        response.text
+    )
+    assert 'sql_pool_checked_out{engine="primary"}' in response.text
+    assert "product_cache_hits_total" in response.text
+
+
+def test_multiprocess_metrics_sum_the_workers(tmp_path):
+    """Checks that a scrape sums every worker, including the ones that exited."""
+    workers = []
+    for queued in (3, 5, 7):
+        registry = metrics.Registry()
+        counter = registry.counter("jobs_total", "Jobs.", ("queue",))
+        histogram = registry.histogram("job_seconds", "Job time.", buckets=(1,))
+        counter.inc("default", amount=2)
+        histogram.observe(0.5)
+        registry.add_collector(
+            lambda queued=queued: [("jobs_queued", "gauge", {}, queued)]
+        )
+        worker = metrics.MultiprocessMetrics(registry, str(tmp_path), interval=60)
+        workers.append(worker)
+    # Cada worker grava com o próprio pid; aqui todos estão no mesmo processo
+    for pid, worker in enumerate(workers, start=1):
+        worker.pid = pid
+        worker.write()
+    metrics.mark_process_exited(str(tmp_path), 3)
+
+    lines = workers[0].render().splitlines()
+    assert 'jobs_total{queue="default"} 6' in lines
+    assert 'job_seconds_bucket{le="1"} 3' in lines
+    assert "job_seconds_count 3" in lines
+    assert 'jobs_queued{pid="1"} 3' in lines
+    assert 'jobs_queued{pid="2"} 5' in lines
+    # Medidas instantâneas de um worker encerrado não são mais reportadas
+    assert not [line for line in lines if line.endswith(" 7")]
+
+    metrics.clear_multiprocess_dir(str(tmp_path))
+    assert not list(tmp_path.glob("*.json"))
+
+
+def test_multiprocess_snapshot_writes_do_not_collide(tmp_path):
+    """Checks that the periodic writer and scrapes can write the snapshot at once."""
+    registry = metrics.Registry()
+    registry.counter("jobs_total", "Jobs.").inc(amount=1)
+    worker = metrics.MultiprocessMetrics(registry, str(tmp_path), interval=60)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: worker.write(), range(200)))
+    assert "jobs_total 1" in worker.render().splitlines()
+
+
+def test_several_workers_require_process_independent_settings():
+    """Checks that per-process cache and metrics are refused with several workers."""
+    settings = replace(
+        get_settings(),
+        product_cache_backend="memory",
+        metrics_enabled=True,
+        metrics_multiprocess_dir=None,
+    )
+    check_worker_settings(settings, 1)
+    with pytest.raises(ValueError, match="PRODUCT_CACHE_BACKEND"):
+        check_worker_settings(settings, 4)
+    settings = replace(settings, product_cache_backend="redis")
+    with pytest.raises(ValueError, match="METRICS_MULTIPROCESS_DIR"):
+        check_worker_settings(settings, 4)
+    check_worker_settings(replace(settings, metrics_multiprocess_dir="/tmp/m"), 4)
+    check_worker_settings(replace(settings, metrics_enabled=False), 4)
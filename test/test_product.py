@@ -1,16 +1,34 @@
+import csv
+import io
+import json
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from test import utils
 from typing import List
 
 import pytest
 from dotenv import load_dotenv
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select, update
 from sqlalchemy.orm import sessionmaker
 
+from app import view_policy
 from app.controllers.product_controller import product_controller
-from app.database import dependencies, mongodb, sqlite
+from app.crud import job_crud, product_crud
+from app.database import (
+    dependencies,
+    log_purge,
+    mongodb,
+    search,
+    sql,
+    view_log_pipeline,
+)
 from app.main import app
+from app.models import product_model
+from app.models.job_model import Job
+from app.models.product_model import ProductCatalog, utcnow
 from app.schemas.product_schema import ProductStatus
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test/test_database.db"
@@ -30,6 +48,8 @@ def override_get_db():
 
 
 app.dependency_overrides[dependencies.get_db] = override_get_db
+app.dependency_overrides[dependencies.get_read_db] = override_get_db
+app.dependency_overrides[dependencies.get_primary_db] = override_get_db
 
 client = TestClient(app)
 
@@ -38,24 +58,53 @@ load_dotenv()
 MONGODB_TEST_DATABASE_NAME = os.getenv("MONGODB_TEST_DATABASE_NAME")
 
 
+def flush_view_logs():
+    """Writes the view events buffered by the pipeline (no flusher runs in tests)."""
+    product_controller.view_log_pipeline.flush()
+
+
+def run_log_purges() -> int:
+    """Runs the queued view log purges (no worker thread runs in tests)."""
+    return product_controller.log_purge_worker.run_pending()
+
+
 @pytest.fixture(scope="function")
 def setup_database():
     # Substitui o ProductLogClient usado pelo controlador de produtos
     product_controller.product_log_client = mongodb.ProductLogClient("test")
+    product_controller.view_log_pipeline = (
+        view_log_pipeline.ViewLogPipeline.from_settings(
+            product_controller.product_log_client
+        )
+    )
+    # Política padrão: toda visualização é registrada
+    product_controller.view_policy = view_policy.ViewPolicy()
+    product_controller.log_purge_worker = log_purge.LogPurgeWorker(
+        product_controller.product_log_client,
+        TestingSessionLocal,
+        batch_size=2,
+        max_attempts=2,
+        retry_delay=0,
+        lease=600,
+        poll_interval=5,
+    )
     # Captura o mongo client do product log client
     mongo_client = product_controller.product_log_client.mongo_client
 
     # Limpeza do banco de dados do MongoDB antes de cada teste
     mongo_client.drop_database(MONGODB_TEST_DATABASE_NAME)
 
+    # Os ids são reaproveitados entre os testes, o cache precisa começar vazio
+    product_crud.product_cache.clear()
+
     # Criação e limpeza das tabelas antes de cada teste
-    sqlite.Base.metadata.drop_all(bind=engine)
-    sqlite.Base.metadata.create_all(bind=engine)
+    sql.Base.metadata.drop_all(bind=engine)
+    sql.Base.metadata.create_all(bind=engine)
 
     yield
 
     # Limpeza após o teste
-    sqlite.Base.metadata.drop_all(bind=engine)
+    sql.Base.metadata.drop_all(bind=engine)
 
     # Limpeza do banco de dados do MongoDB depois de cada teste
     mongo_client.drop_database(MONGODB_TEST_DATABASE_NAME)
@@ -169,11 +218,13 @@ def test_create_view_log_for_each_product_on_listing(setup_database):
     for i in range(10):
         client.get("/products")
 
+    flush_view_logs()
+
     # Para cada produto, verificar se existem 10 logs de visualização
     for created_product in created_products:
         product_id = created_product["id"]
         # Busca os logs de visualização do produto
-        response = client.get(f"/products/{product_id}/views")
+        response = client.get(f"/products/{product_id}/views?include_views=true")
         response_data = response.json()
         assert response.status_code == 200
         assert "number_of_views" in response_data
@@ -195,7 +246,8 @@ def test_create_view_log_when_viewing_single_product(setup_database):
     response = client.get(f"/products/{created_product_id}")
 
     # Busca os logs do produto criado e visualizado
-    response = client.get(f"/products/{created_product_id}/views")
+    flush_view_logs()
+    response = client.get(f"/products/{created_product_id}/views?include_views=true")
 
     response_data = response.json()
     assert response.status_code == 200
@@ -219,7 +271,8 @@ def test_create_multiple_view_logs_for_single_product(setup_database):
         response = client.get(f"/products/{created_product_id}")
 
     # Busca os logs do produto criado e visualizado
-    response = client.get(f"/products/{created_product_id}/views")
+    flush_view_logs()
+    response = client.get(f"/products/{created_product_id}/views?include_views=true")
 
     response_data = response.json()
     assert response.status_code == 200
@@ -240,7 +293,8 @@ def test_format_of_product_view_log(setup_database):
     response = client.get(f"/products/{created_product_id}")
 
     # Busca os logs do produto criado e visualizado
-    response = client.get(f"/products/{created_product_id}/views")
+    flush_view_logs()
+    response = client.get(f"/products/{created_product_id}/views?include_views=true")
 
     response_data = response.json()
     assert response.status_code == 200
@@ -394,3 +448,1048 @@ def test_delete_nonexistent_product(setup_database):
     response = client.delete("/products/999")
     assert response.status_code == 404
     assert response.json()["message"] == "Product not found."
+
+
+def test_list_products_paginates_with_cursor(setup_database):
+    """Checks that the listing can be traversed page by page using the cursor."""
+    generated_products: List[dict] = utils.generate_valid_products(7)
+    for generated_product in generated_products:
+        client.post("/products", json=generated_product)
+
+    listed_ids = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor is not None:
+            params["cursor"] = cursor
+        response = client.get("/products", params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 3
+        listed_ids.extend(product["id"] for product in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert listed_ids == list(range(1, len(generated_products) + 1))
+
+
+def test_list_products_filters_and_sorts(setup_database):
+    """Checks the status and price filters and the descending sort by price."""
+    generated_products: List[dict] = utils.generate_valid_products(10)
+    for i, generated_product in enumerate(generated_products):
+        generated_product["price"] = float(10 + i)
+        generated_product["status"] = ProductStatus.in_stock.value
+        client.post("/products", json=generated_product)
+    out_of_stock = utils.generate_valid_products(1)[0]
+    out_of_stock["status"] = ProductStatus.out_of_stock.value
+    out_of_stock["stock_quantity"] = 0
+    client.post("/products", json=out_of_stock)
+
+    response = client.get(
+        "/products",
+        params={
+            "status": ProductStatus.in_stock.value,
+            "min_price": 12,
+            "max_price": 15,
+            "sort_by": "price",
+            "order": "desc",
+        },
+    )
+    assert response.status_code == 200
+    assert [product["price"] for product in response.json()] == [15, 14, 13, 12]
+
+    response = client.get(
+        "/products", params={"status": ProductStatus.out_of_stock.value}
+    )
+    assert len(response.json()) == 1
+
+
+def test_list_products_sorted_by_price_paginates(setup_database):
+    """Checks that keyset pagination is stable when sorting by a non-unique column."""
+    generated_products: List[dict] = utils.generate_valid_products(6)
+    for generated_product in generated_products:
+        generated_product["price"] = 99.9  # Mesmo preço para todos
+        client.post("/products", json=generated_product)
+
+    first_page = client.get("/products", params={"limit": 4, "sort_by": "price"})
+    cursor = first_page.headers["X-Next-Cursor"]
+    second_page = client.get(
+        "/products", params={"limit": 4, "sort_by": "price", "cursor": cursor}
+    )
+    ids = [p["id"] for p in first_page.json() + second_page.json()]
+    assert ids == list(range(1, 7))
+    assert "X-Next-Cursor" not in second_page.headers
+
+
+def test_list_products_with_invalid_cursor(setup_database):
+    """Checks that a malformed or mismatched cursor is rejected."""
+    response = client.get("/products", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+    generated_products: List[dict] = utils.generate_valid_products(2)
+    for generated_product in generated_products:
+        client.post("/products", json=generated_product)
+    cursor = client.get("/products", params={"limit": 1}).headers["X-Next-Cursor"]
+    response = client.get("/products", params={"cursor": cursor, "sort_by": "name"})
+    assert response.status_code == 400
+
+
+def create_named_products(names_and_descriptions):
+    ids = []
+    for name, description in names_and_descriptions:
+        generated_product = utils.generate_valid_products(1)[0]
+        generated_product["name"] = name
+        generated_product["description"] = description
+        ids.append(client.post("/products", json=generated_product).json()["id"])
+    return ids
+
+
+def test_search_products_ranks_and_paginates(setup_database):
+    """Checks that the search ranks name matches first and pages through results."""
+    ids = create_named_products(
+        [
+            ("Mesa de jantar", "Acompanha cadeiras"),
+            ("Cadeira gamer", "Encosto reclinável"),
+            ("Sofá", "Combina com a cadeira da sala"),
+            ("Luminária", "Lâmpada de LED"),
+        ]
+    )
+
+    response = client.get("/products/search", params={"q": "led"})
+    assert response.status_code == 200
+    assert [product["id"] for product in response.json()] == [ids[3]]
+
+    # O último termo também casa como prefixo ("cadeiras")
+    found_ids = []
+    params = {"q": "cadeir", "limit": 2}
+    while True:
+        response = client.get("/products/search", params=params)
+        found_ids.extend(product["id"] for product in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params["cursor"] = cursor
+    assert sorted(found_ids) == [ids[0], ids[1], ids[2]]
+    assert found_ids[0] == ids[1]
+
+
+def test_search_index_follows_updates_and_deletes(setup_database):
+    """Checks that the triggers keep the full-text index in sync with the table."""
+    product_id = create_named_products([("Teclado", "Mecânico")])[0]
+    assert len(client.get("/products/search", params={"q": "mecanico"}).json()) == 1
+
+    client.put(f"/products/{product_id}", json={"description": "Sem fio"})
+    assert client.get("/products/search", params={"q": "mecanico"}).json() == []
+    assert len(client.get("/products/search", params={"q": "sem fio"}).json()) == 1
+
+    client.delete(f"/products/{product_id}")
+    assert client.get("/products/search", params={"q": "teclado"}).json() == []
+
+
+@pytest.mark.parametrize(
+    "name, type_, expected",
+    [
+        ("products_fts", "table", True),
+        ("products_fts_docsize", "table", True),
+        ("products", "table", False),
+        ("search_vector", "column", True),
+        ("ix_products_search_vector", "index", True),
+        ("ix_products_status_created_at_id", "index", False),
+    ],
+)
+def test_search_objects_are_skipped_by_autogenerate(name, type_, expected):
+    assert search.is_search_object(name, type_) == expected
+
+
+def test_search_products_rejects_invalid_input(setup_database):
+    """Checks empty queries, operator-only queries and mismatched cursors."""
+    create_named_products([("Caneca", "Porcelana"), ("Caneta", "Azul")])
+    assert client.get("/products/search", params={"q": ""}).status_code == 422
+    response = client.get("/products/search", params={"q": '" OR *'})
+    assert response.status_code == 200
+    assert response.json() == []
+
+    cursor = client.get("/products/search", params={"q": "can", "limit": 1}).headers[
+        "X-Next-Cursor"
+    ]
+    response = client.get("/products/search", params={"q": "caneca", "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_view_report_returns_counts_without_raw_views(setup_database):
+    """Checks that the report only pages the raw views when explicitly requested."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+    for i in range(5):
+        client.get(f"/products/{created_product_id}")
+    flush_view_logs()
+
+    response = client.get(f"/products/{created_product_id}/views")
+    assert response.status_code == 200
+    assert response.json()["number_of_views"] == 5
+    assert response.json()["views"] == []
+
+    response = client.get(
+        f"/products/{created_product_id}/views",
+        params={"include_views": True, "views_limit": 2, "views_skip": 4},
+    )
+    assert response.json()["number_of_views"] == 5
+    assert len(response.json()["views"]) == 1
+
+
+def test_view_counters_are_cleared_on_delete(setup_database):
+    """Checks that the pre-aggregated counters are removed with the product."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+    client.get(f"/products/{created_product_id}")
+    flush_view_logs()
+    response = client.delete(f"/products/{created_product_id}")
+    job_id = int(response.headers["X-Log-Purge-Job"])
+
+    # O produto já foi excluído; os logs são removidos pelo job
+    log_client = product_controller.product_log_client
+    assert log_client.get_product_view_count(created_product_id) == 1
+    assert client.get(f"/admin/jobs/{job_id}").json()["status"] == "pending"
+
+    assert run_log_purges() == 1
+    assert log_client.get_product_view_count(created_product_id) == 0
+    assert log_client.buckets.count_documents({"product_id": created_product_id}) == 0
+
+
+def test_deleted_product_ids_are_not_reused(setup_database):
+    """Checks that a pending purge can never target a product created after the delete."""
+    generated_products: List[dict] = utils.generate_valid_products(2)
+    client.post("/products/bulk", json=generated_products)
+    client.delete("/products/2")
+    response = client.post("/products", json=generated_products[1])
+    assert response.json()["id"] == 3
+
+
+def test_log_purge_deletes_in_batches(setup_database):
+    """Checks that a purge removes every log document, batch by batch."""
+    generated_products: List[dict] = utils.generate_valid_products(2)
+    client.post("/products/bulk", json=generated_products)
+    for i in range(5):
+        client.get("/products/1")
+    client.get("/products/2")
+    flush_view_logs()
+
+    log_client = product_controller.product_log_client
+    documents = log_client.collection.count_documents({"product_id": 1})
+    documents += log_client.buckets.count_documents({"product_id": 1})
+    assert log_client.purge_product_logs(1, batch_size=2) == documents
+    assert log_client.collection.count_documents({"product_id": 1}) == 0
+    assert log_client.buckets.count_documents({"product_id": 1}) == 0
+    assert log_client.get_product_view_count(2) == 1
+    # Rodar de novo (uma nova tentativa do job) não encontra mais nada
+    assert log_client.purge_product_logs(1, batch_size=2) == 0
+
+
+def test_time_series_purge_renews_between_windows(setup_database):
+    """Checks that time-series logs are purged one day at a time, renewing before each."""
+    log_client = product_controller.product_log_client
+    log_client.ensure_indexes()  # Recria product_views como time-series
+    assert log_client.is_time_series(mongodb.VIEWS_COLLECTION)
+    now = datetime(2026, 1, 10, 12)
+    log_client.collection.insert_many(
+        [{"product_id": 1, "viewed_at": now - timedelta(days=days)} for days in (0, 2)]
+        + [{"product_id": 2, "viewed_at": now}]
+    )
+    renewals = []
+
+    deleted = log_client.purge_product_logs(
+        1, batch_size=100, on_batch=lambda: renewals.append(True)
+    )
+    assert deleted == 2
+    assert len(renewals) == 3  # Um dia sem views no meio também é uma janela
+    assert log_client.collection.count_documents({}) == 1
+
+
+def test_log_purge_job_is_retried_then_failed(setup_database, monkeypatch):
+    """Checks that a failing purge is retried and marked failed after max_attempts."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    client.post("/products", json=generated_products[0])
+    job_id = client.delete("/products/1").headers["X-Log-Purge-Job"]
+
+    def unavailable(product_id, batch_size, on_batch=None):
+        raise ConnectionError("MongoDB unavailable")
+
+    log_client = product_controller.product_log_client
+    monkeypatch.setattr(log_client, "purge_product_logs", unavailable)
+    run_log_purges()
+    job = client.get(f"/admin/jobs/{job_id}").json()
+    assert job["status"] == "pending"
+    assert job["attempts"] == 1
+    assert "MongoDB unavailable" in job["last_error"]
+
+    run_log_purges()
+    job = client.get(f"/admin/jobs/{job_id}").json()
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    # Um job que falhou não é executado de novo
+    assert run_log_purges() == 0
+    assert client.get("/admin/jobs/999").status_code == 404
+
+
+def test_log_purge_renews_its_lease(setup_database, monkeypatch):
+    """Checks that a long purge renews its lease and stops once it loses it."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    client.post("/products", json=generated_products[0])
+    job_id = int(client.delete("/products/1").headers["X-Log-Purge-Job"])
+    renewals = []
+
+    def slow_purge(product_id, batch_size, on_batch=None):
+        with TestingSessionLocal() as db:
+            # Como se o primeiro lote tivesse começado depois de todo o lease
+            db.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(updated_at=utcnow() - timedelta(seconds=900))
+            )
+            db.commit()
+            on_batch()
+            renewals.append(db.get(Job, job_id).updated_at)
+            # O lease renovado impede que outro worker pegue o job
+            assert job_crud.claim_next_job(db, lease=600) is None
+            # Outro worker pega o job depois de um lease sem renovação
+            db.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(updated_at=utcnow() - timedelta(seconds=900))
+            )
+            db.commit()
+            assert job_crud.claim_next_job(db, lease=600).id == job_id
+        on_batch()
+        raise AssertionError("The purge must stop when the lease is lost.")
+
+    log_client = product_controller.product_log_client
+    monkeypatch.setattr(log_client, "purge_product_logs", slow_purge)
+    run_log_purges()
+    assert renewals[0] > utcnow() - timedelta(seconds=60)
+    # O job fica com o worker que o pegou de novo, sem erro registrado
+    job = client.get(f"/admin/jobs/{job_id}").json()
+    assert job["status"] == "running"
+    assert job["attempts"] == 2
+    assert job["last_error"] is None
+
+
+def test_list_impressions_are_counted_apart_from_views(setup_database):
+    """Checks that listings can count impressions instead of views, deduplicated."""
+    product_controller.view_policy = view_policy.ViewPolicy(
+        list_events="impressions",
+        deduplicator=view_policy.ViewDeduplicator(60, 1000, 0.01),
+    )
+    generated_products: List[dict] = utils.generate_valid_products(2)
+    client.post("/products/bulk", json=generated_products)
+    for i in range(3):
+        client.get("/products")  # Um crawler repetindo a mesma página
+    client.get("/products/1")
+    flush_view_logs()
+
+    report = client.get("/products/1/views", params={"include_views": True}).json()
+    assert report["number_of_views"] == 1
+    assert report["number_of_impressions"] == 1
+    assert len(report["views"]) == 1  # Impressões não geram log bruto
+    log_client = product_controller.product_log_client
+    assert log_client.get_product_counters(2) == (0, 1)
+
+
+def test_top_viewed_products_by_window(setup_database):
+    """Checks the ranking of the most viewed products in each time window."""
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    ids = [client.post("/products", json=p).json()["id"] for p in generated_products]
+    client.get(f"/products/{ids[0]}")
+    for i in range(3):
+        client.get(f"/products/{ids[1]}")
+    flush_view_logs()
+
+    # Visualizações de duas horas atrás: fora da última hora, dentro das 24h
+    two_hours_ago = mongodb.truncate(datetime.now() - timedelta(hours=2), "minute")
+    product_controller.product_log_client.buckets.insert_many(
+        [
+            {"product_id": ids[2], "granularity": "minute", "start": two_hours_ago},
+            {
+                "product_id": ids[2],
+                "granularity": "hour",
+                "start": two_hours_ago.replace(minute=0),
+            },
+        ]
+    )
+    product_controller.product_log_client.buckets.update_many(
+        {"product_id": ids[2]}, {"$set": {"count": 10}}
+    )
+
+    response = client.get("/products/views/top", params={"window": "1h"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"product_id": ids[1], "views": 3},
+        {"product_id": ids[0], "views": 1},
+    ]
+    response = client.get("/products/views/top", params={"window": "24h", "limit": 2})
+    assert response.json() == [
+        {"product_id": ids[2], "views": 10},
+        {"product_id": ids[1], "views": 3},
+    ]
+    assert client.get("/products/views/top", params={"window": "2h"}).status_code == 422
+
+
+def test_product_view_histogram(setup_database):
+    """Checks the zero-filled view series of a product per minute, hour and day."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+    for i in range(5):
+        client.get(f"/products/{created_product_id}")
+    flush_view_logs()
+
+    url = f"/products/{created_product_id}/views/histogram"
+    response = client.get(url, params={"bucket": "minute"})
+    assert response.status_code == 200
+    series = response.json()["series"]
+    assert len(series) == 60
+    assert sum(point["count"] for point in series) == 5
+    starts = [point["start"] for point in series]
+    assert starts == sorted(starts)
+
+    response = client.get(url, params={"bucket": "day", "periods": 3})
+    assert response.json()["bucket"] == "day"
+    assert sum(point["count"] for point in response.json()["series"]) == 5
+    assert len(response.json()["series"]) == 3
+
+    assert client.get(url, params={"bucket": "week"}).status_code == 422
+    assert client.get("/products/999/views/histogram").status_code == 404
+
+
+def test_view_log_indexes_and_retention(setup_database):
+    """Checks the view log indexes and the TTL of a regular product_views collection."""
+    log_client = product_controller.product_log_client
+    log_client.collection.insert_one({"product_id": 1, "viewed_at": datetime.now()})
+    log_client.ensure_indexes()
+    log_client.ensure_indexes()
+
+    view_indexes = log_client.collection.index_information()
+    assert view_indexes["product_id_viewed_at"]["key"] == mongodb.VIEWS_INDEX
+    assert view_indexes["viewed_at_ttl"]["expireAfterSeconds"] == 30 * 86400
+    bucket_indexes = log_client.buckets.index_information()
+    assert bucket_indexes["minute_buckets_ttl"]["expireAfterSeconds"] == 48 * 3600
+
+
+def test_relayed_view_batches_are_applied_once(setup_database):
+    """Checks that a batch relayed again from the outbox is not counted twice."""
+    log_client = product_controller.product_log_client
+    events = [
+        {"event_id": f"outbox:{i}", "product_id": 1, "viewed_at": datetime.now()}
+        for i in range(3)
+    ]
+    log_client.log_product_views(events)
+    log_client.log_product_views(events)
+
+    assert log_client.get_product_view_count(1) == 3
+    assert log_client.collection.count_documents({"product_id": 1}) == 3
+    assert log_client.applied_events.count_documents({"state": "applied"}) == 3
+
+
+def test_interrupted_view_batches_are_applied_after_the_lease(setup_database):
+    """Checks that events claimed by a relay that stopped midway are applied later."""
+    log_client = product_controller.product_log_client
+    event = {"event_id": "outbox:1", "product_id": 1, "viewed_at": datetime.now()}
+    log_client.applied_events.insert_one(
+        {
+            "_id": "outbox:1",
+            "state": "pending",
+            "owner": mongodb.ObjectId(),
+            "at": datetime.now(),
+        }
+    )
+    # Ainda dentro do lease: o lote volta para a outbox
+    with pytest.raises(mongodb.EventsInFlight):
+        log_client.log_product_views([event])
+    assert log_client.get_product_view_count(1) == 0
+
+    log_client.applied_events.update_one(
+        {"_id": "outbox:1"}, {"$set": {"at": datetime.now() - timedelta(hours=1)}}
+    )
+    log_client.log_product_views([event])
+    assert log_client.get_product_view_count(1) == 1
+
+
+def test_view_batches_failing_midway_are_not_counted_again(setup_database, monkeypatch):
+    """Checks that a batch resent after failing midway is not counted again."""
+    log_client = product_controller.product_log_client
+    events = [
+        {"event_id": f"outbox:{i}", "product_id": 1, "viewed_at": datetime.now()}
+        for i in range(2)
+    ]
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("MongoDB went away")
+
+    # Logs e contador gravados, buckets não
+    monkeypatch.setattr(log_client.buckets, "bulk_write", fail)
+    with pytest.raises(RuntimeError):
+        log_client.log_product_views(events)
+    monkeypatch.undo()
+    log_client.applied_events.update_many(
+        {}, {"$set": {"at": datetime.now() - timedelta(hours=1)}}
+    )
+    log_client.log_product_views(events)
+
+    assert log_client.get_product_view_count(1) == 2
+    assert log_client.collection.count_documents({"product_id": 1}) == 2
+    assert log_client.buckets.count_documents({}) == 0
+
+
+@pytest.mark.parametrize(
+    "indexes, seconds, expected",
+    [
+        ({}, 60, "create"),
+        ({"ttl": {"expireAfterSeconds": 60}}, 60, None),
+        ({"ttl": {"expireAfterSeconds": 60}}, 120, "modify"),
+        ({"ttl": {"expireAfterSeconds": 60}}, None, "drop"),
+        ({}, None, None),
+    ],
+)
+def test_ttl_index_action(indexes, seconds, expected):
+    assert mongodb.ttl_index_action(indexes, "ttl", seconds) == expected
+
+
+def test_view_log_stats_endpoint(setup_database):
+    """Checks that the admin endpoint reports the size and indexes of each collection."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    client.get(f"/products/{response.json()['id']}")
+    flush_view_logs()
+    product_controller.product_log_client.ensure_indexes()
+
+    response = client.get("/admin/view-logs")
+    assert response.status_code == 200
+    stats = {item["name"]: item for item in response.json()["collections"]}
+    assert set(stats) == {
+        "product_views",
+        "product_view_counters",
+        "product_view_buckets",
+    }
+    assert stats["product_views"]["count"] == 1
+    index_names = [index["name"] for index in stats["product_views"]["indexes"]]
+    assert "product_id_viewed_at" in index_names
+    assert response.json()["retention_days"] == 30
+
+
+def test_view_product_after_update_returns_fresh_data(setup_database):
+    """Checks that updating a product invalidates its cached lookup."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+
+    client.get(f"/products/{created_product_id}")  # Popula o cache
+    client.put(f"/products/{created_product_id}", json={"name": "cached_name"})
+    response = client.get(f"/products/{created_product_id}")
+    assert response.json()["name"] == "cached_name"
+
+    client.delete(f"/products/{created_product_id}")
+    response = client.get(f"/products/{created_product_id}")
+    assert response.status_code == 404
+
+
+def test_product_cache_skips_rows_read_before_a_write(setup_database, monkeypatch):
+    """Checks that a lookup racing with an update does not cache the old row."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+    find_product_by_id = product_crud.find_product_by_id
+
+    def find_then_update(product_id, db):
+        db_product = find_product_by_id(product_id, db)
+        # Atualização confirmada depois da leitura, antes do preenchimento
+        monkeypatch.setattr(product_crud, "find_product_by_id", find_product_by_id)
+        client.put(f"/products/{product_id}", json={"name": "fresh_name"})
+        return db_product
+
+    monkeypatch.setattr(product_crud, "find_product_by_id", find_then_update)
+    client.get(f"/products/{created_product_id}")
+    assert product_crud.product_cache.get(created_product_id) is None
+    response = client.get(f"/products/{created_product_id}")
+    assert response.json()["name"] == "fresh_name"
+
+
+def test_product_cache_is_filled_from_primary(setup_database, tmp_path):
+    """Checks that a lagging replica never puts an outdated row in the cache."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+    stale_etag = client.get(f"/products/{created_product_id}").headers["ETag"]
+
+    # Réplica parada no estado anterior à atualização
+    replica_path = tmp_path / "replica.db"
+    shutil.copy("./test/test_database.db", replica_path)
+    replica_engine = create_engine(f"sqlite:///{replica_path}")
+    ReplicaSessionLocal = sessionmaker(autoflush=False, bind=replica_engine)
+
+    def override_get_stale_read_db():
+        db = ReplicaSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    client.put(f"/products/{created_product_id}", json={"name": "fresh_name"})
+    app.dependency_overrides[dependencies.get_read_db] = override_get_stale_read_db
+    try:
+        response = client.get(
+            f"/products/{created_product_id}", headers={"If-None-Match": stale_etag}
+        )
+        assert response.status_code == 200
+        assert response.json()["name"] == "fresh_name"
+        assert product_crud.product_cache.get(created_product_id).name == "fresh_name"
+        response = client.get(f"/products/{created_product_id}/views")
+        assert response.json()["product"]["name"] == "fresh_name"
+    finally:
+        app.dependency_overrides[dependencies.get_read_db] = override_get_db
+        replica_engine.dispose()
+
+
+def test_bulk_create_products(setup_database):
+    """Checks that a list of products is created in one request."""
+    generated_products: List[dict] = utils.generate_valid_products(5)
+    response = client.post("/products/bulk", json=generated_products)
+    assert response.status_code == 201
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["created"] * 5
+    assert [result["index"] for result in results] == list(range(5))
+
+    for result, generated_product in zip(results, generated_products):
+        response = client.get(f"/products/{result['id']}")
+        assert response.json()["name"] == generated_product["name"]
+
+
+def test_bulk_create_rejects_invalid_item(setup_database):
+    """Checks that one invalid product rejects the whole batch."""
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    generated_products[1]["price"] = 0
+    response = client.post("/products/bulk", json=generated_products)
+    assert response.status_code == 422
+    assert client.get("/products").json() == []
+
+
+def test_bulk_update_products(setup_database):
+    """Checks the per-item results of a bulk update, including missing products."""
+    generated_products: List[dict] = utils.generate_valid_products(2)
+    client.post("/products/bulk", json=generated_products)
+
+    response = client.patch(
+        "/products/bulk",
+        json=[
+            {"id": 1, "stock_quantity": 42},
+            {"id": 999, "stock_quantity": 1},
+            {"id": 2, "name": "bulk_name"},
+        ],
+    )
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [
+        "updated",
+        "not_found",
+        "updated",
+    ]
+    assert client.get("/products/1").json()["stock_quantity"] == 42
+    assert client.get("/products/2").json()["name"] == "bulk_name"
+
+
+def test_bulk_update_repeated_product(setup_database):
+    """Checks that a product repeated in one bulk update gets every change."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    client.post("/products/bulk", json=generated_products)
+
+    response = client.patch(
+        "/products/bulk",
+        json=[{"id": 1, "stock_quantity": 7}, {"id": 1, "name": "repeated"}],
+    )
+    assert response.status_code == 200
+    product = client.get("/products/1").json()
+    assert (product["stock_quantity"], product["name"]) == (7, "repeated")
+    assert product["version"] == 3
+
+
+def test_bulk_delete_products_and_logs(setup_database):
+    """Checks that a bulk delete removes the products and their view logs."""
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    client.post("/products/bulk", json=generated_products)
+    client.get("/products")
+    flush_view_logs()
+
+    response = client.request("DELETE", "/products/bulk", json={"ids": [1, 3, 999]})
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [
+        "deleted",
+        "deleted",
+        "not_found",
+    ]
+    assert [product["id"] for product in client.get("/products").json()] == [2]
+
+    assert run_log_purges() == 2
+    log_client = product_controller.product_log_client
+    assert log_client.collection.count_documents({"product_id": {"$in": [1, 3]}}) == 0
+    assert log_client.get_product_view_count(2) == 1
+
+
+def create_stocked_product(stock_quantity: int, status: str = "em_estoque") -> dict:
+    product = utils.generate_valid_products(1)[0]
+    product.update(stock_quantity=stock_quantity, status=status)
+    return client.post("/products", json=product).json()
+
+
+def test_adjust_stock_moves_status_between_in_and_out_of_stock(setup_database):
+    """Checks that reserving the last units and restocking update the status."""
+    product = create_stocked_product(3)
+
+    response = client.post("/products/1/stock/adjust", json={"delta": -3})
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["stock_quantity"], data["status"]) == (0, "em_falta")
+    assert data["version"] == product["version"] + 1
+    assert response.headers["etag"] != f'"{product["version"]}"'
+    assert client.get("/products/1").json()["status"] == "em_falta"
+
+    response = client.post("/products/1/stock/adjust", json={"delta": 5})
+    assert (response.json()["stock_quantity"], response.json()["status"]) == (
+        5,
+        "em_estoque",
+    )
+
+
+def test_adjust_stock_keeps_in_replacement_status(setup_database):
+    create_stocked_product(4, "em_reposicao")
+    response = client.post("/products/1/stock/adjust", json={"delta": -1})
+    assert response.json()["status"] == "em_reposicao"
+    response = client.post("/products/1/stock/adjust", json={"delta": -3})
+    assert response.json()["status"] == "em_falta"
+
+
+def test_adjust_stock_rejects_insufficient_stock(setup_database):
+    """Checks that a reservation never takes the stock below zero."""
+    create_stocked_product(2)
+
+    response = client.post("/products/1/stock/adjust", json={"delta": -3})
+    assert response.status_code == 409
+    assert response.json() == {"message": "Insufficient stock."}
+    assert client.get("/products/1").json()["stock_quantity"] == 2
+
+    response = client.post("/products/999/stock/adjust", json={"delta": -1})
+    assert response.status_code == 404
+    response = client.post("/products/1/stock/adjust", json={"delta": 0})
+    assert response.status_code == 422
+
+
+def test_concurrent_stock_reservations_are_not_lost(setup_database):
+    """Checks that concurrent reservations sell exactly the available stock."""
+    create_stocked_product(5)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(
+            executor.map(
+                lambda _: client.post("/products/1/stock/adjust", json={"delta": -1}),
+                range(12),
+            )
+        )
+    assert (
+        sorted(response.status_code for response in responses) == [200] * 5 + [409] * 7
+    )
+    product = client.get("/products/1").json()
+    assert (product["stock_quantity"], product["status"]) == (0, "em_falta")
+    assert product["version"] == 6
+
+
+def test_bulk_adjust_stock_is_all_or_nothing(setup_database):
+    """Checks that a batch is applied entirely or, on any failure, not at all."""
+    create_stocked_product(5)
+    create_stocked_product(1)
+
+    response = client.post(
+        "/products/bulk/stock/adjust",
+        json=[{"id": 2, "delta": -1}, {"id": 1, "delta": -2}, {"id": 1, "delta": -3}],
+    )
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [
+        "adjusted"
+    ] * 3
+    assert client.get("/products/1").json()["stock_quantity"] == 0
+    assert client.get("/products/2").json()["status"] == "em_falta"
+
+    response = client.post(
+        "/products/bulk/stock/adjust",
+        json=[{"id": 1, "delta": 4}, {"id": 2, "delta": -1}, {"id": 999, "delta": -1}],
+    )
+    assert response.status_code == 409
+    assert [result["status"] for result in response.json()["results"]] == [
+        "not_applied",
+        "insufficient_stock",
+        "not_found",
+    ]
+    assert client.get("/products/1").json()["stock_quantity"] == 0
+
+
+def test_product_stats_follow_every_write(setup_database):
+    """Checks the catalog summary against the products after several writes."""
+    client.post("/products/bulk", json=utils.generate_valid_products(20))
+    client.put("/products/3", json={"price": 12.5})
+    client.put("/products/4", json={"status": "em_falta", "stock_quantity": 0})
+    client.delete("/products/5")
+    client.request("DELETE", "/products/bulk", json={"ids": [6, 7]})
+    client.post("/products/8/stock/adjust", json={"delta": -1})
+
+    response = client.get("/products/stats")
+    assert response.status_code == 200
+    stats = response.json()
+    products = client.get("/products", params={"limit": 500}).json()
+    prices = sorted(product["price"] for product in products)
+    assert stats["product_count"] == len(products) == 17
+    for status in ProductStatus:
+        assert stats["status_counts"][status.value] == sum(
+            product["status"] == status.value for product in products
+        )
+    assert stats["status_counts"]["em_falta"] >= 1
+    assert stats["total_price"] == pytest.approx(sum(prices))
+    assert stats["average_price"] == pytest.approx(sum(prices) / len(prices), abs=0.01)
+    assert stats["total_stock_quantity"] == sum(
+        product["stock_quantity"] for product in products
+    )
+    assert stats["inventory_value"] == pytest.approx(
+        sum(product["price"] * product["stock_quantity"] for product in products),
+        abs=0.01,
+    )
+    # Nearest-rank, com erro relativo de até 1%
+    assert stats["price_percentiles"]["p50"] == pytest.approx(prices[8], rel=0.011)
+    assert stats["price_percentiles"]["p99"] == pytest.approx(prices[-1], rel=0.011)
+
+    response = client.get(
+        "/products/stats", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+
+
+def test_stock_adjustments_spread_over_counter_shards(setup_database):
+    """Checks that stock adjustments bump the product's counter rows, not shared ones."""
+    client.post("/products/bulk", json=utils.generate_valid_products(3))
+    listing_etag = client.get("/products").headers["ETag"]
+    with TestingSessionLocal() as db:
+        histogram = db.execute(product_crud.price_histogram_statement()).all()
+
+    client.post("/products/2/stock/adjust", json={"delta": 1})
+    client.post(
+        "/products/bulk/stock/adjust",
+        json=[{"id": 3, "delta": 1}, {"id": 1, "delta": 1}],
+    )
+
+    with TestingSessionLocal() as db:
+        versions = dict(
+            db.execute(select(ProductCatalog.id, ProductCatalog.version)).all()
+        )
+        assert db.execute(product_crud.price_histogram_statement()).all() == histogram
+    assert versions[product_model.catalog_shard(2)] == 1
+    assert versions[product_model.catalog_shard(1)] == 1
+    assert versions[product_model.CATALOG_ID] == 1
+    response = client.get("/products", headers={"If-None-Match": listing_etag})
+    assert response.status_code == 200
+    assert client.get("/products/stats").json()["version"] == 3
+
+
+def test_product_stats_of_empty_catalog(setup_database):
+    stats = client.get("/products/stats").json()
+    assert stats["product_count"] == 0
+    assert stats["average_price"] is None
+    assert stats["price_percentiles"] == {}
+    assert set(stats["status_counts"].values()) == {0}
+
+
+def test_export_products_as_ndjson(setup_database):
+    """Checks that the catalog is streamed as one JSON object per line."""
+    generated_products: List[dict] = utils.generate_valid_products(5)
+    client.post("/products/bulk", json=generated_products)
+
+    response = client.get("/products/export", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert len(lines) == 5
+    for line, generated_product in zip(lines, generated_products):
+        exported = json.loads(line)
+        assert exported["name"] == generated_product["name"]
+        assert exported["price"] == generated_product["price"]
+        assert exported["status"] == generated_product["status"]
+
+
+def test_export_products_as_csv(setup_database):
+    """Checks that the catalog is streamed as CSV with a header row."""
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    client.post("/products/bulk", json=generated_products)
+
+    response = client.get("/products/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 3
+    assert rows[0]["name"] == generated_products[0]["name"]
+    assert int(rows[2]["stock_quantity"]) == generated_products[2]["stock_quantity"]
+
+
+def test_import_products_from_ndjson(setup_database):
+    """Checks that valid NDJSON lines are imported and invalid ones reported."""
+    generated_products: List[dict] = utils.generate_valid_products(5)
+    invalid_status = dict(generated_products[0], status="em_falta")  # stock > 0
+    lines = [json.dumps(product) for product in generated_products[:3]]
+    lines += ["{not json", json.dumps(invalid_status), ""]
+    lines += [json.dumps(product) for product in generated_products[3:]]
+    response = client.post(
+        "/products/import",
+        params={"format": "ndjson", "chunk_size": 2},
+        content="\n".join(lines).encode(),
+    )
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["accepted"] == 5
+    assert summary["rejected"] == 2
+    assert summary["chunks"] == 3
+    assert [error["line"] for error in summary["errors"]] == [4, 5]
+
+    listed = client.get("/products").json()
+    assert [product["name"] for product in listed] == [
+        product["name"] for product in generated_products
+    ]
+
+
+def test_import_products_from_exported_csv(setup_database):
+    """Checks that a CSV export, quoted newlines included, can be imported back."""
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    generated_products[1]["description"] = 'multi\nline, "quoted"'
+    client.post("/products/bulk", json=generated_products)
+    exported = client.get("/products/export", params={"format": "csv"}).content
+    client.request("DELETE", "/products/bulk", json={"ids": [1, 2, 3]})
+
+    response = client.post(
+        "/products/import", params={"format": "csv"}, content=exported
+    )
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 3
+    assert response.json()["rejected"] == 0
+    descriptions = [
+        product["description"] for product in client.get("/products").json()
+    ]
+    assert descriptions[1] == 'multi\nline, "quoted"'
+
+
+def test_import_products_reports_csv_errors_with_line_numbers(setup_database):
+    """Checks that invalid CSV rows are rejected with their line numbers."""
+    content = (
+        "name,description,price,status,stock_quantity\n"
+        "ok,description,10.5,em_estoque,3\n"
+        "bad_price,description,-1,em_estoque,3\n"
+        "missing,column\n"
+    )
+    response = client.post(
+        "/products/import", params={"format": "csv"}, content=content.encode()
+    )
+    summary = response.json()
+    assert summary["accepted"] == 1
+    assert [error["line"] for error in summary["errors"]] == [3, 4]
+    assert summary["errors"][0]["errors"] == [
+        "Field 'price': input should be greater than 0"
+    ]
+
+
+def test_get_product_answers_if_none_match_with_304(setup_database):
+    """Checks that an unchanged product is validated by its ETag."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    client.post("/products", json=generated_products[0])
+    response = client.get("/products/1")
+    etag = response.headers["ETag"]
+    assert response.json()["version"] == 1
+    assert "Last-Modified" in response.headers
+
+    response = client.get("/products/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    client.put("/products/1", json={"name": "renamed"})
+    response = client.get("/products/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.headers["ETag"] != etag
+
+
+def test_list_products_answers_if_none_match_with_304(setup_database):
+    """Checks that listings are validated by the table-level change counter."""
+    generated_products: List[dict] = utils.generate_valid_products(2)
+    client.post("/products/bulk", json=generated_products)
+    etag = client.get("/products").headers["ETag"]
+    response = client.get("/products", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.patch("/products/bulk", json=[{"id": 2, "name": "renamed"}])
+    response = client.get("/products", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[1]["version"] == 2
+    assert response.headers["ETag"] != etag
+
+
+def test_update_and_delete_product_check_if_match(setup_database):
+    """Checks that PUT and DELETE with a stale If-Match fail with 412."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    etag = client.post("/products", json=generated_products[0]).headers["ETag"]
+
+    response = client.put(
+        "/products/1", json={"name": "first"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    new_etag = response.headers["ETag"]
+
+    # Segunda escrita feita sobre a versão antiga
+    response = client.put(
+        "/products/1", json={"name": "second"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+    response = client.delete("/products/1", headers={"If-Match": etag})
+    assert response.status_code == 412
+    assert client.get("/products/1").json()["name"] == "first"
+
+    response = client.delete("/products/1", headers={"If-Match": new_etag})
+    assert response.status_code == 200
+
+
+def test_fast_serialization_matches_validated_responses(setup_database):
+    """Checks that skipping response validation renders the same JSON."""
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    client.post("/products/bulk", json=generated_products)
+    client.get("/products/2")
+    rendered = [client.get(path).json() for path in ("/products", "/products/2")]
+    rendered.append(client.get("/products/2/views?include_views=true").json())
+
+    product_controller.validate_responses = True
+    try:
+        validated = [client.get(path).json() for path in ("/products", "/products/2")]
+        validated.append(client.get("/products/2/views?include_views=true").json())
+    finally:
+        product_controller.validate_responses = False
+    # As visualizações registradas entre as leituras mudam apenas o total
+    for report in (rendered[2], validated[2]):
+        report.pop("number_of_views")
+    assert rendered == validated
+
+
+def test_large_responses_are_compressed(setup_database):
+    """Checks that responses above the size threshold are gzip-encoded."""
+    generated_products: List[dict] = utils.generate_valid_products(20)
+    client.post("/products/bulk", json=generated_products)
+
+    response = client.get("/products", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"].startswith('W/"')
+    assert len(response.json()) == 20
+
+    response = client.get("/products/1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+    response = client.get("/products", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
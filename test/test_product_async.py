@@ -0,0 +1,356 @@
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from test import utils
+from typing import List
+
+import pytest
+from dotenv import load_dotenv
+from fastapi import FastAPI
+from fastapi.exceptions import RequestValidationError
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import exception_handlers, exceptions
+from app.controllers.admin_controller import build_admin_controller
+from app.controllers.product_controller import AsyncProductController
+from app.crud import product_crud
+from app.database import dependencies, sql
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test/test_async_database.db"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+)
+# NullPool: o TestClient pode usar um event loop diferente a cada requisição
+async_engine = create_async_engine(
+    sql.to_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+async_product_controller = AsyncProductController()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await async_product_controller.startup("test")
+    # O worker ainda não rodou: passa a usar o banco de testes
+    async_product_controller.log_purge_worker.session_factory = TestingAsyncSessionLocal
+    yield
+    await async_product_controller.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_exception_handler(
+    exceptions.NotFound, exception_handlers.not_found_exception_handler
+)
+app.add_exception_handler(
+    exceptions.Conflict, exception_handlers.conflict_exception_handler
+)
+app.add_exception_handler(
+    exceptions.PreconditionFailed,
+    exception_handlers.precondition_failed_exception_handler,
+)
+app.add_exception_handler(
+    RequestValidationError, exception_handlers.validation_exception_handler
+)
+app.include_router(async_product_controller.router)
+app.include_router(build_admin_controller(async_product_controller).router)
+app.dependency_overrides[dependencies.get_async_db] = override_get_async_db
+app.dependency_overrides[dependencies.get_async_read_db] = override_get_async_db
+app.dependency_overrides[dependencies.get_async_primary_db] = override_get_async_db
+
+load_dotenv()
+
+MONGODB_TEST_DATABASE_NAME = os.getenv("MONGODB_TEST_DATABASE_NAME")
+
+
+@pytest.fixture(scope="function")
+def client():
+    # O lifespan cria os clientes assíncronos no event loop do TestClient
+    with TestClient(app) as client:
+        mongo_client = async_product_controller.product_log_client.mongo_client
+        client.portal.call(mongo_client.drop_database, MONGODB_TEST_DATABASE_NAME)
+        product_crud.product_cache.clear()
+
+        sql.Base.metadata.drop_all(bind=engine)
+        sql.Base.metadata.create_all(bind=engine)
+
+        yield client
+
+        sql.Base.metadata.drop_all(bind=engine)
+        client.portal.call(mongo_client.drop_database, MONGODB_TEST_DATABASE_NAME)
+
+
+def test_async_create_and_view_product(client):
+    """Checks that the async handlers create and return a product."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    assert response.status_code == 201
+    created_product = response.json()
+
+    response = client.get(f"/products/{created_product['id']}")
+    assert response.status_code == 200
+    assert response.json() == created_product
+
+
+def test_async_list_products_paginates(client):
+    """Checks that the async listing uses the same keyset pagination."""
+    generated_products: List[dict] = utils.generate_valid_products(5)
+    for generated_product in generated_products:
+        client.post("/products", json=generated_product)
+
+    first_page = client.get("/products", params={"limit": 3})
+    assert len(first_page.json()) == 3
+    second_page = client.get(
+        "/products",
+        params={"limit": 3, "cursor": first_page.headers["X-Next-Cursor"]},
+    )
+    assert [p["id"] for p in second_page.json()] == [4, 5]
+
+
+def test_async_search_products(client):
+    """Checks that the async search uses the same full-text index."""
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    generated_products[1]["name"] = "Garrafa térmica"
+    for generated_product in generated_products:
+        client.post("/products", json=generated_product)
+
+    response = client.get("/products/search", params={"q": "termica"})
+    assert response.status_code == 200
+    assert [product["name"] for product in response.json()] == ["Garrafa térmica"]
+
+
+def test_async_update_and_delete_product(client):
+    """Checks the async update and delete paths, including NotFound."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+
+    response = client.put(
+        f"/products/{created_product_id}", json={"stock_quantity": 999}
+    )
+    assert response.status_code == 200
+    assert response.json()["stock_quantity"] == 999
+
+    response = client.delete(f"/products/{created_product_id}")
+    assert response.status_code == 200
+    response = client.delete(f"/products/{created_product_id}")
+    assert response.status_code == 404
+    assert response.json()["message"] == "Product not found."
+
+
+def test_async_delete_purges_logs_in_background(client):
+    """Checks that the async delete queues a view log purge job."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    created_product_id = client.post("/products", json=generated_products[0]).json()[
+        "id"
+    ]
+    client.get(f"/products/{created_product_id}")
+    client.portal.call(async_product_controller.view_log_pipeline.flush)
+
+    response = client.delete(f"/products/{created_product_id}")
+    job_id = response.headers["X-Log-Purge-Job"]
+    client.portal.call(async_product_controller.log_purge_worker.run_pending)
+
+    job = client.get(f"/admin/jobs/{job_id}").json()
+    assert job["status"] == "done"
+    assert job["product_id"] == created_product_id
+    log_client = async_product_controller.product_log_client
+    assert (
+        client.portal.call(log_client.get_product_view_count, created_product_id) == 0
+    )
+    assert client.get("/admin/jobs/999").status_code == 404
+
+
+def test_async_conditional_requests(client):
+    """Checks ETag validation (304) and If-Match (412) on the async path."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    etag = client.post("/products", json=generated_products[0]).headers["ETag"]
+    response = client.get("/products/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    listing_etag = client.get("/products").headers["ETag"]
+
+    response = client.put(
+        "/products/1", json={"stock_quantity": 5}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    response = client.put(
+        "/products/1", json={"stock_quantity": 6}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 412
+    response = client.get("/products", headers={"If-None-Match": listing_etag})
+    assert response.status_code == 200
+
+
+def test_async_view_report(client):
+    """Checks the async view report against the pre-aggregated counter."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+    for i in range(3):
+        client.get(f"/products/{created_product_id}")
+    client.portal.call(async_product_controller.view_log_pipeline.flush)
+
+    response = client.get(f"/products/{created_product_id}/views")
+    assert response.status_code == 200
+    assert response.json()["number_of_views"] == 3
+
+
+def test_async_view_analytics(client):
+    """Checks the async top-N ranking and view histogram."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+    for i in range(2):
+        client.get(f"/products/{created_product_id}")
+    client.portal.call(async_product_controller.view_log_pipeline.flush)
+
+    response = client.get("/products/views/top", params={"window": "7d"})
+    assert response.json() == [{"product_id": created_product_id, "views": 2}]
+    response = client.get(
+        f"/products/{created_product_id}/views/histogram", params={"periods": 5}
+    )
+    assert sum(point["count"] for point in response.json()["series"]) == 2
+
+
+def test_async_relayed_view_batches_are_applied_once(client):
+    """Checks that the async client ignores a batch relayed again from the outbox."""
+    log_client = async_product_controller.product_log_client
+    events = [
+        {"event_id": f"outbox:{i}", "product_id": 1, "viewed_at": datetime.now()}
+        for i in range(2)
+    ]
+    client.portal.call(log_client.log_product_views, events)
+    client.portal.call(log_client.log_product_views, events)
+    assert client.portal.call(log_client.get_product_view_count, 1) == 2
+
+
+def test_async_view_log_stats(client):
+    """Checks the async admin report of the view log collections."""
+    # O fixture apaga o banco criado no startup: recria coleções e índices
+    client.portal.call(async_product_controller.product_log_client.ensure_indexes)
+    response = client.get("/admin/view-logs")
+    assert response.status_code == 200
+    stats = {item["name"]: item for item in response.json()["collections"]}
+    index_names = [index["name"] for index in stats["product_view_buckets"]["indexes"]]
+    assert "minute_buckets_ttl" in index_names
+
+
+def test_async_view_report_includes_views(client):
+    """Checks that the raw views are paged alongside the concurrent lookups."""
+    generated_products: List[dict] = utils.generate_valid_products(1)
+    response = client.post("/products", json=generated_products[0])
+    created_product_id = response.json()["id"]
+    for i in range(4):
+        client.get(f"/products/{created_product_id}")
+    client.portal.call(async_product_controller.view_log_pipeline.flush)
+
+    response = client.get(
+        f"/products/{created_product_id}/views",
+        params={"include_views": True, "views_limit": 3},
+    )
+    assert response.json()["number_of_views"] == 4
+    assert len(response.json()["views"]) == 3
+
+    response = client.get("/products/999/views")
+    assert response.status_code == 404
+
+
+def test_async_bulk_endpoints(client):
+    """Checks the async bulk create, update and delete paths."""
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    response = client.post("/products/bulk", json=generated_products)
+    assert response.status_code == 201
+    assert [result["id"] for result in response.json()["results"]] == [1, 2, 3]
+
+    response = client.patch(
+        "/products/bulk", json=[{"id": 2, "stock_quantity": 7}, {"id": 9, "name": "x"}]
+    )
+    assert [result["status"] for result in response.json()["results"]] == [
+        "updated",
+        "not_found",
+    ]
+    assert client.get("/products/2").json()["stock_quantity"] == 7
+
+    response = client.request("DELETE", "/products/bulk", json={"ids": [1, 2]})
+    assert [result["status"] for result in response.json()["results"]] == [
+        "deleted",
+        "deleted",
+    ]
+    assert [product["id"] for product in client.get("/products").json()] == [3]
+
+
+def test_async_stock_adjustments(client):
+    """Checks the async single and batch stock adjustment paths."""
+    generated_products: List[dict] = utils.generate_valid_products(2)
+    generated_products[0].update(stock_quantity=2, status="em_estoque")
+    client.post("/products/bulk", json=generated_products)
+
+    response = client.post("/products/1/stock/adjust", json={"delta": -2})
+    assert response.status_code == 200
+    assert (response.json()["stock_quantity"], response.json()["status"]) == (
+        0,
+        "em_falta",
+    )
+    response = client.post("/products/1/stock/adjust", json={"delta": -1})
+    assert response.status_code == 409
+
+    response = client.post(
+        "/products/bulk/stock/adjust",
+        json=[{"id": 1, "delta": 3}, {"id": 2, "delta": -1000}],
+    )
+    assert response.status_code == 409
+    assert [result["status"] for result in response.json()["results"]] == [
+        "not_applied",
+        "insufficient_stock",
+    ]
+    response = client.post("/products/bulk/stock/adjust", json=[{"id": 1, "delta": 3}])
+    assert response.json()["results"][0]["status"] == "adjusted"
+    assert client.get("/products/1").json()["status"] == "em_estoque"
+
+
+def test_async_product_stats(client):
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    client.post("/products/bulk", json=generated_products)
+    client.delete("/products/1")
+
+    stats = client.get("/products/stats").json()
+    assert stats["product_count"] == 2
+    assert stats["total_price"] == pytest.approx(
+        sum(product["price"] for product in generated_products[1:])
+    )
+    assert stats["version"] == 2
+
+
+def test_async_export_products(client):
+    """Checks that the async export streams every product."""
+    generated_products: List[dict] = utils.generate_valid_products(4)
+    client.post("/products/bulk", json=generated_products)
+
+    response = client.get("/products/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 5  # Cabeçalho + 4 produtos
+
+
+def test_async_import_products(client):
+    """Checks that the async import writes every valid row."""
+    generated_products: List[dict] = utils.generate_valid_products(3)
+    content = "\n".join(json.dumps(product) for product in generated_products)
+    response = client.post(
+        "/products/import", params={"chunk_size": 2}, content=content.encode()
+    )
+    assert response.json()["accepted"] == 3
+    assert response.json()["chunks"] == 2
+    assert len(client.get("/products").json()) == 3
@@ -0,0 +1,119 @@
+from datetime import datetime
+from test import utils
+
+from app.cache import LRUProductCache, SharedProductCache
+from app.schemas.product_schema import Product, ProductStatus
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_product(product_id: int) -> Product:
+    return Product(
+        id=product_id,
+        name=f"product_{product_id}",
+        description="description",
+        price=10.0,
+        status=ProductStatus.in_stock,
+        stock_quantity=1,
+        version=1,
+        updated_at=datetime(2026, 1, 1),
+    )
+
+
+def test_lru_cache_hits_and_misses():
+    """Checks that cached products are returned and counted as hits."""
+    cache = LRUProductCache(max_size=10, ttl=60)
+    assert cache.get(1) is None
+    cache.set(make_product(1))
+    assert cache.get(1).name == "product_1"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Checks that the least recently used entry is evicted when full."""
+    cache = LRUProductCache(max_size=2, ttl=60)
+    cache.set(make_product(1))
+    cache.set(make_product(2))
+    cache.get(1)  # 1 passa a ser o mais recente
+    cache.set(make_product(3))
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_cache_expires_entries():
+    """Checks that entries older than the TTL are not served."""
+    clock = FakeClock()
+    cache = LRUProductCache(max_size=10, ttl=5, clock=clock)
+    cache.set(make_product(1))
+    clock.now = 4
+    assert cache.get(1) is not None
+    clock.now = 5
+    assert cache.get(1) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_cache_invalidate():
+    """Checks that an invalidated product is loaded again."""
+    cache = LRUProductCache(max_size=10, ttl=60)
+    cache.set(make_product(1))
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+
+def test_shared_cache_round_trip():
+    """Checks the shared backend against the local Redis fake."""
+    cache = SharedProductCache(utils.FakeRedis(), ttl=60)
+    assert cache.get(1) is None
+    cache.set(make_product(1))
+    assert cache.get(1) == make_product(1)
+    cache.invalidate(1)
+    assert cache.get(1) is None
+    cache.set(make_product(2))
+    cache.clear()
+    assert cache.get(2) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+
+
+def test_lru_cache_refuses_fills_older_than_an_invalidation():
+    """Checks that a row read before a concurrent write is not cached after it."""
+    cache = LRUProductCache(max_size=1, ttl=60)
+    token = cache.fill_token(1)
+    cache.invalidate(1)
+    cache.set(make_product(1), token)
+    assert cache.get(1) is None
+
+    # Outros produtos invalidados não afetam o preenchimento
+    token = cache.fill_token(1)
+    cache.invalidate(2)
+    cache.set(make_product(1), token)
+    assert cache.get(1) is not None
+
+    # Invalidação já descartada (max_size): na dúvida, não grava
+    token = cache.fill_token(3)
+    cache.invalidate(3)
+    cache.invalidate(4)
+    cache.set(make_product(3), token)
+    assert cache.get(3) is None
+    assert cache.stats()["stale_fills"] == 2
+
+
+def test_shared_cache_refuses_fills_older_than_an_invalidation():
+    """Checks the generation check of the shared backend."""
+    cache = SharedProductCache(utils.FakeRedis(), ttl=60)
+    token = cache.fill_token(1)
+    cache.invalidate_many([1, 2])
+    cache.set(make_product(1), token)
+    assert cache.get(1) is None
+
+    cache.set(make_product(1), cache.fill_token(1))
+    assert cache.get(1) == make_product(1)
+    assert cache.stats()["stale_fills"] == 1
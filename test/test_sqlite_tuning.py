@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import sql
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'tuning.db'}"
+    engine = sql.build_engine(url)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+    engine.dispose()
+    return url
+
+
+def test_engine_applies_pragmas_on_connect(database_url):
+    """Checks that the tuning profile is applied to every new connection."""
+    engine = sql.build_engine(database_url)
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL == 1
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        # MEMORY == 2
+        assert connection.execute(text("PRAGMA temp_store")).scalar() == 2
+    engine.dispose()
+
+
+def test_engine_uses_explicit_pool_sizing(database_url):
+    """Checks that the configured pool size is used instead of the dialect default."""
+    engine = sql.build_engine(database_url)
+    assert engine.pool.size() == 5
+    engine.dispose()
+
+
+def test_read_only_engine_rejects_writes(database_url):
+    """Checks that the read-only engine can read but never write."""
+    read_engine = sql.build_engine(sql.to_read_only_url(database_url), read_only=True)
+    with read_engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM items")).scalar() == 0
+        with pytest.raises(OperationalError):
+            connection.execute(text("INSERT INTO items (id) VALUES (1)"))
+    read_engine.dispose()
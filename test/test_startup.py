@@ -0,0 +1,102 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import startup
+from app.controllers.health_controller import HealthController
+from app.controllers.product_controller import ProductController
+from app.database import dependencies
+
+engine = create_engine("sqlite://")
+session_factory = sessionmaker(bind=engine)
+
+app = FastAPI()
+app.include_router(HealthController(ProductController()).router)
+
+
+def get_db():
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+app.dependency_overrides[dependencies.get_db] = get_db
+client = TestClient(app)
+
+
+@pytest.fixture
+def profile(monkeypatch):
+    """A fresh startup profile in place of the process-wide one."""
+    profile = startup.StartupProfile()
+    monkeypatch.setattr(startup, "profile", profile)
+    return profile
+
+
+def test_startup_profile_records_phases(profile):
+    with profile.phase("sql_engines"):
+        pass
+    profile.mark_imported()
+    profile.mark_ready()
+
+    assert set(profile.phases) == {"sql_engines", "import"}
+    assert profile.state == startup.READY
+    assert profile.startup_seconds >= profile.phases["import"] > 0
+    samples = profile.collect()
+    assert (
+        "app_startup_phase_seconds",
+        "gauge",
+        {"phase": "sql_engines"},
+        profile.phases["sql_engines"],
+    ) in samples
+    assert ("app_ready", "gauge", {}, 1) in samples
+    assert "ready after" in profile.report()
+
+
+def test_startup_above_target_is_logged(profile, monkeypatch, caplog):
+    monkeypatch.setattr(profile, "elapsed", lambda: 9.5)
+    with caplog.at_level("WARNING", logger="app.startup"):
+        profile.mark_ready()
+    assert "above the 5.00s target" in caplog.text
+
+
+def test_liveness_answers_during_startup(profile):
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert response.json() == {"status": "starting"}
+
+
+def test_readiness_follows_startup_and_shutdown(profile):
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+    assert response.json()["checks"]["database"] == "pending"
+
+    profile.mark_ready()
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["checks"] == {
+        "database": "ok",
+        "view_log_indexes": "pending",
+    }
+    assert response.json()["startup_seconds"] == profile.startup_seconds
+
+    profile.mark_stopping()
+    assert client.get("/health/ready").status_code == 503
+
+
+def test_readiness_fails_without_database(profile, monkeypatch):
+    profile.mark_ready()
+
+    def execute(self, *args, **kwargs):
+        raise OperationalError("SELECT 1", {}, Exception("unreachable"))
+
+    monkeypatch.setattr("sqlalchemy.orm.Session.execute", execute)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
+    assert response.json()["checks"]["database"] == "unavailable"
@@ -0,0 +1,202 @@
+import asyncio
+import threading
+from datetime import datetime
+
+from app.database.view_log_pipeline import AsyncViewLogPipeline, ViewLogPipeline
+from app.database.view_outbox import ViewOutbox
+
+
+class FakeProductLogClient:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+        self.written = threading.Event()
+
+    def log_product_views(self, events):
+        if self.fail:
+            raise RuntimeError("MongoDB unavailable")
+        self.batches.append(list(events))
+        self.written.set()
+
+
+def test_flush_writes_events_in_batches():
+    """Checks that queued events are written with one call per batch."""
+    client = FakeProductLogClient()
+    pipeline = ViewLogPipeline(
+        client, max_queue_size=100, batch_size=4, flush_interval=60
+    )
+    pipeline.submit_many(range(10))
+    pipeline.flush()
+    assert [len(batch) for batch in client.batches] == [4, 4, 2]
+    assert [event["product_id"] for batch in client.batches for event in batch] == (
+        list(range(10))
+    )
+    assert pipeline.stats()["written"] == 10
+
+
+def test_full_queue_drops_and_counts_events():
+    """Checks that events beyond the queue capacity are dropped, not blocked on."""
+    client = FakeProductLogClient()
+    pipeline = ViewLogPipeline(
+        client, max_queue_size=5, batch_size=100, flush_interval=60
+    )
+    pipeline.submit_many(range(8))
+    stats = pipeline.stats()
+    assert stats["enqueued"] == 5
+    assert stats["dropped"] == 3
+    assert stats["queued"] == 5
+
+
+def test_background_flusher_writes_on_size_trigger():
+    """Checks that reaching 'batch_size' wakes the flusher before the interval."""
+    client = FakeProductLogClient()
+    pipeline = ViewLogPipeline(
+        client, max_queue_size=100, batch_size=3, flush_interval=60
+    )
+    pipeline.start()
+    try:
+        pipeline.submit_many([1, 2, 3])
+        assert client.written.wait(5)
+    finally:
+        pipeline.stop()
+    assert pipeline.stats()["written"] == 3
+
+
+def test_stop_drains_pending_events():
+    """Checks that stopping the pipeline writes the events still in the queue."""
+    client = FakeProductLogClient()
+    pipeline = ViewLogPipeline(
+        client, max_queue_size=100, batch_size=50, flush_interval=60
+    )
+    pipeline.start()
+    pipeline.submit_many([1, 2])
+    pipeline.stop()
+    assert sum(len(batch) for batch in client.batches) == 2
+    assert pipeline.stats()["queued"] == 0
+
+
+def test_failed_writes_are_counted():
+    """Checks that a MongoDB failure is counted instead of propagated."""
+    pipeline = ViewLogPipeline(
+        FakeProductLogClient(fail=True),
+        max_queue_size=10,
+        batch_size=10,
+        flush_interval=60,
+    )
+    pipeline.submit_many([1, 2, 3])
+    pipeline.flush()
+    assert pipeline.stats()["failed"] == 3
+
+
+class FakeAsyncProductLogClient(FakeProductLogClient):
+    async def log_product_views(self, events):
+        super().log_product_views(events)
+
+
+def test_outbox_keeps_events_while_mongodb_is_down(tmp_path):
+    """Checks that events survive a MongoDB outage in the outbox and are relayed later."""
+    client = FakeProductLogClient(fail=True)
+    pipeline = ViewLogPipeline(
+        client,
+        max_queue_size=100,
+        batch_size=2,
+        flush_interval=60,
+        outbox=ViewOutbox(str(tmp_path / "outbox.db")),
+        retry_delay=0,
+    )
+    pipeline.submit_many([1, 2, 3])
+    pipeline.flush()
+    stats = pipeline.stats()
+    assert stats["queued"] == 0
+    assert stats["outbox_pending"] == 3
+    assert stats["written"] == 0
+
+    client.fail = False
+    assert pipeline.relay() == 3
+    assert [event["product_id"] for batch in client.batches for event in batch] == [
+        1,
+        2,
+        3,
+    ]
+    assert pipeline.stats()["outbox_pending"] == 0
+
+
+def test_relay_waits_before_retrying(tmp_path):
+    """Checks that a failed relay is not retried before the retry delay."""
+    client = FakeProductLogClient(fail=True)
+    pipeline = ViewLogPipeline(
+        client,
+        max_queue_size=100,
+        batch_size=10,
+        flush_interval=60,
+        outbox=ViewOutbox(str(tmp_path / "outbox.db")),
+        retry_delay=60,
+    )
+    pipeline.submit_many([1])
+    pipeline.flush()
+    client.fail = False
+    assert pipeline.relay() == 0
+    assert pipeline.stats()["outbox_pending"] == 1
+
+
+def test_outbox_claims_are_exclusive(tmp_path):
+    """Checks that two workers sharing an outbox never relay the same event."""
+    path = str(tmp_path / "outbox.db")
+    first, second = ViewOutbox(path, lease=60), ViewOutbox(path, lease=60)
+    first.append([{"product_id": i, "viewed_at": datetime.now()} for i in range(5)])
+
+    first_ids, events = first.claim(3)
+    second_ids, _ = second.claim(10)
+    assert [event["product_id"] for event in events] == [0, 1, 2]
+    assert len(second_ids) == 2
+    assert not set(first_ids) & set(second_ids)
+
+    first.complete(first_ids)
+    second.complete(second_ids)
+    assert first.lag()["outbox_pending"] == 0
+
+
+def test_outbox_reclaims_batches_after_the_lease(tmp_path):
+    """Checks that the batch of a worker that stopped is claimed again."""
+    path = str(tmp_path / "outbox.db")
+    stopped, running = ViewOutbox(path, lease=-1), ViewOutbox(path, lease=60)
+    stopped.append([{"product_id": i, "viewed_at": datetime.now()} for i in range(3)])
+
+    stopped_ids, _ = stopped.claim(2)
+    running_ids, _ = running.claim(10)
+    assert set(stopped_ids) <= set(running_ids)
+    assert len(running_ids) == 3
+
+
+def test_outbox_event_ids_are_stable(tmp_path):
+    """Checks that a reclaimed event keeps its id and that ids differ across outbox files."""
+    path = str(tmp_path / "outbox.db")
+    stopped, running = ViewOutbox(path, lease=-1), ViewOutbox(path, lease=60)
+    stopped.append([{"product_id": i, "viewed_at": datetime.now()} for i in range(2)])
+
+    _, first_events = stopped.claim(10)
+    _, second_events = running.claim(10)
+    first_ids = [event["event_id"] for event in first_events]
+    assert first_ids == [event["event_id"] for event in second_events]
+    assert len(set(first_ids)) == 2
+
+    other = ViewOutbox(str(tmp_path / "other.db"))
+    other.append([{"product_id": 0, "viewed_at": datetime.now()}])
+    _, other_events = other.claim(10)
+    assert other_events[0]["event_id"] not in first_ids
+
+
+def test_async_pipeline_relays_the_outbox(tmp_path):
+    """Checks the async flush through the outbox."""
+    client = FakeAsyncProductLogClient()
+    pipeline = AsyncViewLogPipeline(
+        client,
+        max_queue_size=100,
+        batch_size=2,
+        flush_interval=60,
+        outbox=ViewOutbox(str(tmp_path / "outbox.db")),
+    )
+    pipeline.submit_many([1, 2, 3])
+    asyncio.run(pipeline.flush())
+    assert pipeline.stats()["written"] == 3
+    assert pipeline.stats()["outbox_pending"] == 0
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from app.database import mongodb
+from app.view_policy import (
+    DETAIL_ROUTE,
+    LIST_ROUTE,
+    BloomFilter,
+    ViewDeduplicator,
+    ViewPolicy,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"client:{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(bloom.positions(key))
+    assert all(bloom.contains(bloom.positions(key)) for key in keys)
+    false_positives = sum(
+        bloom.contains(bloom.positions(f"other:{i}")) for i in range(1000)
+    )
+    assert false_positives < 50
+
+
+def test_deduplicator_forgets_keys_after_two_windows():
+    """Checks that a key is a duplicate within the window and expires afterwards."""
+    clock = FakeClock()
+    deduplicator = ViewDeduplicator(60, capacity=100, error_rate=0.01, clock=clock)
+    assert not deduplicator.seen("a")
+    assert deduplicator.seen("a")
+
+    clock.now = 90  # Rotação: 'a' continua no filtro anterior
+    assert deduplicator.seen("a")
+    clock.now = 250  # Duas janelas sem visualizações: os dois filtros expiraram
+    assert not deduplicator.seen("a")
+
+
+def test_policy_deduplicates_per_client_and_product():
+    policy = ViewPolicy(
+        deduplicator=ViewDeduplicator(60, capacity=100, error_rate=0.01)
+    )
+    assert policy.select(DETAIL_ROUTE, "crawler", [1])[2] == [1]
+    assert policy.select(DETAIL_ROUTE, "crawler", [1])[2] == []
+    assert policy.select(DETAIL_ROUTE, "browser", [1])[2] == [1]
+    # Listagem e detalhe são deduplicados separadamente
+    assert policy.select(LIST_ROUTE, "crawler", [1, 2])[2] == [1, 2]
+    assert policy.stats()["deduplicated"] == 1
+
+
+def test_policy_samples_whole_requests_with_weights():
+    """Checks that a kept request carries the sampling weight and a dropped one nothing."""
+    draws = iter([0.05, 0.5])
+    policy = ViewPolicy(sample_every={LIST_ROUTE: 10}, rng=lambda: next(draws))
+    assert policy.select(LIST_ROUTE, "client", [1, 2]) == ("view", 10, [1, 2])
+    assert policy.select(LIST_ROUTE, "client", [1, 2]) == ("view", 10, [])
+    assert policy.stats()["sampled_out"] == 2
+    # Rotas sem amostragem configurada registram tudo
+    assert policy.select(DETAIL_ROUTE, "client", [1]) == ("view", 1, [1])
+
+
+def test_policy_list_events():
+    assert ViewPolicy(list_events="impressions").select(LIST_ROUTE, "c", [1])[:2] == (
+        mongodb.IMPRESSION_EVENT,
+        1,
+    )
+    assert ViewPolicy(list_events="none").select(LIST_ROUTE, "c", [1])[2] == []
+    assert ViewPolicy(list_events="none").select(DETAIL_ROUTE, "c", [1])[2] == [1]
+
+
+def test_rollup_counts_weights_and_impressions():
+    viewed_at = datetime(2026, 1, 1, 10, 30)
+    events = [
+        {"product_id": 1, "viewed_at": viewed_at, "weight": 10},
+        {"product_id": 1, "viewed_at": viewed_at},
+        {"product_id": 1, "viewed_at": viewed_at, "kind": "impression"},
+        {"product_id": 2, "viewed_at": viewed_at, "kind": "impression", "weight": 5},
+    ]
+    counters, buckets = mongodb.rollup_operations(events)
+    increments = {op._filter["_id"]: op._doc["$inc"] for op in counters}
+    assert increments == {1: {"total": 11, "impressions": 1}, 2: {"impressions": 5}}
+    assert {op._doc["$inc"]["count"] for op in buckets} == {11}
+    assert len(mongodb.view_documents(events)) == 2
@@ -1,7 +1,11 @@
+import fnmatch
+import time
 from typing import List
 
 from faker import Faker
 
+from app import cache
+
 data_faker = Faker()
 
 expected_status = [
@@ -31,3 +35,75 @@ def generate_valid_products(n: int = 10) -> List:
         }
         for _ in range(n)
     ]
+
+
+class FakeRedis:
+    """Local stand-in for the Redis client used by the shared product cache."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key: str):
+        value = self.data.get(key)
+        if value is None:
+            return None
+        if value[0] is not None and value[0] <= time.monotonic():
+            del self.data[key]
+            return None
+        return value[1]
+
+    def set(self, key: str, value: str, ex: int = None):
+        expires_at = time.monotonic() + ex if ex is not None else None
+        self.data[key] = (expires_at, value.encode())
+
+    def delete(self, key: str):
+        self.data.pop(key, None)
+
+    def scan_iter(self, pattern: str):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, pattern)]
+
+    def incr(self, key: str):
+        value = int(self.get(key) or 0) + 1
+        expires_at = self.data[key][0] if key in self.data else None
+        self.data[key] = (expires_at, str(value).encode())
+        return value
+
+    def expire(self, key: str, seconds: int):
+        if key in self.data:
+            self.data[key] = (time.monotonic() + seconds, self.data[key][1])
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def register_script(self, script: str):
+        assert script == cache.FILL_SCRIPT, "Only the cache fill script is emulated"
+
+        def fill(keys, args):
+            generation_key, key = keys
+            token, value, ex = args
+            if (self.get(generation_key) or b"0").decode() != token:
+                return 0
+            self.set(key, value, ex=ex)
+            return 1
+
+        return fill
+
+
+class FakePipeline:
+    """Queues the commands and runs them on execute(), like a Redis pipeline."""
+
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+
+        return queue
+
+    def execute(self):
+        return [
+            getattr(self.client, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]